@@ -9,6 +9,10 @@ from alembic import context
 from src.database import Base  
 from src.user.models import User  
 from src.book.models import Book
+from src.auth.models import RefreshToken
+from src.imports.models import ImportItem, ImportJob
+from src.loan.models import Hold, Loan
+from src.metadata.models import IsbnMetadata
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -0,0 +1,42 @@
+"""book page count integer
+
+Revision ID: 8d3e5a1c7b90
+Revises: 0f6b2c9e4a17
+Create Date: 2026-10-18 22:05:41.192837
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d3e5a1c7b90'
+down_revision: Union[str, None] = '0f6b2c9e4a17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # the schemas and Open Library send an int, asyncpg refuses to bind it to a varchar;
+    # a stored value that is not a number aborts the migration rather than being dropped
+    with op.batch_alter_table('books') as batch_op:
+        batch_op.alter_column(
+            'number_of_pages',
+            existing_type=sa.String(),
+            type_=sa.Integer(),
+            existing_nullable=True,
+            postgresql_using="NULLIF(trim(number_of_pages), '')::integer",
+        )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('books') as batch_op:
+        batch_op.alter_column(
+            'number_of_pages',
+            existing_type=sa.Integer(),
+            type_=sa.String(),
+            existing_nullable=True,
+            postgresql_using="number_of_pages::varchar",
+        )
@@ -0,0 +1,29 @@
+"""book row version
+
+Revision ID: 0f6b2c9e4a17
+Revises: 47d1f0c8b9e6
+Create Date: 2026-10-18 20:41:07.583190
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0f6b2c9e4a17'
+down_revision: Union[str, None] = '47d1f0c8b9e6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # validators of the book responses, existing rows start at version 1
+    op.add_column('books', sa.Column('version', sa.Integer(), server_default=sa.text('1'), nullable=False))
+    op.add_column('books', sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('books', 'updated_at')
+    op.drop_column('books', 'version')
@@ -0,0 +1,41 @@
+"""books full text search
+
+Revision ID: c71d0e94a3b6
+Revises: 8b2e64c0f1a9
+Create Date: 2026-10-18 14:05:27.880164
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c71d0e94a3b6'
+down_revision: Union[str, None] = '8b2e64c0f1a9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute("""
+        ALTER TABLE books ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+            setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(author, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(subtitle, '')), 'B') ||
+            setweight(to_tsvector('english', coalesce(subjects, '')), 'C') ||
+            setweight(to_tsvector('english', coalesce(description, '')), 'D')
+        ) STORED
+    """)
+    op.create_index('ix_books_search_vector', 'books', ['search_vector'], unique=False, postgresql_using='gin')
+    op.create_index('ix_books_title_trgm', 'books', ['title'], unique=False, postgresql_using='gin', postgresql_ops={'title': 'gin_trgm_ops'})
+    op.create_index('ix_books_author_trgm', 'books', ['author'], unique=False, postgresql_using='gin', postgresql_ops={'author': 'gin_trgm_ops'})
+
+
+def downgrade() -> None:
+    op.drop_index('ix_books_author_trgm', table_name='books')
+    op.drop_index('ix_books_title_trgm', table_name='books')
+    op.drop_index('ix_books_search_vector', table_name='books')
+    op.drop_column('books', 'search_vector')
@@ -0,0 +1,29 @@
+"""books lookup indexes
+
+Revision ID: 47d1f0c8b9e6
+Revises: e3a9d4b7f152
+Create Date: 2026-10-18 19:58:20.174352
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '47d1f0c8b9e6'
+down_revision: Union[str, None] = 'e3a9d4b7f152'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # isbn is covered by uq_books_isbn (2b7f93d1c6a4), added_date by ix_books_added_date_id (3f9c1a7d52e4)
+    op.create_index('ix_books_user_id', 'books', ['user_id'], unique=False)
+    op.create_index('ix_books_borrowed_id', 'books', ['id'], unique=False, postgresql_where=sa.text('is_borrowed'))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_books_borrowed_id', table_name='books')
+    op.drop_index('ix_books_user_id', table_name='books')
@@ -0,0 +1,28 @@
+"""keyset pagination indexes
+
+Revision ID: 3f9c1a7d52e4
+Revises: ac86f2372794
+Create Date: 2026-10-18 09:12:41.201533
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9c1a7d52e4'
+down_revision: Union[str, None] = 'ac86f2372794'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_books_title_id', 'books', ['title', 'id'], unique=False)
+    op.create_index('ix_books_added_date_id', 'books', ['added_date', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_books_added_date_id', table_name='books')
+    op.drop_index('ix_books_title_id', table_name='books')
@@ -0,0 +1,73 @@
+"""loans and holds
+
+Revision ID: e3a9d4b7f152
+Revises: 6c0e8a5f2d71
+Create Date: 2026-10-18 19:12:44.905163
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3a9d4b7f152'
+down_revision: Union[str, None] = '6c0e8a5f2d71'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# must match loan.constants.LOAN_PERIOD_DAYS at the time of the upgrade
+LOAN_PERIOD_DAYS = 21
+
+
+def upgrade() -> None:
+    op.create_table('loans',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('book_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('borrowed_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('due_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('returned_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['book_id'], ['books.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_loans_user_id_returned_at', 'loans', ['user_id', 'returned_at'], unique=False)
+    op.create_index('ix_loans_open_due_at', 'loans', ['due_at', 'id'], unique=False, postgresql_where=sa.text('returned_at IS NULL'))
+    op.create_index('uq_loans_open_book_id', 'loans', ['book_id'], unique=True, postgresql_where=sa.text('returned_at IS NULL'))
+    op.create_index('ix_loans_borrowed_at_book_id', 'loans', ['borrowed_at', 'book_id'], unique=False)
+
+    op.create_table('holds',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('book_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('placed_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('closed_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['book_id'], ['books.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_holds_open_book_id_id', 'holds', ['book_id', 'id'], unique=False, postgresql_where=sa.text('closed_at IS NULL'))
+    op.create_index('uq_holds_open_book_id_user_id', 'holds', ['book_id', 'user_id'], unique=True, postgresql_where=sa.text('closed_at IS NULL'))
+
+    # the books columns only know the current loans, history starts here
+    op.execute(f"""
+        INSERT INTO loans (book_id, user_id, borrowed_at, due_at)
+        SELECT id, user_id,
+               coalesce(borrowed_date, current_date)::timestamptz,
+               coalesce(borrowed_date, current_date)::timestamptz + interval '{LOAN_PERIOD_DAYS} days'
+        FROM books
+        WHERE is_borrowed AND user_id IS NOT NULL
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index('uq_holds_open_book_id_user_id', table_name='holds')
+    op.drop_index('ix_holds_open_book_id_id', table_name='holds')
+    op.drop_table('holds')
+    op.drop_index('ix_loans_borrowed_at_book_id', table_name='loans')
+    op.drop_index('uq_loans_open_book_id', table_name='loans')
+    op.drop_index('ix_loans_open_due_at', table_name='loans')
+    op.drop_index('ix_loans_user_id_returned_at', table_name='loans')
+    op.drop_table('loans')
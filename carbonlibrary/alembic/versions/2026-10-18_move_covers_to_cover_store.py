@@ -0,0 +1,71 @@
+"""move covers to cover store
+
+Revision ID: 8b2e64c0f1a9
+Revises: 3f9c1a7d52e4
+Create Date: 2026-10-18 11:40:03.518274
+
+"""
+import base64
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from src.book import covers
+from src.storage.backends import get_storage
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b2e64c0f1a9'
+down_revision: Union[str, None] = '3f9c1a7d52e4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+books = sa.table(
+    'books',
+    sa.column('id', sa.Integer()),
+    sa.column('cover_image', sa.String()),
+    sa.column('cover_hash', sa.String(length=64)),
+)
+
+
+def upgrade() -> None:
+    op.add_column('books', sa.Column('cover_hash', sa.String(length=64), nullable=True))
+
+    # decode the base64 covers into the cover store one row at a time, they can be several MB each
+    connection = op.get_bind()
+    storage = get_storage()
+    book_ids = connection.execute(sa.select(books.c.id).where(books.c.cover_image.is_not(None))).scalars().all()
+    for book_id in book_ids:
+        encoded_image_data = connection.execute(sa.select(books.c.cover_image).where(books.c.id == book_id)).scalar_one()
+        try:
+            img_content = base64.b64decode(encoded_image_data)
+        except ValueError:
+            img_content = encoded_image_data.encode('utf-8')
+        try:
+            cover_hash = covers.save_cover(storage, img_content)
+        except ValueError:
+            # not an image type the cover store knows, keep the bytes as they are under their digest:
+            # cover_image is dropped below, skipping the row would lose them for good
+            cover_hash = covers.cover_digest(img_content)
+            if not storage.exists(covers.cover_key(cover_hash)):
+                storage.put(covers.cover_key(cover_hash), img_content, content_type='application/octet-stream')
+        connection.execute(sa.update(books).where(books.c.id == book_id).values(cover_hash=cover_hash))
+
+    op.drop_column('books', 'cover_image')
+
+
+def downgrade() -> None:
+    op.add_column('books', sa.Column('cover_image', sa.String(), nullable=True))
+
+    connection = op.get_bind()
+    storage = get_storage()
+    rows = connection.execute(sa.select(books.c.id, books.c.cover_hash).where(books.c.cover_hash.is_not(None))).all()
+    for book_id, cover_hash in rows:
+        img_content = covers.load_cover(storage, cover_hash)
+        if img_content is None:
+            continue
+        encoded_image_data = base64.b64encode(img_content).decode('utf-8')
+        connection.execute(sa.update(books).where(books.c.id == book_id).values(cover_image=encoded_image_data))
+
+    op.drop_column('books', 'cover_hash')
@@ -0,0 +1,33 @@
+"""unique book isbn
+
+Revision ID: 2b7f93d1c6a4
+Revises: 9e41c7b2d058
+Create Date: 2026-10-18 17:48:31.270518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2b7f93d1c6a4'
+down_revision: Union[str, None] = '9e41c7b2d058'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # merging duplicate catalogue entries needs a human, refuse instead of dropping rows
+    duplicates = op.get_bind().execute(sa.text(
+        "SELECT isbn FROM books GROUP BY isbn HAVING count(*) > 1"
+    )).scalars().all()
+    if duplicates:
+        raise RuntimeError(f"Resolve duplicate ISBNs before upgrading: {', '.join(duplicates[:20])}")
+
+    op.create_unique_constraint('uq_books_isbn', 'books', ['isbn'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_books_isbn', 'books', type_='unique')
@@ -0,0 +1,240 @@
+"""
+Load-test scenarios driven against the in-process ASGI app, results written as JSON.
+
+    python -m benchmarks.run --users 200 --books 5000 --requests 2000 --concurrency 32 --output results.json
+    python -m benchmarks.run --database-url postgresql://bench@localhost/bench --baseline results.json
+
+Run from carbonlibrary/. Without --database-url the app runs on a throwaway SQLite file, a Postgres URL must
+point at an empty, disposable database: the tables are created before seeding and dropped afterwards.
+Covers go to a temporary local storage root. The seed is fixed, so two runs on two commits see the same data.
+
+Every scenario reports throughput and latency percentiles, with --baseline the output also carries the ratio
+of each figure to the same figure of a previous run, so regressions between commits stand out:
+
+- `paging`: /books/retrieve/books/summary, offset pages across the whole catalogue
+- `detail`: /books/retrieve/{id} of random books
+- `login_burst`: POST /token, every request hashes a password
+- `borrow_contention`: borrow then return on a handful of hot books, refusals (400) are expected outcomes
+- `covers`: /books/covers/{hash} renditions as WebP
+- `search`: /books/search with one or two catalogue words
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+SCENARIOS = ("paging", "detail", "login_burst", "borrow_contention", "covers", "search")
+
+
+def configure_environment(database_url: str, storage_root: str):
+    """
+    The app reads its configuration at import time, so this runs before anything from src is imported.
+    """
+    os.environ["PG_DATABASE_URL"] = database_url
+    os.environ["STORAGE_BACKEND"] = "local"
+    os.environ["LOCAL_STORAGE_ROOT"] = storage_root
+    os.environ.setdefault("HASH_ALGORITHM", "bcrypt")
+    os.environ.setdefault("JWT_ALGORITHM", "HS256")
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret-key")
+
+def percentile(samples: list[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def summarize(latencies: list[float], statuses: Counter, seconds: float, concurrency: int) -> dict:
+    return {
+        "requests": len(latencies),
+        "concurrency": concurrency,
+        "seconds": round(seconds, 3),
+        "throughput_rps": round(len(latencies) / seconds, 1),
+        "latency_ms": {
+            "mean": round(statistics.fmean(latencies) * 1000, 2),
+            "p50": round(percentile(latencies, 0.50) * 1000, 2),
+            "p95": round(percentile(latencies, 0.95) * 1000, 2),
+            "p99": round(percentile(latencies, 0.99) * 1000, 2),
+            "max": round(max(latencies) * 1000, 2),
+        },
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+    }
+
+def compare(result: dict, baseline: dict) -> dict:
+    """
+    Ratio of each figure to the baseline's, above 1 means more throughput or a slower percentile.
+    """
+    return {
+        "throughput_rps": round(result["throughput_rps"] / baseline["throughput_rps"], 3),
+        **{
+            f"latency_ms.{name}": round(value / baseline["latency_ms"][name], 3)
+            for name, value in result["latency_ms"].items() if baseline["latency_ms"].get(name)
+        },
+    }
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+async def run_scenario(client, make_request, requests: int, concurrency: int, warmup: int) -> dict:
+    """
+    Send `requests` requests from `concurrency` concurrent workers, after `warmup` unmeasured ones
+    that fill the connection pool and the caches.
+
+    :param make_request: Coroutine function taking the client and a per-worker random.Random, returning the response.
+    """
+    latencies = []
+    statuses = Counter()
+    rng = random.Random(-1)
+    for _ in range(warmup):
+        await make_request(client, rng)
+
+    remaining = iter(range(requests))
+
+    async def worker(rng: random.Random):
+        for _ in remaining:
+            started = time.perf_counter()
+            response = await make_request(client, rng)
+            latencies.append(time.perf_counter() - started)
+            statuses[response.status_code] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(random.Random(index)) for index in range(concurrency)))
+    return summarize(latencies, statuses, time.perf_counter() - started, concurrency)
+
+def build_scenarios(seeded: dict, tokens: dict[str, str], password: str, hot_books: int) -> dict:
+    from .seed import WORDS
+
+    emails = seeded["emails"]
+    book_ids = seeded["book_ids"]
+    hot = book_ids[:hot_books]
+
+    def auth(email: str) -> dict:
+        return {"Authorization": f"Bearer {tokens[email]}"}
+
+    async def paging(client, rng):
+        return await client.get("/api/books/retrieve/books/summary", params={"skip": rng.randrange(len(book_ids)), "limit": 10})
+
+    async def detail(client, rng):
+        email = rng.choice(emails)
+        return await client.get(f"/api/books/retrieve/{rng.choice(book_ids)}", headers=auth(email))
+
+    async def login_burst(client, rng):
+        return await client.post("/api/token", data={"username": rng.choice(emails), "password": password})
+
+    async def borrow_contention(client, rng):
+        email = rng.choice(emails)
+        book_id = rng.choice(hot)
+        response = await client.patch(f"/api/books/borrow/{email}/{book_id}", headers=auth(email))
+        if response.status_code == 200:
+            await client.patch(f"/api/books/return/{email}/{book_id}", headers=auth(email))
+        return response
+
+    async def covers(client, rng):
+        return await client.get(f"/api/books/covers/{rng.choice(seeded['cover_hashes'])}", params={"size": "card"}, headers={"Accept": "image/webp"})
+
+    async def search(client, rng):
+        return await client.get("/api/books/search", params={"q": " ".join(rng.sample(WORDS, rng.randint(1, 2)))})
+
+    return {
+        "paging": paging,
+        "detail": detail,
+        "login_burst": login_burst,
+        "borrow_contention": borrow_contention,
+        "covers": covers,
+        "search": search,
+    }
+
+async def main(args: argparse.Namespace, storage_root: str) -> dict:
+    import httpx
+
+    from src.auth.service import create_access_token
+    from src.database import Base, SessionLocal, engine
+    from src.main import app
+    from src.storage.backends import get_storage
+
+    from .seed import BENCHMARK_PASSWORD, seed
+
+    #the ASGI transport does not run the lifespan, the tables are created here
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+    try:
+        started = time.perf_counter()
+        seeded = await seed(SessionLocal, get_storage(), args.users, args.books, args.covers, args.seed)
+        seed_seconds = time.perf_counter() - started
+
+        tokens = {email: create_access_token(payload={"email": email, "scope": "user"}) for email in seeded["emails"]}
+        scenarios = build_scenarios(seeded, tokens, BENCHMARK_PASSWORD, args.hot_books)
+
+        results = {}
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://benchmark") as client:
+            for name in args.scenario or SCENARIOS:
+                #login hashes a password per request, it gets a fraction of the budget to keep runs short
+                requests = max(1, args.requests // 10) if name == "login_burst" else args.requests
+                results[name] = await run_scenario(client, scenarios[name], requests, args.concurrency, min(args.warmup, requests))
+                print(f"{name}: {results[name]['throughput_rps']} req/s, p99 {results[name]['latency_ms']['p99']} ms", file=sys.stderr)
+    finally:
+        if not args.keep_database:
+            async with engine.begin() as connection:
+                await connection.run_sync(Base.metadata.drop_all)
+        await engine.dispose()
+
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "backend": engine.dialect.name,
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "python": sys.version.split()[0],
+            "users": args.users,
+            "books": args.books,
+            "covers": args.covers,
+            "seed": args.seed,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "seed_seconds": round(seed_seconds, 3),
+        },
+        "scenarios": results,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="sync SQLAlchemy URL of a disposable database, default a temporary SQLite file")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--books", type=int, default=2000)
+    parser.add_argument("--covers", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=1000, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--warmup", type=int, default=20, help="unmeasured requests before each scenario")
+    parser.add_argument("--hot-books", type=int, default=5, help="books the borrow_contention scenario fights over")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS, help="repeatable, default every scenario")
+    parser.add_argument("--output", help="write the JSON here instead of stdout")
+    parser.add_argument("--baseline", help="JSON of a previous run to compare against")
+    parser.add_argument("--keep-database", action="store_true", help="do not drop the tables afterwards")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="librarius-benchmark-") as workdir:
+        configure_environment(args.database_url or f"sqlite:///{workdir}/benchmark.db", os.path.join(workdir, "storage"))
+        report = asyncio.run(main(args, workdir))
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        report["baseline"] = {
+            "commit": baseline["meta"].get("commit"),
+            "ratios": {name: compare(result, baseline["scenarios"][name]) for name, result in report["scenarios"].items() if name in baseline["scenarios"]},
+        }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+    else:
+        print(output)
@@ -0,0 +1,120 @@
+"""
+Data generator of the benchmark suite: N users and M books with realistic field sizes, covers included.
+
+Seeded with a fixed random seed, the same arguments give the same catalogue on every run.
+Used by benchmarks.run, which sets up the environment before the app is imported.
+"""
+import datetime
+import io
+import random
+
+from PIL import Image, ImageDraw
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from src.auth.service import hash_password
+from src.book import covers
+from src.book import models as book_models
+from src.storage.backends import StorageBackend
+from src.user import models as user_models
+
+BENCHMARK_PASSWORD = "benchmark-password"
+INSERT_BATCH_SIZE = 500
+
+WORDS = (
+    "shadow river empire garden winter silent night stone crown glass city north ocean fire memory "
+    "house secret storm light forest journey bridge island kingdom letter mountain voice dream iron "
+    "summer wolf paper star machine harbor orchard lantern desert border archive signal thread"
+).split()
+PUBLISHERS = ["Penguin", "HarperCollins", "Macmillan", "Hachette", "Simon & Schuster", "Vintage", "Orbit", "Tor"]
+LANGUAGES = ["eng"] * 8 + ["fre", "ger", "spa"]
+SUBJECTS = ["Fiction", "History", "Science fiction", "Fantasy", "Biography", "Poetry", "Mystery", "Travel", "Philosophy"]
+
+
+def _words(rng: random.Random, low: int, high: int, max_length: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(low, high))).capitalize()[:max_length]
+
+def _isbn13(rng: random.Random, index: int) -> str:
+    # unique per index, a valid check digit keeps it indistinguishable from a real one
+    digits = f"978{index:09d}"[:12]
+    check = (10 - sum(int(digit) * (3 if position % 2 else 1) for position, digit in enumerate(digits)) % 10) % 10
+    return f"{digits}{check}"
+
+def make_cover(rng: random.Random) -> bytes:
+    """
+    A 600x900 JPEG with noise, so it compresses like a photographed cover (tens of KB) and not like a flat fill.
+    """
+    image = Image.effect_noise((600, 900), rng.randint(40, 90)).convert("RGB")
+    tint = Image.new("RGB", image.size, tuple(rng.randint(0, 255) for _ in range(3)))
+    image = Image.blend(image, tint, 0.6)
+    ImageDraw.Draw(image).rectangle((60, 120, 540, 300), fill=(245, 240, 230))
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=85)
+    return buffer.getvalue()
+
+def make_books(rng: random.Random, count: int, cover_hashes: list[str]) -> list[dict]:
+    today = datetime.date.today()
+    return [
+        {
+            "title": _words(rng, 1, 6, 64),
+            "subtitle": _words(rng, 3, 12, 1024) if rng.random() < 0.4 else None,
+            "author": f"{rng.choice(WORDS).capitalize()} {rng.choice(WORDS).capitalize()}",
+            "isbn": _isbn13(rng, index),
+            "edition": rng.choice(["1st ed.", "2nd ed.", "Revised edition", None]),
+            "publisher": rng.choice(PUBLISHERS),
+            "publish_date": str(rng.randint(1950, 2024)),
+            "publish_place": rng.choice(["London", "New York", "Paris", None]),
+            "number_of_pages": rng.randint(80, 900),
+            # descriptions dominate the row size, the column holds up to 1024
+            "description": _words(rng, 40, 150, 1024),
+            "language": rng.choice(LANGUAGES),
+            "subjects": ", ".join(rng.sample(SUBJECTS, rng.randint(1, 3))),
+            "cover_hash": cover_hashes[index % len(cover_hashes)] if cover_hashes else None,
+            "added_date": today - datetime.timedelta(days=rng.randint(0, 3650)),
+            "is_borrowed": False,
+        }
+        for index in range(count)
+    ]
+
+async def seed(session_factory: async_sessionmaker, storage: StorageBackend, users: int, books: int, covers_count: int, random_seed: int = 1) -> dict:
+    """
+    Insert the users and books, and store the covers with their renditions.
+
+    Every user has BENCHMARK_PASSWORD, hashed once: hashing per user would dominate seeding.
+
+    :return: Return the emails, book IDs and ISBNs, and cover hashes the scenarios pick from.
+    """
+    rng = random.Random(random_seed)
+
+    cover_hashes = []
+    for _ in range(covers_count):
+        content = make_cover(rng)
+        digest = covers.save_cover(storage, content)
+        covers.store_renditions(storage, digest, covers.render_renditions(content))
+        cover_hashes.append(digest)
+
+    hashed_password = await hash_password(BENCHMARK_PASSWORD)
+    user_rows = [
+        {
+            "email": f"reader{index}@example.com",
+            "name": f"{rng.choice(WORDS).capitalize()} {rng.choice(WORDS).capitalize()}",
+            "age": rng.randint(16, 90),
+            "hashed_password": hashed_password,
+        }
+        for index in range(users)
+    ]
+    book_rows = make_books(rng, books, cover_hashes)
+
+    async with session_factory() as db:
+        for rows, model in ((user_rows, user_models.User), (book_rows, book_models.Book)):
+            for offset in range(0, len(rows), INSERT_BATCH_SIZE):
+                await db.execute(insert(model), rows[offset:offset + INSERT_BATCH_SIZE])
+        await db.commit()
+        book_ids = list((await db.execute(book_models.Book.__table__.select().with_only_columns(book_models.Book.id))).scalars())
+
+    return {
+        "emails": [row["email"] for row in user_rows],
+        "book_ids": book_ids,
+        "isbns": [row["isbn"] for row in book_rows],
+        "cover_hashes": cover_hashes,
+    }
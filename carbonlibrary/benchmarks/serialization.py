@@ -0,0 +1,110 @@
+"""
+Per-request serialization cost of the response paths, no database or HTTP involved.
+
+    python -m benchmarks.serialization --books 100 --repeat 200
+
+Run from carbonlibrary/ with the app's environment set (PG_DATABASE_URL etc., importing the models needs it).
+Prints one JSON object per scenario with the mean and median microseconds per response:
+
+- `fastapi_json`: response_model validation + jsonable_encoder + JSONResponse, the former default
+- `fastapi_orjson`: the same pass rendered by ORJSONResponse, the default class since main.py sets it
+- `type_adapter`: utils.dump_json, the opt-in fast path of the routes returning utils.json_response
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import statistics
+import time
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from src.book import crud as crud_books
+from src.book import models as book_models
+from src.book import schemas as book_schemas
+from src.user import models as user_models
+from src.user import schemas as user_schemas
+from src.utils import dump_json
+
+
+def make_books(count: int) -> list[dict]:
+    today = datetime.date.today()
+    return [
+        dict(
+            id=book_id, title=f"Book title {book_id}", author="Author Name", isbn=f"978{book_id:010d}",
+            publisher="Publisher", publish_date="2020", language="eng", subjects="Fiction, Classics",
+            description="D" * 512, added_date=today, is_borrowed=False,
+        )
+        for book_id in range(1, count + 1)
+    ]
+
+def load_fixtures(count: int) -> tuple[list[book_models.Book], list]:
+    """
+    Seed an in-memory SQLite and read the books back the way the routes do: loaded ORM objects
+    (crud.get_books) and Row objects with the summary columns (crud.get_book_summaries).
+    """
+    async def load():
+        engine = create_async_engine("sqlite+aiosqlite://")
+        async with engine.begin() as connection:
+            await connection.run_sync(book_models.Book.__table__.create)
+            await connection.execute(book_models.Book.__table__.insert(), make_books(count))
+        async with AsyncSession(engine, expire_on_commit=False) as db:
+            db_books = await crud_books.get_books(skip=0, limit=count, db=db)
+            rows = await crud_books.get_book_summaries(skip=0, limit=count, db=db)
+        await engine.dispose()
+        return db_books, rows
+    return asyncio.run(load())
+
+def make_user(books: list[book_models.Book]) -> dict:
+    db_user = user_models.User(id=1, email="reader@example.com", name="Reader", age=30, hashed_password="x",
+                               registered_date=datetime.date.today(), is_active=True)
+    # the shape user.router._user_response passes on
+    return {"id": db_user.id, "email": db_user.email, "name": db_user.name, "age": db_user.age,
+            "registered_date": db_user.registered_date, "is_active": db_user.is_active, "borrowed_books": books}
+
+def measure(function, repeat: int) -> dict:
+    function()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start) * 1e6)
+    return {"mean_us": round(statistics.fmean(timings), 1), "median_us": round(statistics.median(timings), 1)}
+
+def run(books: int, repeat: int) -> list[dict]:
+    db_books, summary_rows = load_fixtures(books)
+    scenarios = {
+        "book_list": (list[book_schemas.Book], db_books),
+        "book_summary_list": (list[book_schemas.BookSummary], [row._asdict() for row in summary_rows]),
+        "user_with_books": (user_schemas.UserResponse, make_user(db_books[:20])),
+    }
+
+    loop = asyncio.new_event_loop()
+    results = []
+    for name, (schema, data) in scenarios.items():
+        field = create_response_field(name="Response", type_=schema)
+
+        def fastapi_path(response_class):
+            content = loop.run_until_complete(serialize_response(field=field, response_content=data, is_coroutine=True))
+            return response_class(content).body
+
+        results.append({
+            "scenario": name,
+            "items": len(data) if isinstance(data, list) else 1,
+            "fastapi_json": measure(lambda: fastapi_path(JSONResponse), repeat),
+            "fastapi_orjson": measure(lambda: fastapi_path(ORJSONResponse), repeat),
+            "type_adapter": measure(lambda: dump_json(schema, data), repeat),
+        })
+    loop.close()
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--books", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+    for result in run(args.books, args.repeat):
+        print(json.dumps(result))
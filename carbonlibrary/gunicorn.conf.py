@@ -0,0 +1,21 @@
+"""
+Picked up by gunicorn from the working directory (/app in the image).
+
+The workers share their Prometheus metrics through files in PROMETHEUS_MULTIPROC_DIR, see src/metrics.
+"""
+import os
+import shutil
+
+# set before anything imports prometheus_client, it picks its value storage at import time
+# and the workers inherit this process' modules
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/prometheus_multiproc")
+
+from prometheus_client import multiprocess
+
+def on_starting(server):
+    # files of a previous run would be summed into the new one
+    shutil.rmtree(os.environ["PROMETHEUS_MULTIPROC_DIR"], ignore_errors=True)
+    os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"])
+
+def child_exit(server, worker):
+    multiprocess.mark_process_dead(worker.pid)
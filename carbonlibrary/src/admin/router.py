@@ -0,0 +1,64 @@
+from fastapi import APIRouter, Depends, HTTPException, Security
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse, PlainTextResponse
+
+from ..auth import dependencies
+from ..database import pool_status
+from ..profiler.store import ProfileStore, get_profile_store
+
+router = APIRouter(
+    prefix = "/admin",
+    tags = ["admin"],
+)
+
+@router.get(
+    "/database/pool",
+    dependencies=[
+        Security(dependencies.authorize_current_user, scopes=["admin", "superuser"]),
+    ])
+async def read_pool_status():
+    """
+    Connection pool usage of the worker that serves the request.
+    """
+    return pool_status()
+
+@router.get(
+    "/profiles",
+    dependencies=[
+        Security(dependencies.authorize_current_user, scopes=["admin", "superuser"]),
+    ])
+async def list_profiles(store: ProfileStore = Depends(get_profile_store)):
+    """
+    Profiles captured by the profiler middleware on this host (PROFILER_ENABLED), oldest first.
+    """
+    return await run_in_threadpool(store.summaries)
+
+async def _load_profile(store: ProfileStore, name: str) -> dict:
+    capture = await run_in_threadpool(store.load, name)
+    if capture is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return capture
+
+@router.get(
+    "/profiles/{name}",
+    dependencies=[
+        Security(dependencies.authorize_current_user, scopes=["admin", "superuser"]),
+    ])
+async def download_profile(name: str, store: ProfileStore = Depends(get_profile_store)):
+    """
+    Download a captured profile: timing, SQL statements and folded stacks.
+    """
+    capture = await _load_profile(store, name)
+    return ORJSONResponse(capture, headers={"Content-Disposition": f'attachment; filename="{name}"'})
+
+@router.get(
+    "/profiles/{name}/folded",
+    dependencies=[
+        Security(dependencies.authorize_current_user, scopes=["admin", "superuser"]),
+    ])
+async def download_profile_stacks(name: str, store: ProfileStore = Depends(get_profile_store)):
+    """
+    Download the folded stacks of a captured profile, the input of flamegraph.pl or speedscope.
+    """
+    capture = await _load_profile(store, name)
+    return PlainTextResponse(capture["folded_stacks"])
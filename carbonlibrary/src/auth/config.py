@@ -1,5 +1,14 @@
 import os
 
+# comma separated passlib schemes, the first one hashes new passwords,
+# hashes of the others still verify and are rehashed on the next login
 HASH_ALGORITHM = os.environ.get("HASH_ALGORITHM")
 JWT_ALGORITHM = os.environ.get("JWT_ALGORITHM")
-SECRET_KEY = os.environ.get("SECRET_KEY")
\ No newline at end of file
+SECRET_KEY = os.environ.get("SECRET_KEY")
+
+# hashing cost, stored hashes below it are rehashed on the next login
+HASH_BCRYPT_ROUNDS = int(os.environ.get("HASH_BCRYPT_ROUNDS", 12))
+HASH_ARGON2_TIME_COST = int(os.environ.get("HASH_ARGON2_TIME_COST", 3))
+HASH_ARGON2_MEMORY_COST = int(os.environ.get("HASH_ARGON2_MEMORY_COST", 65536))
+# threads hashing and verifying passwords per worker, logins beyond it queue instead of taking more CPU
+HASH_WORKERS = int(os.environ.get("HASH_WORKERS", 2))
@@ -1,2 +1,10 @@
-ACCESS_TOKEN_EXPIRE_WEEKS = 1 
-REFRESH_TOKEN_EXPIRE_WEEKS = 26
\ No newline at end of file
+# access tokens are verified without a database round trip and cannot be revoked, keep them short lived
+ACCESS_TOKEN_EXPIRE_MINUTES = 15
+REFRESH_TOKEN_EXPIRE_WEEKS = 26
+
+# verified access tokens kept per worker, an entry never outlives its token's exp
+TOKEN_CACHE_SIZE = 4096
+TOKEN_CACHE_TTL = 900
+
+# revoked token families remembered per worker, rejected without asking the database
+REVOKED_FAMILY_CACHE_SIZE = 4096
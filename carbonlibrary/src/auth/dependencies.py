@@ -1,4 +1,6 @@
 
+import hashlib
+import time
 from typing import Annotated
 
 import jwt
@@ -8,33 +10,63 @@ from jwt.exceptions import InvalidTokenError
 from pydantic import ValidationError
 from datetime import datetime, timezone
 
-from ..auth import config, exceptions
+from ..auth import config, constants, exceptions
 from ..user import schemas, crud
+from ..utils import TTLCache
 
 oauth2_scheme = OAuth2PasswordBearer(
     tokenUrl="/api/token"
 )
+
+#verified tokens, keyed by sha256 of the token so raw bearer tokens are not kept in memory
+token_cache = TTLCache(maxsize=constants.TOKEN_CACHE_SIZE, ttl=constants.TOKEN_CACHE_TTL)
+
+def decode_token(token: str) -> schemas.JWTTokenData:
+    """
+    Verify a token and build its token data, once per token until it is evicted or expires.
+
+    :raises InvalidTokenError: If the signature, exp or any required claim is invalid.
+    :raises ValidationError: If the claims do not fit JWTTokenData.
+    """
+    key = hashlib.sha256(token.encode("utf-8")).digest()
+    user_token_data = token_cache.get(key)
+    if user_token_data is not None:
+        return user_token_data
+
+    payload = jwt.decode(token, config.SECRET_KEY, config.JWT_ALGORITHM, options={"require": ["exp"]})
+    #refresh tokens only buy new tokens at /token/refresh, tokens issued before "typ" existed are access tokens
+    if payload.get("typ", "access") != "access":
+        raise InvalidTokenError("Not an access token")
+    payload_email = payload.get("email")
+    payload_scope = payload.get("scope")
+    payload_expire = payload.get("exp")
+
+    """JWT automatically convert datetime to timestamp when encode data,
+    it is necessary to convert timestamp type back to datetime type after decoding payload"""
+    payload_expire_datetime = datetime.fromtimestamp(payload_expire, tz=(timezone.utc))
+
+    user_token_data = schemas.JWTTokenData(email=payload_email, scope=payload_scope, expire_date=payload_expire_datetime)
+
+    #never serve a token from the cache past its exp
+    token_cache.set(key, user_token_data, ttl=min(constants.TOKEN_CACHE_TTL, payload_expire - time.time()))
+    return user_token_data
+
+#decoded principal of the request, FastAPI resolves it once per request for every check that depends on it
+def get_token_data(token: Annotated[str, Depends(oauth2_scheme)]) -> schemas.JWTTokenData | None:
+    try:
+        return decode_token(token)
+    except (InvalidTokenError, ValidationError):
+        return None
+
 #confirm privilege by comparing what user has and what is required
-def authorize_current_user(security_scopes: SecurityScopes, token: Annotated[str, Depends(oauth2_scheme)]):
+def authorize_current_user(security_scopes: SecurityScopes, user_token_data: Annotated[schemas.JWTTokenData | None, Depends(get_token_data)]):
     
     if security_scopes.scopes:
         authenticate_value = f'Bearer scope="{security_scopes.scope_str}"'
     else:
         authenticate_value = "Bearer"
 
-    try:
-        payload = jwt.decode(token, config.SECRET_KEY, config.JWT_ALGORITHM)
-        payload_email = payload.get("email")
-        payload_scope = payload.get("scope")
-        payload_expire = payload.get("exp")
-
-        """JWT automatically convert datetime to timestamp when encode data,
-        it is necessary to convert timestamp type back to datetime type after decoding payload"""
-        payload_expire_datetime = datetime.fromtimestamp(payload_expire, tz=(timezone.utc))
-
-        user_token_data = schemas.JWTTokenData(email=payload_email, scope=payload_scope, expire_date=payload_expire_datetime)
-
-    except (InvalidTokenError, ValidationError):
+    if user_token_data is None:
         raise exceptions.credentials_exception("Could not validate credentials1", authenticate_value)
 
     #verifying permission
@@ -43,23 +75,10 @@ def authorize_current_user(security_scopes: SecurityScopes, token: Annotated[str
         
 #verifying both identity and role
 #check either user is logged in as the user or user is admin or superuser
-def confirm_user_authorization(email: str, token: Annotated[str, Depends(oauth2_scheme)]):
-    try:
-        payload = jwt.decode(token, config.SECRET_KEY, config.JWT_ALGORITHM)
-        payload_email = payload.get("email")
-        payload_scope = payload.get("scope")
-        payload_expire = payload.get("exp")
-
-        """JWT automatically convert datetime to timestamp when encode data,
-        it is necessary to convert timestamp type back to datetime type after decoding payload"""
-        payload_expire_datetime = datetime.fromtimestamp(payload_expire, tz=(timezone.utc))
-
-        user_token_data = schemas.JWTTokenData(email=payload_email, scope=payload_scope, expire_date=payload_expire_datetime)
-        
-    except (InvalidTokenError, ValidationError):
+def confirm_user_authorization(email: str, user_token_data: Annotated[schemas.JWTTokenData | None, Depends(get_token_data)]):
+    if user_token_data is None:
         raise HTTPException(status_code=401, detail="Could not validate credentials2")
 
     # if current user's email doesn't match the email of the requested user, and current user's scope isn't admin or superuser
     if email != user_token_data.email and user_token_data.scope not in ["admin", "superuser"]:
         raise HTTPException(status_code=401, detail="Could not validate credentials3")
-
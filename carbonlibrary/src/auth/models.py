@@ -0,0 +1,21 @@
+import datetime
+
+from sqlalchemy import DateTime, ForeignKey, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from ..database import Base
+
+
+class RefreshToken(Base):
+    """
+    Live refresh token, one row per login session (token family).
+
+    A row is deleted when its token is rotated or revoked, so a token whose jti has no row
+    was already used, or belongs to a revoked or expired session.
+    """
+    __tablename__ = "refresh_tokens"
+
+    jti: Mapped[str] = mapped_column(String(32), primary_key=True)
+    family: Mapped[str] = mapped_column(String(32), index=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), index=True)
+    expires_at: Mapped[datetime.datetime] = mapped_column(DateTime(timezone=True))
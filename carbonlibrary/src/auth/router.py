@@ -1,12 +1,12 @@
-from datetime import timedelta
 from typing import Annotated
 
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from jwt.exceptions import InvalidTokenError
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..database import get_db
-from . import constants, schemas, service
+from . import exceptions, schemas, service
 
 router = APIRouter(
     prefix = "",
@@ -14,28 +14,37 @@ router = APIRouter(
 )
 
 @router.post("/token")
-async def login_for_access_and_refresh_token(form_data: Annotated[OAuth2PasswordRequestForm, Depends()], db: Session = Depends(get_db)):
+async def login_for_access_and_refresh_token(form_data: Annotated[OAuth2PasswordRequestForm, Depends()], db: AsyncSession = Depends(get_db)):
     #authenticate user
-    user = service.authenticate_user(entered_email=form_data.username, entered_password=form_data.password, db=db)
+    user = await service.authenticate_user(entered_email=form_data.username, entered_password=form_data.password, db=db)
     if not user:
         raise HTTPException(status_code=400, detail="Incorrect username or password")
     
-    '''Create Access Token'''
-    access_token_expire_duration = timedelta(weeks=constants.ACCESS_TOKEN_EXPIRE_WEEKS)
-    access_token = service.create_access_token(
-        payload = {"email": form_data.username, "scope": user.status},
-        expires_delta = access_token_expire_duration
-    )
+    #login starts a new session, renewals go through /token/refresh without hashing the password again
+    await service.delete_expired_refresh_tokens(user_id=user.id, db=db)
+    token = service.create_token_pair(user=user, db=db)
+    await db.commit()
 
-    '''Create Refresh Token'''
-    refresh_token_expire_duration = timedelta(weeks=constants.REFRESH_TOKEN_EXPIRE_WEEKS)
-    refresh_token = service.create_refresh_token(
-        payload = {"email": form_data.username, "scope": user.status},
-        expires_delta = refresh_token_expire_duration
-    )
-    token = {
-        "access_token" : access_token,
-        "refresh_token" : refresh_token,
-        "token_type" : "bearer"
-    }
     return schemas.Token(**token)
+
+@router.post("/token/refresh")
+async def refresh_access_token(body: schemas.RefreshTokenRequest, db: AsyncSession = Depends(get_db)):
+    """
+    Exchange a refresh token for a new access and refresh token, the presented refresh token stops working.
+    """
+    token = await service.rotate_refresh_token(refresh_token=body.refresh_token, db=db)
+    if token is None:
+        raise exceptions.credentials_exception("Could not validate refresh token", "Bearer")
+    return schemas.Token(**token)
+
+@router.post("/token/revoke")
+async def revoke_refresh_token(body: schemas.RefreshTokenRequest, db: AsyncSession = Depends(get_db)):
+    """
+    Log out: revoke the session of a refresh token. Its access tokens stay valid until they expire.
+    """
+    try:
+        payload = service.decode_refresh_token(body.refresh_token)
+    except InvalidTokenError:
+        raise exceptions.credentials_exception("Could not validate refresh token", "Bearer")
+    await service.revoke_token_family(family=payload["fam"], db=db)
+    return {"message": "Refresh token revoked"}
@@ -4,4 +4,6 @@ class Token(BaseModel):
     access_token: str
     refresh_token: str
     token_type: str
-    
+
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
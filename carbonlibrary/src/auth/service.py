@@ -1,45 +1,178 @@
+import asyncio
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone, timedelta
 
 import jwt
+from jwt.exceptions import InvalidTokenError
 from passlib.context import CryptContext
-from sqlalchemy.orm import Session
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..user import crud
-from . import config
+from ..user import models as user_models
+from ..utils import TTLCache
+from . import config, constants, models
 
-#initializes a CryptContext for hashing (passlib)
-hash_context = CryptContext(schemes=[config.HASH_ALGORITHM])
+HASH_SCHEMES = [scheme.strip() for scheme in config.HASH_ALGORITHM.split(",")]
+
+def _hash_options() -> dict:
+    """
+    Cost settings of the configured schemes, min_* makes hashes below the current cost count as outdated.
+    """
+    options = {}
+    if "bcrypt" in HASH_SCHEMES:
+        options.update(bcrypt__rounds=config.HASH_BCRYPT_ROUNDS, bcrypt__min_rounds=config.HASH_BCRYPT_ROUNDS)
+    if "argon2" in HASH_SCHEMES:
+        options.update(argon2__time_cost=config.HASH_ARGON2_TIME_COST, argon2__memory_cost=config.HASH_ARGON2_MEMORY_COST)
+    return options
+
+#initializes a CryptContext for hashing (passlib), every scheme but the first is deprecated
+hash_context = CryptContext(schemes=HASH_SCHEMES, deprecated="auto", **_hash_options())
+
+#bcrypt and argon2 release the GIL, a small dedicated pool keeps them off the event loop
+#without competing with the shared threadpool used by sync routes
+_hash_executor: ThreadPoolExecutor | None = None
+
+def get_hash_executor() -> ThreadPoolExecutor:
+    global _hash_executor
+    if _hash_executor is None:
+        _hash_executor = ThreadPoolExecutor(max_workers=config.HASH_WORKERS, thread_name_prefix="password-hash")
+    return _hash_executor
 
 #hash password with passlib
-def hash_password(password: str):
-    return hash_context.hash(password)
+async def hash_password(password: str) -> str:
+    return await asyncio.get_running_loop().run_in_executor(get_hash_executor(), hash_context.hash, password)
 
-def verify_hashed_password(password: str, hashed_password: str):
-    return hash_context.verify(password, hashed_password)
+async def verify_hashed_password(password: str, hashed_password: str) -> tuple[bool, str | None]:
+    """
+    :return: Return whether the password matches, and a replacement hash when the stored one is outdated.
+    """
+    return await asyncio.get_running_loop().run_in_executor(
+        get_hash_executor(), hash_context.verify_and_update, password, hashed_password
+    )
 
-def authenticate_user(db: Session, entered_email: str, entered_password: str):
-    db_user = crud.get_user_by_email(db=db, email=entered_email)
+async def authenticate_user(db: AsyncSession, entered_email: str, entered_password: str):
+    db_user = await crud.get_user_by_email(db=db, email=entered_email)
     if not db_user:
         return False
-    if not verify_hashed_password(entered_password, db_user.hashed_password):
+    is_valid, new_hashed_password = await verify_hashed_password(entered_password, db_user.hashed_password)
+    if not is_valid:
         return False
+    #transparently upgrade hashes made with an old scheme or cost
+    if new_hashed_password:
+        db_user.hashed_password = new_hashed_password
+        await db.commit()
     return db_user
     
-def create_access_token(payload: dict, expires_delta: timedelta = timedelta(days=1)):
+def create_access_token(payload: dict, expires_delta: timedelta = timedelta(minutes=constants.ACCESS_TOKEN_EXPIRE_MINUTES)):
     expire_date = datetime.now(tz=timezone.utc) + expires_delta
-    payload.update({"exp": expire_date})
+    payload.update({"exp": expire_date, "typ": "access"})
     
     encoded_jwt = jwt.encode(payload, config.SECRET_KEY, config.JWT_ALGORITHM)
 
     return encoded_jwt
 
-def create_refresh_token(payload: dict, expires_delta: timedelta = timedelta(weeks=26)):
+def create_refresh_token(payload: dict, expires_delta: timedelta = timedelta(weeks=constants.REFRESH_TOKEN_EXPIRE_WEEKS)):
     expire_date = datetime.now(tz=timezone.utc) + expires_delta
-    payload.update({"exp": expire_date})
+    payload.update({"exp": expire_date, "typ": "refresh"})
 
     encoded_jwt = jwt.encode(payload, config.SECRET_KEY, config.JWT_ALGORITHM)
 
     return encoded_jwt
 
 
+#families revoked by this worker, a replayed token of theirs is turned away without a query
+revoked_families = TTLCache(
+    maxsize=constants.REVOKED_FAMILY_CACHE_SIZE,
+    ttl=timedelta(weeks=constants.REFRESH_TOKEN_EXPIRE_WEEKS).total_seconds(),
+)
+
+def create_token_pair(user: user_models.User, db: AsyncSession, family: str | None = None) -> dict:
+    """
+    Create an access token and a refresh token for a user, the refresh token is stored but not committed.
+
+    :param user: User the tokens are issued to, its status becomes the token scope.
+    :param family: Token family of the session, None starts a new session.
+    :param db: Database session.
+    :return: Return the Token fields.
+    """
+    access_token = create_access_token(payload={"email": user.email, "scope": user.status})
+
+    jti = uuid.uuid4().hex
+    family = family or uuid.uuid4().hex
+    expires_delta = timedelta(weeks=constants.REFRESH_TOKEN_EXPIRE_WEEKS)
+    refresh_token = create_refresh_token(
+        payload={"email": user.email, "jti": jti, "fam": family},
+        expires_delta=expires_delta,
+    )
+    db.add(models.RefreshToken(jti=jti, family=family, user_id=user.id, expires_at=datetime.now(tz=timezone.utc) + expires_delta))
+
+    return {
+        "access_token": access_token,
+        "refresh_token": refresh_token,
+        "token_type": "bearer",
+    }
+
+def decode_refresh_token(refresh_token: str) -> dict:
+    """
+    :raises InvalidTokenError: If the token is not a valid refresh token.
+    """
+    payload = jwt.decode(refresh_token, config.SECRET_KEY, config.JWT_ALGORITHM, options={"require": ["exp", "jti", "fam"]})
+    if payload.get("typ") != "refresh":
+        raise InvalidTokenError("Not a refresh token")
+    return payload
+
+async def rotate_refresh_token(db: AsyncSession, refresh_token: str) -> dict | None:
+    """
+    Exchange a refresh token for a new token pair of the same family.
+
+    A refresh token is single use. Presenting one that was already rotated means it leaked, and the
+    whole family is revoked, logging out both the thief and the owner.
+
+    :return: Return the Token fields, None if the token is invalid, reused or revoked.
+    """
+    try:
+        payload = decode_refresh_token(refresh_token)
+    except InvalidTokenError:
+        return None
+    family = payload["fam"]
+    if revoked_families.get(family):
+        return None
+
+    #only one request can consume a token, a concurrent or later replay finds no row
+    user_id = (await db.execute(
+        delete(models.RefreshToken).where(models.RefreshToken.jti == payload["jti"]).returning(models.RefreshToken.user_id)
+    )).scalar()
+    if user_id is None:
+        await revoke_token_family(db=db, family=family)
+        return None
+
+    user = await db.get(user_models.User, user_id)
+    if user is None or not user.is_active:
+        await revoke_token_family(db=db, family=family)
+        return None
+
+    token = create_token_pair(user=user, family=family, db=db)
+    await db.commit()
+    return token
+
+async def revoke_token_family(db: AsyncSession, family: str):
+    """
+    Revoke every refresh token of a session.
+    """
+    await db.execute(delete(models.RefreshToken).where(models.RefreshToken.family == family))
+    await db.commit()
+    revoked_families.set(family, True)
+
+async def delete_expired_refresh_tokens(db: AsyncSession, user_id: int):
+    """
+    Drop the sessions of a user that ran out without being revoked.
+    """
+    await db.execute(
+        delete(models.RefreshToken)
+        .where(models.RefreshToken.user_id == user_id, models.RefreshToken.expires_at <= datetime.now(tz=timezone.utc))
+    )
+
+
 #VALIDATE TOKEN FUNCTION expired and 
\ No newline at end of file
@@ -1,10 +1,14 @@
 import boto3
 import os 
 
+from ..metrics.instrumentation import instrument_boto_client
+
 s3_client = boto3.client(
     service_name ="s3",
     endpoint_url = os.environ.get("CLOUDFLARE_R2_ENDPOINT"),
     aws_access_key_id = os.environ.get("CLOUDFLARE_R2_ACCESS_KEY_ID"),
     aws_secret_access_key = os.environ.get("CLOUDFLARE_R2_SECRET_KEY"),
     region_name="auto",
-)
\ No newline at end of file
+)
+# R2 call latency, see /metrics
+instrument_boto_client(s3_client, "r2")
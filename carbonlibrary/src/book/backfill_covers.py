@@ -0,0 +1,64 @@
+"""
+Generate the cover renditions of books uploaded before the rendition pipeline existed.
+
+Usage (from the carbonlibrary directory):
+    python -m src.book.backfill_covers [--force]
+"""
+import argparse
+import asyncio
+
+from sqlalchemy import select
+
+from ..database import SessionLocal
+from ..storage.backends import get_storage
+from ..user import models as user_models  # registers User for the Book.loan_to_user relationship
+from . import constants, covers, models
+
+
+def _missing_renditions(storage, digest: str) -> bool:
+    return not all(
+        storage.exists(covers.rendition_key(digest, size, image_format))
+        for size in constants.COVER_RENDITION_SIZES
+        for image_format in constants.COVER_RENDITION_FORMATS
+    )
+
+async def backfill(force: bool = False) -> int:
+    """
+    Render and store every missing rendition, covers are processed in parallel by the rendition pool.
+
+    :param force: Regenerate renditions that already exist.
+    :return: Return the number of covers rendered.
+    """
+    storage = get_storage()
+    async with SessionLocal() as db:
+        digests = (await db.execute(
+            select(models.Book.cover_hash).where(models.Book.cover_hash.is_not(None)).distinct()
+        )).scalars().all()
+
+    semaphore = asyncio.Semaphore(constants.COVER_RENDITION_WORKERS * 2)
+    rendered = 0
+
+    async def render(digest: str):
+        nonlocal rendered
+        async with semaphore:
+            if not force and not await asyncio.to_thread(_missing_renditions, storage, digest):
+                return
+            content = await asyncio.to_thread(covers.load_cover, storage, digest)
+            if content is None:
+                print(f"missing original cover {digest}")
+                return
+            try:
+                await covers.generate_renditions(storage, digest, content)
+            except covers.IMAGE_ERRORS as e:
+                print(f"failed to render cover {digest}: {e}")
+                return
+            rendered += 1
+
+    await asyncio.gather(*(render(digest) for digest in digests))
+    return rendered
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--force", action="store_true", help="regenerate existing renditions")
+    args = parser.parse_args()
+    print(f"rendered {asyncio.run(backfill(force=args.force))} covers")
@@ -0,0 +1,54 @@
+"""
+Keys and serializers of the book reads served through cache.service.ReadThroughCache.
+"""
+import orjson
+
+from ..cache.service import ReadThroughCache
+from ..utils import dump_json
+from . import models, schemas
+
+# every cached listing follows this one version, any write to books makes all pages stale
+BOOK_LISTS_KEY = "books:lists"
+
+
+def book_key(book_id: int) -> str:
+    return f"book:{book_id}"
+
+def book_alias_key(isbn_or_id: str) -> str:
+    """
+    Key of the book ID an /retrieve/{isbn_or_id} path resolves to. It follows BOOK_LISTS_KEY, as any
+    write may change an ISBN or add a book.
+    """
+    return f"book:alias:{isbn_or_id}"
+
+def book_list_key(skip: int, limit: int) -> str:
+    return f"books:list:{skip}:{limit}"
+
+def book_summary_list_key(skip: int, limit: int) -> str:
+    return f"books:summary:{skip}:{limit}"
+
+def pack_response(headers: dict, content: bytes) -> bytes:
+    """
+    Cache a body together with its response headers (ETag, Last-Modified, Cache-Control), both come from
+    the same database read, so a hit answers conditional requests without asking the database.
+    """
+    return orjson.dumps(headers) + b"\n" + content
+
+def unpack_response(value: bytes) -> tuple[dict, bytes]:
+    headers, _, content = value.partition(b"\n")
+    return orjson.loads(headers), content
+
+def serialize_book(db_book: models.Book) -> bytes:
+    return dump_json(schemas.Book, db_book)
+
+def serialize_books(db_books: list[models.Book]) -> bytes:
+    return dump_json(list[schemas.Book], db_books)
+
+def serialize_book_summaries(summaries: list[dict]) -> bytes:
+    return dump_json(list[schemas.BookSummary], summaries)
+
+async def invalidate_books(cache: ReadThroughCache, ids: list[int] = ()):
+    """
+    Make the cached reads of the given books and every cached listing stale, after the write is committed.
+    """
+    await cache.invalidate(BOOK_LISTS_KEY, *(book_key(book_id) for book_id in ids))
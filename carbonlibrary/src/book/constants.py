@@ -0,0 +1,37 @@
+CURSOR_PAGE_SIZE_MAX = 100
+
+# listings need no login: browsers revalidate them every time, nginx may microcache them for a few seconds
+LIST_CACHE_CONTROL = "public, max-age=0, s-maxage=5"
+# book details need a login, only the browser may keep them, revalidating before every use
+BOOK_CACHE_CONTROL = "private, no-cache"
+
+# rows per upsert request, keeps one INSERT well below the 32767 bind parameter limit of Postgres
+BOOK_BATCH_SIZE_MAX = 1000
+
+# text search configuration of books.search_vector, see models.SEARCH_DDL
+SEARCH_CONFIG = "english"
+
+# bounding boxes (width, height) of the pre-computed cover renditions
+COVER_RENDITION_SIZES = {
+    "thumb": (120, 180),
+    "card": (240, 360),
+    "full": (800, 1200),
+}
+COVER_RENDITION_FORMATS = {
+    "webp": "image/webp",
+    "jpeg": "image/jpeg",
+}
+COVER_RENDITION_QUALITY = 82
+# largest cover accepted by /update/cover
+COVER_MAX_SIZE = 10_000_000
+COVER_RENDITION_WORKERS = 2
+
+# bytes per chunk of a streamed PDF response, bounds the memory of a download whatever the file size
+PDF_CHUNK_SIZE = 64 * 1024
+# largest PDF accepted by /upload/bookpdf
+PDF_MAX_SIZE = 100_000_000
+
+# rows fetched from the server-side cursor and encoded per chunk of a catalogue export
+EXPORT_BATCH_SIZE = 1000
+# zlib level of a gzipped export, low levels keep the compression from bounding the download speed
+EXPORT_GZIP_LEVEL = 5
@@ -0,0 +1,180 @@
+import asyncio
+import hashlib
+import io
+from concurrent.futures import ProcessPoolExecutor
+
+from fastapi.concurrency import run_in_threadpool
+from PIL import Image, ImageOps
+
+from ..storage.backends import StorageBackend
+from . import constants
+
+# magic number prefixes of the image formats accepted as covers
+IMAGE_SIGNATURES = (
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+)
+
+# what decoding a bad upload raises: ValueError for unsupported types, OSError subclasses for truncated
+# or undecodable images, DecompressionBombError (not an OSError) past Image.MAX_IMAGE_PIXELS
+IMAGE_ERRORS = (ValueError, OSError, Image.DecompressionBombError)
+
+def sniff_media_type(content: bytes) -> str | None:
+    """
+    Detect the image type from its leading bytes instead of trusting the upload's content type.
+
+    :param content: Image content in bytes.
+    :return: Return MIME type if the content is a supported image, else None.
+    """
+    for signature, media_type in IMAGE_SIGNATURES:
+        if content.startswith(signature):
+            return media_type
+    if content[:4] == b"RIFF" and content[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+def cover_digest(content: bytes) -> str:
+    """
+    Content address of a cover, identical images share one stored object.
+    """
+    return hashlib.sha256(content).hexdigest()
+
+def cover_key(digest: str) -> str:
+    """
+    Storage key of the original cover, fanned out by the first two hex digits.
+    """
+    return f"covers/{digest[:2]}/{digest}/original"
+
+def save_cover(storage: StorageBackend, content: bytes) -> str:
+    """
+    Store a cover under its content hash, skipping the upload when it already exists.
+
+    :param storage: Storage backend.
+    :param content: Image content in bytes.
+    :return: Return the cover digest.
+    :raises ValueError: If the content is not a supported image.
+    """
+    media_type = sniff_media_type(content)
+    if not media_type:
+        raise ValueError("Unsupported image type")
+
+    digest = cover_digest(content)
+    key = cover_key(digest)
+    if not storage.exists(key):
+        storage.put(key, content, content_type=media_type)
+    return digest
+
+def load_cover(storage: StorageBackend, digest: str) -> bytes | None:
+    """
+    Read an original cover from storage.
+
+    :param storage: Storage backend.
+    :param digest: Cover digest.
+    :return: Return image content if stored, else None.
+    """
+    return storage.get(cover_key(digest))
+
+def rendition_key(digest: str, size: str, image_format: str) -> str:
+    """
+    Storage key of a cover rendition, stored next to the original.
+    """
+    return f"covers/{digest[:2]}/{digest}/{size}.{image_format}"
+
+def render_renditions(content: bytes) -> dict[tuple[str, str], bytes]:
+    """
+    Resize a cover into every rendition size and format.
+
+    CPU bound, meant to run in the rendition process pool.
+
+    :param content: Original image content in bytes.
+    :return: Return {(size, format): encoded image}.
+    """
+    with Image.open(io.BytesIO(content)) as original:
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ("RGB", "RGBA"):
+            has_alpha = image.mode in ("LA", "PA") or "transparency" in image.info
+            image = image.convert("RGBA" if has_alpha else "RGB")
+
+        renditions = {}
+        for size, bounding_box in constants.COVER_RENDITION_SIZES.items():
+            resized = image.copy()
+            # thumbnail keeps the aspect ratio and never upscales
+            resized.thumbnail(bounding_box, Image.Resampling.LANCZOS)
+            for image_format in constants.COVER_RENDITION_FORMATS:
+                if image_format == "jpeg" and resized.mode == "RGBA":
+                    flattened = Image.new("RGB", resized.size, (255, 255, 255))
+                    flattened.paste(resized, mask=resized.getchannel("A"))
+                else:
+                    flattened = resized
+                buffer = io.BytesIO()
+                flattened.save(buffer, format=image_format.upper(), quality=constants.COVER_RENDITION_QUALITY, optimize=True)
+                renditions[(size, image_format)] = buffer.getvalue()
+    return renditions
+
+_rendition_pool: ProcessPoolExecutor | None = None
+
+def get_rendition_pool() -> ProcessPoolExecutor:
+    """
+    Return the process pool shared by the rendition jobs of this worker.
+    """
+    global _rendition_pool
+    if _rendition_pool is None:
+        _rendition_pool = ProcessPoolExecutor(max_workers=constants.COVER_RENDITION_WORKERS)
+    return _rendition_pool
+
+def store_renditions(storage: StorageBackend, digest: str, renditions: dict[tuple[str, str], bytes]) -> None:
+    """
+    Write the output of render_renditions next to the original cover.
+    """
+    for (size, image_format), rendition in renditions.items():
+        storage.put(
+            rendition_key(digest, size, image_format),
+            rendition,
+            content_type=constants.COVER_RENDITION_FORMATS[image_format],
+        )
+
+async def generate_renditions(storage: StorageBackend, digest: str, content: bytes) -> None:
+    """
+    Render a cover in the process pool and store the renditions, without blocking the event loop.
+
+    :param storage: Storage backend.
+    :param digest: Cover digest.
+    :param content: Original image content in bytes.
+    """
+    loop = asyncio.get_running_loop()
+    renditions = await loop.run_in_executor(get_rendition_pool(), render_renditions, content)
+    await run_in_threadpool(store_renditions, storage, digest, renditions)
+
+async def store_cover(storage: StorageBackend, content: bytes) -> str:
+    """
+    Render an uploaded cover, then store the original and its renditions.
+
+    Rendering decodes the whole image, so nothing is written for an upload that is not one.
+
+    :param storage: Storage backend.
+    :param content: Image content in bytes.
+    :return: Return the cover digest.
+    :raises ValueError: If the content is not a supported image.
+    :raises OSError: If the image cannot be decoded.
+    :raises Image.DecompressionBombError: If the image is too large to decode.
+    """
+    if not sniff_media_type(content):
+        raise ValueError("Unsupported image type")
+    loop = asyncio.get_running_loop()
+    renditions = await loop.run_in_executor(get_rendition_pool(), render_renditions, content)
+
+    def write() -> str:
+        digest = save_cover(storage, content)
+        store_renditions(storage, digest, renditions)
+        return digest
+    return await run_in_threadpool(write)
+
+def load_rendition(storage: StorageBackend, digest: str, size: str, image_format: str) -> bytes | None:
+    """
+    Read a cover rendition from storage.
+
+    :return: Return image content if the rendition was generated, else None.
+    """
+    return storage.get(rendition_key(digest, size, image_format))
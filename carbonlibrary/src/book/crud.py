@@ -1,12 +1,38 @@
-import base64
+import datetime
 
-from sqlalchemy import or_, select
-from sqlalchemy.orm import Session
+from sqlalchemy import (Row, and_, func, literal, literal_column, or_, select,
+                        tuple_, update)
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from . import models, schemas
+from ..loan import crud as crud_loans
+from ..user import models as user_models
+from . import constants, models, schemas
 
+# keyset sort keys, each one is paired with Book.id as a tie-breaker so the ordering is total
+SORT_COLUMNS = {
+    schemas.BookSort.ID: models.Book.id,
+    schemas.BookSort.TITLE: models.Book.title,
+    schemas.BookSort.ADDED_DATE: models.Book.added_date,
+}
 
-def get_book_by_id(db: Session, book_id: int) -> models.Book | None:
+# columns served by the catalogue grid, must stay in sync with schemas.BookSummary
+SUMMARY_COLUMNS = (
+    models.Book.id,
+    models.Book.title,
+    models.Book.author,
+    models.Book.isbn,
+    models.Book.subtitle,
+    models.Book.publisher,
+    models.Book.language,
+    models.Book.added_date,
+    models.Book.is_borrowed,
+    models.Book.cover_hash,
+)
+
+
+async def get_book_by_id(db: AsyncSession, book_id: int) -> models.Book | None:
     """
     Retrieve a book by its ID.
 
@@ -14,9 +40,9 @@ def get_book_by_id(db: Session, book_id: int) -> models.Book | None:
     :param db: Database session.
     :return: Return book object if found, else None.
     """
-    return db.execute(select(models.Book).where(models.Book.id == book_id)).scalars().first()
+    return (await db.execute(select(models.Book).where(models.Book.id == book_id))).scalars().first()
 
-def get_book_by_isbn(db: Session, isbn: str) -> models.Book | None:  
+async def get_book_by_isbn(db: AsyncSession, isbn: str) -> models.Book | None:  
     """
     Retrieve a book by its ISBN.
 
@@ -24,9 +50,18 @@ def get_book_by_isbn(db: Session, isbn: str) -> models.Book | None:
     :param db: Database session.
     :return: Return book object if found, else None.
     """ 
-    return db.execute(select(models.Book).where(models.Book.isbn == isbn)).scalars().first()
+    return (await db.execute(select(models.Book).where(models.Book.isbn == isbn))).scalars().first()
+
+def _parse_book_id(isbn_or_id: str) -> int | None:
+    """
+    Read an ISBN-or-ID path value as a book ID, None if it cannot be one (not numeric, or past the integer column).
+    """
+    if not (isbn_or_id.isascii() and isbn_or_id.isdigit()):
+        return None
+    book_id = int(isbn_or_id)
+    return book_id if book_id < 2**31 else None
 
-def get_book_by_isbn_or_id(db: Session, isbn_or_id: str) -> models.Book | None:
+async def get_book_by_isbn_or_id(db: AsyncSession, isbn_or_id: str) -> models.Book | None:
     """
     Retrieve a book by its ISBN or ID.
 
@@ -34,9 +69,29 @@ def get_book_by_isbn_or_id(db: Session, isbn_or_id: str) -> models.Book | None:
     :param db: Database session.
     :return: Return book object if found, else None.
     """
-    return db.execute(select(models.Book).where(or_(models.Book.isbn == isbn_or_id, models.Book.id == int(isbn_or_id)))).scalars().first()
+    #two lookups instead of one OR, so each one can use its own index
+    db_book = await get_book_by_isbn(db=db, isbn=isbn_or_id)
+    book_id = _parse_book_id(isbn_or_id)
+    if db_book is None and book_id is not None:
+        db_book = await get_book_by_id(db=db, book_id=book_id)
+    return db_book
+
+async def get_book_version_by_isbn_or_id(db: AsyncSession, isbn_or_id: str) -> Row | None:
+    """
+    Retrieve the validators of a book by its ISBN or ID, enough to answer a conditional request.
+
+    :param isbn_or_id: ISBN or ID of the book.
+    :param db: Database session.
+    :return: Return row with id, version and updated_at if found, else None.
+    """
+    query = select(models.Book.id, models.Book.version, models.Book.updated_at)
+    row = (await db.execute(query.where(models.Book.isbn == isbn_or_id))).first()
+    book_id = _parse_book_id(isbn_or_id)
+    if row is None and book_id is not None:
+        row = (await db.execute(query.where(models.Book.id == book_id))).first()
+    return row
 
-def get_books(db: Session, skip: int = 0, limit: int = 20) -> list[models.Book]:
+async def get_books(db: AsyncSession, skip: int = 0, limit: int = 20) -> list[models.Book]:
     """
     Retrieve a list of books with pagination.
 
@@ -45,15 +100,101 @@ def get_books(db: Session, skip: int = 0, limit: int = 20) -> list[models.Book]:
     :param db: Database session.
     :return: List of books.
     """
-    return db.execute(select(models.Book).offset(skip).limit(limit)).scalars().all()
+    return (await db.execute(select(models.Book).order_by(models.Book.id).offset(skip).limit(limit))).scalars().all()
+
+def _paginate_by_cursor(query, sort: schemas.BookSort, after: list | None):
+    """
+    Order a books query by (sort key, id) and start it strictly after the given position,
+    so the database seeks through the index instead of scanning and discarding skipped rows.
+    """
+    sort_column = SORT_COLUMNS[sort]
+
+    if sort == schemas.BookSort.ID:
+        query = query.order_by(models.Book.id)
+        if after:
+            query = query.where(models.Book.id > after[1])
+    else:
+        query = query.order_by(sort_column, models.Book.id)
+        if after:
+            sort_value = after[0]
+            if sort == schemas.BookSort.ADDED_DATE:
+                sort_value = datetime.date.fromisoformat(sort_value)
+            query = query.where(tuple_(sort_column, models.Book.id) > tuple_(sort_value, after[1]))
+
+    return query
+
+async def get_books_by_cursor(db: AsyncSession, sort: schemas.BookSort = schemas.BookSort.ID, after: list | None = None, limit: int = 20) -> list[models.Book]:
+    """
+    Retrieve a list of books with keyset pagination.
+
+    :param sort: Column to order by.
+    :param after: [sort value, id] of the last book of the previous page, None for the first page.
+    :param limit: Number of books to retrieve.
+    :param db: Database session.
+    :return: List of books.
+    """
+    query = _paginate_by_cursor(select(models.Book), sort=sort, after=after)
+    return (await db.execute(query.limit(limit))).scalars().all()
+
+def _select_book_summaries():
+    # listing columns only, the description is never read from the row
+    return select(*SUMMARY_COLUMNS)
+
+async def get_book_summaries(db: AsyncSession, skip: int = 0, limit: int = 20) -> list[Row]:
+    """
+    Retrieve a list of book summaries with pagination.
+
+    :param skip: Number of books to skip.
+    :param limit: Number of books to retrieve.
+    :param db: Database session.
+    :return: List of rows with the summary columns.
+    """
+    return (await db.execute(_select_book_summaries().order_by(models.Book.id).offset(skip).limit(limit))).all()
+
+async def get_book_summaries_by_cursor(db: AsyncSession, sort: schemas.BookSort = schemas.BookSort.ID, after: list | None = None, limit: int = 20) -> list[Row]:
+    """
+    Retrieve a list of book summaries with keyset pagination.
+
+    :param sort: Column to order by.
+    :param after: [sort value, id] of the last book of the previous page, None for the first page.
+    :param limit: Number of books to retrieve.
+    :param db: Database session.
+    :return: List of rows with the summary columns.
+    """
+    query = _paginate_by_cursor(_select_book_summaries(), sort=sort, after=after)
+    return (await db.execute(query.limit(limit))).all()
+
+async def get_book_summary_by_isbn_or_id(db: AsyncSession, isbn_or_id: str) -> Row | None:
+    """
+    Retrieve a book summary by its ISBN or ID.
+
+    :param isbn_or_id: ISBN or ID of the book to retrieve.
+    :param db: Database session.
+    :return: Return row with the summary columns if found, else None.
+    """
+    row = (await db.execute(_select_book_summaries().where(models.Book.isbn == isbn_or_id))).first()
+    book_id = _parse_book_id(isbn_or_id)
+    if row is None and book_id is not None:
+        row = (await db.execute(_select_book_summaries().where(models.Book.id == book_id))).first()
+    return row
+
+def book_cursor_key(book: models.Book | Row, sort: schemas.BookSort) -> list:
+    """
+    Build the keyset position of a book for the given sort.
 
-def create_book(db: Session, book: schemas.BookCreate) -> models.Book | None:
+    :param book: Book object or summary row.
+    :param sort: Column the page is ordered by.
+    :return: [sort value, id]
+    """
+    return [getattr(book, sort.value), book.id]
+
+async def create_book(db: AsyncSession, book: schemas.BookCreate) -> models.Book | None:
     """
     Create a new book.
 
     :param book: Book pydantic object
     :param db: Database session.
-    :return: Return book object if created, else None.
+    :return: Return book object if created, None if a book with the same ISBN exists.
     """
     #PYDANTIC SCHEMASas - PYTHON DICT- SQLALCHEMY MODELS
     #convert pydantic model to python dict
@@ -62,12 +203,66 @@ def create_book(db: Session, book: schemas.BookCreate) -> models.Book | None:
     db_book = models.Book(**book_dict)
 
     db.add(db_book)
-    db.commit()
-    db.refresh(db_book)
+    try:
+        await db.commit()
+    except IntegrityError:
+        # uq_books_isbn, a concurrent create won between the caller's check and this insert
+        await db.rollback()
+        return None
+    await db.refresh(db_book)
 
     return db_book
 
-def update_book(db: Session, book_id: int, book: schemas.BookUpdate | None = None) -> models.Book | None:
+async def upsert_books(db: AsyncSession, books: list[schemas.BookCreate]) -> list[tuple[int, str, bool]]:
+    """
+    Create or update books matched by ISBN with INSERT ... ON CONFLICT (isbn) DO UPDATE.
+
+    Rows are grouped by the fields they set, so a homogeneous batch is a single statement. Fields a row
+    leaves unset keep their stored value on update. ISBNs must be unique within the batch.
+
+    :param books: Book pydantic objects.
+    :param db: Database session.
+    :return: Return (id, isbn, created) of every upserted book.
+    """
+    postgres = db.get_bind().dialect.name == "postgresql"
+    insert = postgresql.insert if postgres else sqlite.insert
+
+    groups: dict[tuple, list[dict]] = {}
+    for book in books:
+        row = book.model_dump(exclude_unset=True)
+        groups.setdefault(tuple(sorted(row)), []).append(row)
+
+    existing = set()
+    if not postgres:
+        # no xmax outside Postgres, tell inserts from updates up front, inside the same transaction
+        existing = set((await db.execute(
+            select(models.Book.isbn).where(models.Book.isbn.in_([book.isbn for book in books]))
+        )).scalars())
+
+    upserted = []
+    for fields, rows in groups.items():
+        statement = insert(models.Book).values(rows)
+        statement = statement.on_conflict_do_update(
+            index_elements=[models.Book.isbn],
+            set_={
+                **{field: statement.excluded[field] for field in fields if field != "isbn"},
+                # onupdate is not applied to ON CONFLICT updates
+                "version": models.Book.version + 1,
+                "updated_at": func.now(),
+            },
+        )
+        if postgres:
+            # a row written by this statement's insert has no deleting transaction yet
+            statement = statement.returning(models.Book.id, models.Book.isbn, literal_column("xmax = 0"))
+            upserted.extend(tuple(row) for row in await db.execute(statement))
+        else:
+            statement = statement.returning(models.Book.id, models.Book.isbn)
+            upserted.extend((book_id, isbn, isbn not in existing) for book_id, isbn in await db.execute(statement))
+    await db.commit()
+
+    return upserted
+
+async def update_book(db: AsyncSession, book_id: int, book: schemas.BookUpdate | None = None) -> models.Book | None:
     """
     Update an existing book.
     
@@ -77,7 +272,7 @@ def update_book(db: Session, book_id: int, book: schemas.BookUpdate | None = Non
     :return: Return updated book object if successful, else None.
     
     """
-    query_book = get_book_by_id(db=db, book_id=book_id)
+    query_book = await get_book_by_id(db=db, book_id=book_id)
 
     if book:
         #convert pydantic model to python dict
@@ -89,12 +284,70 @@ def update_book(db: Session, book_id: int, book: schemas.BookUpdate | None = Non
                 setattr(query_book, key, value)
 
     db.add(query_book)
-    db.commit()
-    db.refresh(query_book)
+    await db.commit()
+    await db.refresh(query_book)
 
     return query_book
 
-def delete_book(db: Session, book_id: int) -> dict | None:
+async def borrow_book(db: AsyncSession, book_id: int, email: str) -> models.Book | None:
+    """
+    Lend a book to a user with one conditional UPDATE, concurrent borrows of the same book cannot both win.
+    A book with a hold queue only goes to the user first in line. The loan is recorded in the same transaction.
+
+    :param book_id: ID of the book to borrow.
+    :param email: Email of the borrowing user.
+    :param db: Database session.
+    :return: Return the borrowed book, None if the book or user does not exist, the book is already borrowed or held for someone else.
+    """
+    now = datetime.datetime.now(tz=datetime.timezone.utc)
+    user_id = select(user_models.User.id).where(user_models.User.email == email).scalar_subquery()
+    queue_head = crud_loans.queue_head_user_id(book_id)
+    query = (
+        update(models.Book)
+        .where(
+            models.Book.id == book_id,
+            models.Book.is_borrowed.is_(False),
+            user_id.is_not(None),
+            or_(queue_head.is_(None), queue_head == user_id),
+        )
+        .values(user_id=user_id, borrowed_date=now.date(), returned_date=None, is_borrowed=True)
+        .returning(models.Book)
+        .execution_options(synchronize_session=False)
+    )
+    db_book = (await db.execute(query)).scalars().first()
+    if db_book:
+        crud_loans.open_loan(book_id=book_id, user_id=db_book.user_id, now=now, db=db)
+        await crud_loans.close_hold(book_id=book_id, user_id=db_book.user_id, now=now, db=db)
+    await db.commit()
+
+    return db_book
+
+async def return_book(db: AsyncSession, book_id: int, email: str) -> models.Book | None:
+    """
+    Take a book back from the user who borrowed it with one conditional UPDATE, and close its loan.
+
+    :param book_id: ID of the book to return.
+    :param email: Email of the user returning it.
+    :param db: Database session.
+    :return: Return the returned book, None if the book is not borrowed by that user.
+    """
+    now = datetime.datetime.now(tz=datetime.timezone.utc)
+    user_id = select(user_models.User.id).where(user_models.User.email == email).scalar_subquery()
+    query = (
+        update(models.Book)
+        .where(models.Book.id == book_id, models.Book.is_borrowed.is_(True), models.Book.user_id == user_id)
+        .values(user_id=None, borrowed_date=None, returned_date=now.date(), is_borrowed=False)
+        .returning(models.Book)
+        .execution_options(synchronize_session=False)
+    )
+    db_book = (await db.execute(query)).scalars().first()
+    if db_book:
+        await crud_loans.close_loan(book_id=book_id, now=now, db=db)
+    await db.commit()
+
+    return db_book
+
+async def delete_book(db: AsyncSession, book_id: int) -> dict | None:
     """
     Delete a book by its ID.
     
@@ -102,32 +355,94 @@ def delete_book(db: Session, book_id: int) -> dict | None:
     :param db: Database session.
     :return: Return success message if deleted, else None.
     """
-    db_book = get_book_by_id(db=db, book_id=book_id)
+    db_book = await get_book_by_id(db=db, book_id=book_id)
 
-    db.delete(db_book)
-    db.commit()
+    await db.delete(db_book)
+    await db.commit()
 
     return {"message": "Book deleted successfully"}
 
-def update_book_cover(img_content: bytes, book_id: int, db: Session) -> dict | None:
+def _search_match_and_rank(db: AsyncSession, query: str):
+    """
+    Build the match condition and relevance score of a search query for the session's dialect.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        search_vector = literal_column("books.search_vector")
+        ts_query = func.websearch_to_tsquery(literal_column(f"'{constants.SEARCH_CONFIG}'::regconfig"), query)
+        # full-text hits use the GIN index on search_vector, typos are caught by the trigram indexes
+        match = or_(
+            search_vector.op("@@")(ts_query),
+            models.Book.title.op("%")(query),
+            models.Book.author.op("%")(query),
+        )
+        rank = func.ts_rank_cd(search_vector, ts_query) + func.greatest(
+            func.similarity(models.Book.title, query),
+            func.similarity(models.Book.author, query),
+        )
+        return match, rank
+
+    match = or_(*(
+        column.icontains(query, autoescape=True)
+        for column in (models.Book.title, models.Book.subtitle, models.Book.author, models.Book.subjects, models.Book.description)
+    ))
+    return match, literal(0.0)
+
+async def search_books(
+    db: AsyncSession,
+    query: str,
+    language: str | None = None,
+    publisher: str | None = None,
+    is_borrowed: bool | None = None,
+    after: list | None = None,
+    limit: int = 20) -> list[Row]:
+    """
+    Search books by title, subtitle, author, subjects and description, best match first.
+
+    :param query: Search text, web search syntax ("quoted phrases", -excluded, or).
+    :param language: Only books in this language.
+    :param publisher: Only books from this publisher.
+    :param is_borrowed: Only books with this loan state.
+    :param after: [rank, id] of the last book of the previous page, None for the first page.
+    :param limit: Number of books to retrieve.
+    :param db: Database session.
+    :return: List of rows with the summary columns and rank.
+    """
+    match, rank = _search_match_and_rank(db, query)
+
+    conditions = [match]
+    if language is not None:
+        conditions.append(models.Book.language == language)
+    if publisher is not None:
+        conditions.append(models.Book.publisher == publisher)
+    if is_borrowed is not None:
+        conditions.append(models.Book.is_borrowed == is_borrowed)
+
+    ranked = select(*SUMMARY_COLUMNS, rank.label("rank")).where(*conditions).subquery()
+    search_query = select(ranked).order_by(ranked.c.rank.desc(), ranked.c.id)
+    if after:
+        after_rank, after_id = float(after[0]), int(after[1])
+        search_query = search_query.where(or_(
+            ranked.c.rank < after_rank,
+            and_(ranked.c.rank == after_rank, ranked.c.id > after_id),
+        ))
+
+    return (await db.execute(search_query.limit(limit))).all()
+
+async def update_book_cover(cover_hash: str, book_id: int, db: AsyncSession) -> dict | None:
     """
-    Update the cover image of a book.
+    Point a book at a cover stored in the cover store.
     
-    :param img_content: Image content in bytes.
+    :param cover_hash: Digest returned by covers.save_cover.
     :param book_id: ID of the book to update.
     :param db: Database session.
     :return: Return success message if updated, else None.
     """
-    db_book = get_book_by_id(book_id=book_id, db=db)
+    db_book = await get_book_by_id(book_id=book_id, db=db)
 
-    # RAW BINARY DATA is difficult to handle and not compatible with JSON, so it is easier to convert RAW BINARY to utf-8 string first, if you want to store image in database
-    # Encode RAW BINARY to Base64 bytes(b'abcdef'), and convert to UTF-8 string ("ghijkl")
-    encoded_image_data = base64.b64encode(img_content).decode('utf-8')
-    # Store the encoded data to database of db_book
-    db_book.cover_image = encoded_image_data
+    db_book.cover_hash = cover_hash
     
     db.add(db_book)
-    db.commit()
-    db.refresh(db_book)
+    await db.commit()
+    await db.refresh(db_book)
     
     return {"message": "success upload"}
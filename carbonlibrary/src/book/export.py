@@ -0,0 +1,137 @@
+import csv
+import datetime
+import io
+import zlib
+from collections.abc import AsyncIterator, Iterable, Iterator
+
+import orjson
+from sqlalchemy import Select, and_, select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from ..loan import models as loan_models
+from ..user import models as user_models
+from . import constants, models, schemas
+
+# columns of every export, in file order
+BOOK_COLUMNS = (
+    models.Book.id,
+    models.Book.isbn,
+    models.Book.title,
+    models.Book.subtitle,
+    models.Book.author,
+    models.Book.edition,
+    models.Book.publisher,
+    models.Book.publish_date,
+    models.Book.publish_place,
+    models.Book.number_of_pages,
+    models.Book.language,
+    models.Book.lccn,
+    models.Book.subjects,
+    models.Book.description,
+    models.Book.cover_hash,
+    models.Book.added_date,
+    models.Book.version,
+    models.Book.updated_at,
+)
+# appended when the export includes the loan state
+LOAN_COLUMNS = (
+    models.Book.is_borrowed,
+    user_models.User.email.label("borrower_email"),
+    loan_models.Loan.borrowed_at,
+    loan_models.Loan.due_at,
+)
+
+MEDIA_TYPES = {
+    schemas.ExportFormat.CSV: "text/csv; charset=utf-8",
+    schemas.ExportFormat.NDJSON: "application/x-ndjson",
+}
+
+
+def export_query(include_loans: bool) -> Select:
+    """
+    Every book in ID order, with its open loan and borrower when `include_loans` is set.
+
+    Everything is read by this one statement, so the export is one consistent snapshot of the catalogue
+    however long the download takes: Postgres and SQLite both run a statement against a single snapshot.
+    """
+    if not include_loans:
+        return select(*BOOK_COLUMNS).order_by(models.Book.id)
+    return (
+        select(*BOOK_COLUMNS, *LOAN_COLUMNS)
+        .outerjoin(loan_models.Loan, and_(loan_models.Loan.book_id == models.Book.id, loan_models.OPEN_LOAN))
+        .outerjoin(user_models.User, user_models.User.id == loan_models.Loan.user_id)
+        .order_by(models.Book.id)
+    )
+
+def _csv_value(value):
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    return value
+
+def encode_csv(rows: Iterable, header: list[str] | None = None) -> bytes:
+    """
+    Encode a batch of rows as CSV lines, preceded by the header line when given.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(header)
+    writer.writerows([_csv_value(value) for value in row] for row in rows)
+    return buffer.getvalue().encode("utf-8")
+
+def encode_ndjson(rows: Iterable, header: list[str] | None = None) -> bytes:
+    """
+    Encode a batch of rows as one JSON object per line, orjson renders the dates in ISO 8601.
+    """
+    return b"".join(orjson.dumps(row._asdict(), option=orjson.OPT_APPEND_NEWLINE) for row in rows)
+
+ENCODERS = {
+    schemas.ExportFormat.CSV: encode_csv,
+    schemas.ExportFormat.NDJSON: encode_ndjson,
+}
+
+async def iter_export(session_factory: async_sessionmaker, export_format: schemas.ExportFormat, include_loans: bool) -> AsyncIterator[bytes]:
+    """
+    Stream the catalogue in chunks of EXPORT_BATCH_SIZE encoded rows.
+
+    The rows come from a server-side cursor (stream_results), so the memory of an export is one batch
+    whatever the size of the catalogue. The generator opens its own session: the response body is sent
+    after the request's get_db session is closed.
+    """
+    encode = ENCODERS[export_format]
+    query = export_query(include_loans).execution_options(yield_per=constants.EXPORT_BATCH_SIZE)
+    async with session_factory() as db:
+        result = await db.stream(query)
+        header = list(result.keys())
+        async for rows in result.partitions():
+            yield encode(rows, header)
+            header = None
+        #an empty catalogue still gets its CSV header
+        if header and export_format == schemas.ExportFormat.CSV:
+            yield encode([], header)
+
+async def gzip_chunks(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """
+    Compress a stream as one gzip member on the fly, each chunk is flushed so the client sees progress.
+    """
+    compressor = zlib.compressobj(constants.EXPORT_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    async for chunk in chunks:
+        yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+def accepts_gzip(accept_encoding: str | None) -> bool:
+    """
+    Whether an Accept-Encoding header allows gzip, "gzip;q=0" refuses it.
+    """
+    for coding in (accept_encoding or "").split(","):
+        name, _, params = coding.partition(";")
+        if name.strip().lower() not in ("gzip", "*"):
+            continue
+        try:
+            return float(params.strip().removeprefix("q=") or 1) > 0
+        except ValueError:
+            return False
+    return False
+
+def export_filename(export_format: schemas.ExportFormat, today: datetime.date | None = None) -> str:
+    return f"catalogue-{(today or datetime.date.today()).isoformat()}.{export_format.value}"
@@ -1,6 +1,7 @@
 import datetime
 
-from sqlalchemy import Boolean, Date, ForeignKey, LargeBinary, String
+from sqlalchemy import (DDL, Boolean, Date, DateTime, ForeignKey, Index,
+                        String, UniqueConstraint, event, func, text)
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from ..database import Base
@@ -9,6 +10,19 @@ from ..user import schemas
 
 class Book(Base):
     __tablename__ = "books"
+    # composite keys backing keyset pagination in crud.get_books_by_cursor
+    __table_args__ = (
+        Index("ix_books_title_id", "title", "id"),
+        Index("ix_books_added_date_id", "added_date", "id"),
+        # conflict target of crud.upsert_books, and the index of every ISBN lookup
+        UniqueConstraint("isbn", name="uq_books_isbn"),
+        # User.borrowed_books and the borrower checks
+        Index("ix_books_user_id", "user_id"),
+        # partial: only the few books out on loan
+        Index("ix_books_borrowed_id", "id", postgresql_where=text("is_borrowed"), sqlite_where=text("is_borrowed")),
+    )
+    # read the bumped version back with RETURNING instead of expiring it
+    __mapper_args__ = {"eager_defaults": True}
 
     id: Mapped[int] = mapped_column(primary_key=True)
     title: Mapped[str] = mapped_column(String(64))
@@ -18,14 +32,14 @@ class Book(Base):
     publisher: Mapped[str | None] = mapped_column(String(64))
     publish_date: Mapped[str | None] = mapped_column(String(64))
     publish_place: Mapped[str | None] = mapped_column(String(64))
-    number_of_pages: Mapped[str | None]
+    number_of_pages: Mapped[int | None]
     description: Mapped[str | None] = mapped_column(String(1024))
     language: Mapped[str | None] = mapped_column(String(32))
     lccn: Mapped[str | None] = mapped_column(String(12))
     subtitle: Mapped[str | None] = mapped_column(String(1024))
     subjects: Mapped[str | None] = mapped_column(String(256))
-    cover_image: Mapped[str | None] 
-    #cover_image: Mapped[bytes | None] = mapped_column(LargeBinary)
+    # sha256 of the original cover in the cover store, see book/covers.py
+    cover_hash: Mapped[str | None] = mapped_column(String(64))
 
     user_id: Mapped[int | None] = mapped_column(ForeignKey("users.id"))
     loan_to_user: Mapped["User"] = relationship(back_populates="borrowed_books")
@@ -36,6 +50,11 @@ class Book(Base):
 
     is_borrowed: Mapped[bool] = mapped_column(Boolean, default=False)
 
+    # bumped by every UPDATE, the ETag and Last-Modified of the book's responses (see router._book_validators),
+    # writes that bypass onupdate (ON CONFLICT DO UPDATE) must set them themselves
+    version: Mapped[int] = mapped_column(default=1, server_default=text("1"), onupdate=text("version + 1"))
+    updated_at: Mapped[datetime.datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
     def borrow(self, user: schemas.User):
         self.loan_to_user = user
         self.borrowed_date = datetime.date.today()
@@ -46,4 +65,25 @@ class Book(Base):
         self.loan_to_user = None
         self.borrowed_date = None
         self.returned_date = datetime.date.today()
-        self.is_borrowed = False
\ No newline at end of file
+        self.is_borrowed = False
+
+# Full-text search lives in an unmapped generated column so ORM loads never carry it.
+# Postgres only: other dialects (local SQLite stand-ins) fall back to LIKE in crud.search_books.
+SEARCH_DDL = (
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    """
+    ALTER TABLE books ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(author, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(subtitle, '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(subjects, '')), 'C') ||
+        setweight(to_tsvector('english', coalesce(description, '')), 'D')
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_books_search_vector ON books USING gin (search_vector)",
+    "CREATE INDEX IF NOT EXISTS ix_books_title_trgm ON books USING gin (title gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_books_author_trgm ON books USING gin (author gin_trgm_ops)",
+)
+
+for statement in SEARCH_DDL:
+    event.listen(Book.__table__, "after_create", DDL(statement).execute_if(dialect="postgresql"))
@@ -0,0 +1,51 @@
+from ..storage.backends import StorageBackend
+from . import constants
+
+
+def pdf_key(isbn: str) -> str:
+    """
+    Storage key of a book's PDF, the keys the R2 bucket has always used.
+    """
+    return f"{isbn}.pdf"
+
+def parse_range(range_header: str | None, size: int) -> tuple[int, int] | None:
+    """
+    Resolve a Range header against an object size.
+
+    Only a single byte range is honoured ("bytes=0-1023", "bytes=1024-", "bytes=-1024"), anything
+    else is answered with the whole object, as RFC 9110 allows a server to ignore Range.
+
+    :param range_header: Value of the Range header, None when absent.
+    :param size: Size of the object in bytes.
+    :return: Return the (start, end) inclusive byte positions, None to send the whole object.
+    :raises ValueError: If the range cannot be satisfied (416).
+    """
+    if not range_header:
+        return None
+    unit, _, ranges = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in ranges:
+        return None
+    first, dash, last = (part.strip() for part in ranges.partition("-"))
+    if not dash or not (first or last) or not all(part.isascii() and part.isdigit() for part in (first, last) if part):
+        return None
+
+    if not first:
+        # suffix range, the last N bytes
+        suffix = int(last)
+        if suffix == 0 or size == 0:
+            raise ValueError("Range not satisfiable")
+        return max(size - suffix, 0), size - 1
+
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size:
+        raise ValueError("Range not satisfiable")
+    if end < start:
+        return None
+    return start, end
+
+def iter_pdf(storage: StorageBackend, isbn: str, start: int, end: int):
+    """
+    Stream part of a stored PDF in PDF_CHUNK_SIZE chunks, blocking, Starlette iterates it in its threadpool.
+    """
+    return storage.iter_range(pdf_key(isbn), start, end, constants.PDF_CHUNK_SIZE)
@@ -1,18 +1,28 @@
-import base64
+import datetime
+import email.utils
+import hashlib
 import os
 
-import httpx
 from botocore.exceptions import ClientError
-from fastapi import (APIRouter, Depends, HTTPException, Response, Security,
-                     UploadFile)
+from fastapi import (APIRouter, Depends, HTTPException, Path, Query,
+                     Request, Response, Security, UploadFile)
+from fastapi.concurrency import run_in_threadpool
 from fastapi.encoders import jsonable_encoder
-from sqlalchemy.orm import Session
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
 from ..auth import dependencies
 from ..aws import config
-from ..database import get_db
+from ..cache.service import ReadThroughCache, get_read_cache
+from ..database import get_db, get_sessionmaker
+from ..metadata.exceptions import MetadataUnavailable
+from ..metadata.service import (MetadataService, get_metadata_service,
+                                is_valid_isbn, normalize_isbn)
+from ..storage.backends import StorageBackend, get_storage
 from ..user import crud as crud_users
-from ..utils import dict_parser
+from ..utils import decode_cursor, encode_cursor, json_response
+from . import cache as book_cache
+from . import constants, covers, export, pdfs
 from . import crud as crud_books
 from . import schemas
 
@@ -20,21 +30,23 @@ router = APIRouter(
     prefix = "/books",
 )
 
-TIMEOUT = 15.0
-
 @router.post(
     "/create",
     response_model=schemas.BookCreate,
     dependencies=[
         Security(dependencies.authorize_current_user, scopes=["admin", "superuser"])
     ])
-def create_book(book: schemas.BookCreate, db: Session = Depends(get_db)):
+async def create_book(book: schemas.BookCreate, db: AsyncSession = Depends(get_db), cache: ReadThroughCache = Depends(get_read_cache)):
     """
     Create a new book in the database.
     """
-    if crud_books.get_book_by_isbn(isbn=book.isbn, db=db):
+    if await crud_books.get_book_by_isbn(isbn=book.isbn, db=db):
         raise HTTPException(status_code=400, detail="Book already exist")  
-    return crud_books.create_book(book=book, db=db)
+    db_book = await crud_books.create_book(book=book, db=db)
+    if not db_book:
+        raise HTTPException(status_code=400, detail="Book already exist")
+    await book_cache.invalidate_books(cache, ids=[db_book.id])
+    return db_book
 
 @router.post(
     "/create/{isbn}", 
@@ -42,61 +54,328 @@ def create_book(book: schemas.BookCreate, db: Session = Depends(get_db)):
     dependencies=[
         Security(dependencies.authorize_current_user, scopes=["admin", "superuser"])
     ])
-async def create_book_by_isbn(isbn: str, db: Session = Depends(get_db)):
+async def create_book_by_isbn(isbn: str, db: AsyncSession = Depends(get_db), metadata: MetadataService = Depends(get_metadata_service), cache: ReadThroughCache = Depends(get_read_cache)):
     """
     Create a new book in the database by fetching data from Open Library API using ISBN.
     """
+    isbn = normalize_isbn(isbn)
+    if not is_valid_isbn(isbn):
+        raise HTTPException(status_code=400, detail="Malformed ISBN")
+    if await crud_books.get_book_by_isbn(isbn=isbn, db=db):
+        raise HTTPException(status_code=400, detail="Book already exist")
 
-    OPENLIB_URL = f"http://openlibrary.org/api/volumes/brief/isbn/{isbn}.json"
-    
-    #request data from external API
-    async with httpx.AsyncClient() as client:
+    #ISBNs fetched recently are served from the metadata cache, without calling Open Library
+    try:
+        selected_keys = await metadata.get(db=db, isbn=isbn)
+    except MetadataUnavailable as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if selected_keys is None:
+        raise HTTPException(status_code=400, detail="Book not found in Open Library")
+
+    #convert python dict to pydantic object
+    book = schemas.BookCreate(**selected_keys)
+
+    db_book = await crud_books.create_book(book=book, db=db)
+    if not db_book:
+        raise HTTPException(status_code=400, detail="Book already exist")
+    await book_cache.invalidate_books(cache, ids=[db_book.id])
+    return db_book
+
+@router.post(
+    "/upsert",
+    response_model=schemas.BookUpsertResult,
+    dependencies=[
+        Security(dependencies.authorize_current_user, scopes=["admin", "superuser"])
+    ])
+async def upsert_books(books: list[schemas.BookCreate], db: AsyncSession = Depends(get_db), cache: ReadThroughCache = Depends(get_read_cache)):
+    """
+    Create or update many books in one round trip, matched by ISBN. Outcomes are reported in request order.
+    """
+    if not books:
+        raise HTTPException(status_code=400, detail="No books to upsert")
+    if len(books) > constants.BOOK_BATCH_SIZE_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {constants.BOOK_BATCH_SIZE_MAX} books per request")
+
+    #ON CONFLICT cannot touch the same row twice in one statement, the last row of a repeated ISBN wins
+    last_index = {book.isbn: index for index, book in enumerate(books)}
+    upserted = await crud_books.upsert_books(books=[books[index] for index in last_index.values()], db=db)
+    outcomes = {isbn: (book_id, created) for book_id, isbn, created in upserted}
+    await book_cache.invalidate_books(cache, ids=[book_id for book_id, _, _ in upserted])
+
+    items = []
+    for index, book in enumerate(books):
+        if last_index[book.isbn] != index:
+            items.append(schemas.BookUpsertItem(index=index, isbn=book.isbn, status=schemas.BookUpsertStatus.DUPLICATE))
+            continue
+        book_id, created = outcomes[book.isbn]
+        status = schemas.BookUpsertStatus.CREATED if created else schemas.BookUpsertStatus.UPDATED
+        items.append(schemas.BookUpsertItem(index=index, isbn=book.isbn, id=book_id, status=status))
+
+    created = sum(1 for _, _, created in upserted if created)
+    return schemas.BookUpsertResult(items=items, created=created, updated=len(upserted) - created)
+
+def _decode_cursor_position(after: str, sort: schemas.BookSort) -> list | None:
+    """
+    Turn an `after` token into the [sort value, id] position it points at, None for the first page.
+    """
+    if not after:
+        return None
+    try:
+        cursor = decode_cursor(after)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if cursor.get("sort") != sort.value or not isinstance(cursor.get("key"), list) or len(cursor["key"]) != 2:
+        raise HTTPException(status_code=400, detail="Cursor does not match the requested sort")
+    if not _is_cursor_key(cursor["key"], sort):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return cursor["key"]
+
+def _is_cursor_key(key: list, sort: schemas.BookSort) -> bool:
+    """
+    Whether a decoded [sort value, id] has the types book_cursor_key encodes for the sort,
+    a tampered token must not reach the query as a wrongly typed parameter.
+    """
+    sort_value, book_id = key
+    #bool is an int subclass, JSON true is not an ID
+    if type(book_id) is not int:
+        return False
+    if sort == schemas.BookSort.ID:
+        return type(sort_value) is int
+    if not isinstance(sort_value, str):
+        return False
+    if sort == schemas.BookSort.ADDED_DATE:
         try:
-            book_response = await client.get(OPENLIB_URL, timeout=TIMEOUT)
+            datetime.date.fromisoformat(sort_value)
+        except ValueError:
+            return False
+    return True
 
-        except httpx.ReadTimeout:
-            raise HTTPException(status_code=400, detail= "Request Time Out") 
-        except httpx.RequestError:
-            raise HTTPException(status_code=400, detail= "Request Error")
-        
-    #retrieve dict data from HTTP response object
-    dict_content = book_response.json()
-    #call list on dict to return keys of dictionary as list, instead of .keys(), as it returns key_dicts obj which is hard to handle
-    OPENLIB_KEY = (list(dict_content.get('records')))[0] 
-    #there are multiple isbns in the isbn list ['0316414247', '9780316414241'], isbn_matching makes sure to retrieve the exact isbn that user specified.
-    isbn_matching = dict_parser(dict_content, ['records', OPENLIB_KEY, 'isbns']).index(isbn)
-    #select certain book fields from dictionary using dict_parser function in utils.py
-    selected_keys = {
-        'title': dict_parser(dict_content, ['records', OPENLIB_KEY, 'data', 'title']).title(),
-        'author': dict_parser(dict_content, ['records', OPENLIB_KEY, 'data', 'authors', 0, 'name']),
-        'edition': dict_parser(dict_content, ['records', OPENLIB_KEY, 'details', 'details', 'edition_name']),
-        'publisher': dict_parser(dict_content, ['records', OPENLIB_KEY, 'data', 'publishers', 0, 'name']),
-        'publish_date': dict_parser(dict_content, ['records', OPENLIB_KEY, 'publishDates', 0]),
-        'publish_place': dict_parser(dict_content, ['records', OPENLIB_KEY, 'details', 'details', 'publish_country']),
-        'number_of_pages': dict_parser(dict_content, ['records', OPENLIB_KEY, 'data', 'number_of_pages']),
-        'description': dict_parser(dict_content, ['records', OPENLIB_KEY, 'details', 'details', 'description', 'value']),
-        'language': dict_parser(dict_content, ['records', OPENLIB_KEY, 'details', 'details', 'languages', 0, 'key']),
-        'isbn': dict_parser(dict_content, ['records', OPENLIB_KEY, 'isbns', isbn_matching]),
-        'lccn': dict_parser(dict_content, ['records', OPENLIB_KEY, 'lccns', 0]),
-        'subtitle': dict_parser(dict_content, ['records', OPENLIB_KEY, 'data', 'subtitle']),
-        'subjects': dict_parser(dict_content, ['records', OPENLIB_KEY, 'details', 'details', 'subjects', 0]),
+def _cursor_page(rows: list, limit: int, sort: schemas.BookSort) -> tuple[list, str | None]:
+    """
+    Split a limit + 1 keyset result into the page and the cursor of the next page.
+    """
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor({"sort": sort.value, "key": crud_books.book_cursor_key(rows[-1], sort)})
+
+def _book_summary(row, request: Request) -> dict:
+    """
+    Build the summary response of a summary row, pointing at the cover endpoint instead of embedding it.
+    Returned as a plain dict, serialized with utils.dump_json against schemas.BookSummary (or BookSearchResult).
+    """
+    #_asdict is the cheapest way out of a Row, much cheaper than attribute reads during validation
+    summary = row._asdict()
+    cover_hash = summary.pop("cover_hash")
+    cover_url = None
+    if cover_hash:
+        # the grid only draws cards, never ship it the original
+        cover_path = request.app.url_path_for("retrieve_cover_by_hash", cover_hash=cover_hash)
+        cover_url = f"{cover_path}?size={schemas.CoverSize.CARD.value}"
+    summary["cover_url"] = cover_url
+    return summary
+
+def _is_not_modified(request: Request, etag: str, last_modified: datetime.datetime | None = None) -> bool:
+    """
+    Evaluate If-None-Match (weak comparison), or If-Modified-Since when there is none, against a response's validators.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        opaque_tag = etag.removeprefix("W/")
+        return any(tag.strip().removeprefix("W/") == opaque_tag for tag in if_none_match.split(","))
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if last_modified is None or not if_modified_since:
+        return False
+    try:
+        since = email.utils.parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        return False
+    # HTTP dates have whole seconds
+    return last_modified.replace(microsecond=0) <= since
+
+def _book_validators(row) -> tuple[str, datetime.datetime, dict]:
+    """
+    Build the ETag, Last-Modified and caching headers of a book from its version row, or the book itself.
+    """
+    updated_at = row.updated_at
+    if updated_at.tzinfo is None:
+        # SQLite hands back the UTC timestamp without its zone
+        updated_at = updated_at.replace(tzinfo=datetime.timezone.utc)
+    etag = f'W/"{row.id}-{row.version}"'
+    headers = {
+        "ETag": etag,
+        "Last-Modified": email.utils.format_datetime(updated_at.astimezone(datetime.timezone.utc), usegmt=True),
+        "Cache-Control": constants.BOOK_CACHE_CONTROL,
     }
+    return etag, updated_at, headers
 
-    #convert python dict to pydantic object
-    book = schemas.BookCreate(**selected_keys)
+def _page_headers(content: bytes) -> dict:
+    """
+    Build the ETag and caching headers of a skip/limit page, the ETag is a digest of the page's body.
+    """
+    etag = f'W/"{hashlib.sha256(content).hexdigest()[:32]}"'
+    return {"ETag": etag, "Cache-Control": constants.LIST_CACHE_CONTROL}
 
-    return crud_books.create_book(book=book, db=db)
+async def _cached_response(request: Request, cache: ReadThroughCache, key: str, loader, version_key: str) -> Response | None:
+    """
+    Serve a read through the cache, its entries hold the body and its headers (see book_cache.pack_response),
+    so a hit answers both the conditional request and the 200 without querying the database.
+
+    :param loader: Produces the packed response on a miss, None if there is nothing to serve.
+    :return: Return the 200 or 304 response, None if the loader found nothing.
+    """
+    value = await cache.get_or_load(key, loader, version_key=version_key)
+    if value is None:
+        return None
+    headers, content = book_cache.unpack_response(value)
+    last_modified = headers.get("Last-Modified")
+    if _is_not_modified(request, headers["ETag"], last_modified and email.utils.parsedate_to_datetime(last_modified)):
+        return Response(status_code=304, headers=headers)
+    return Response(content=content, media_type="application/json", headers=headers)
 
 @router.get(
     "/retrieve/books", 
-    response_model=list[schemas.Book],
+    response_model=list[schemas.Book] | schemas.BookPage,
 )
-def get_books(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
+async def get_books(
+    request: Request,
+    skip: int = 0,
+    limit: int = 10,
+    after: str | None = None,
+    sort: schemas.BookSort = schemas.BookSort.ID,
+    db: AsyncSession = Depends(get_db),
+    cache: ReadThroughCache = Depends(get_read_cache)):
     """
     Retrieve a list of books from the database.
+
+    Without `after` the books are paged with skip/limit and returned as a plain list.
+    With `after` (empty for the first page, then the previous page's `next_cursor`) the books are
+    paged by keyset on (sort, id) and returned as {"items": [...], "next_cursor": "..."}.
+    Skip/limit pages carry an ETag, a matching If-None-Match is answered with 304, from the cache when it has the page.
     """
-    db_books = crud_books.get_books(skip=skip, limit=limit, db=db)
-    return db_books
+    if after is None:
+        #the first pages are hot, serve them as cached JSON
+        async def load_books() -> bytes:
+            content = book_cache.serialize_books(await crud_books.get_books(skip=skip, limit=limit, db=db))
+            return book_cache.pack_response(_page_headers(content), content)
+        return await _cached_response(request, cache, book_cache.book_list_key(skip, limit), load_books, version_key=book_cache.BOOK_LISTS_KEY)
+
+    position = _decode_cursor_position(after, sort)
+    limit = max(1, min(limit, constants.CURSOR_PAGE_SIZE_MAX))
+    # fetch one extra row to know whether another page exists
+    try:
+        db_books = await crud_books.get_books_by_cursor(sort=sort, after=position, limit=limit + 1, db=db)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    db_books, next_cursor = _cursor_page(db_books, limit, sort)
+    return json_response(schemas.BookPage, {"items": db_books, "next_cursor": next_cursor})
+
+@router.get(
+    "/retrieve/books/summary",
+    response_model=list[schemas.BookSummary] | schemas.BookSummaryPage,
+)
+async def get_book_summaries(
+    request: Request,
+    skip: int = 0,
+    limit: int = 10,
+    after: str | None = None,
+    sort: schemas.BookSort = schemas.BookSort.ID,
+    db: AsyncSession = Depends(get_db),
+    cache: ReadThroughCache = Depends(get_read_cache)):
+    """
+    Retrieve a list of book summaries for the catalogue grid.
+
+    Only the listing columns are selected, covers are referenced by `cover_url`.
+    Pagination and validators work the same as /retrieve/books.
+    """
+    if after is None:
+        async def load_summaries() -> bytes:
+            rows = await crud_books.get_book_summaries(skip=skip, limit=limit, db=db)
+            content = book_cache.serialize_book_summaries([_book_summary(row, request) for row in rows])
+            return book_cache.pack_response(_page_headers(content), content)
+        return await _cached_response(request, cache, book_cache.book_summary_list_key(skip, limit), load_summaries, version_key=book_cache.BOOK_LISTS_KEY)
+
+    position = _decode_cursor_position(after, sort)
+    limit = max(1, min(limit, constants.CURSOR_PAGE_SIZE_MAX))
+    try:
+        rows = await crud_books.get_book_summaries_by_cursor(sort=sort, after=position, limit=limit + 1, db=db)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    rows, next_cursor = _cursor_page(rows, limit, sort)
+    return json_response(schemas.BookSummaryPage, {"items": [_book_summary(row, request) for row in rows], "next_cursor": next_cursor})
+
+@router.get(
+    "/search",
+    response_model=schemas.BookSearchPage,
+)
+async def search_books(
+    request: Request,
+    q: str = Query(min_length=1, max_length=256),
+    language: str | None = None,
+    publisher: str | None = None,
+    is_borrowed: bool | None = None,
+    limit: int = 10,
+    after: str | None = None,
+    db: AsyncSession = Depends(get_db)):
+    """
+    Ranked full-text search over title, subtitle, author, subjects and description,
+    tolerant to typos in titles and authors, with optional facet filters.
+
+    Pass the previous page's `next_cursor` as `after` to get the next page.
+    """
+    position = None
+    if after:
+        try:
+            cursor = decode_cursor(after)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        if cursor.get("sort") != "rank" or not isinstance(cursor.get("key"), list) or len(cursor["key"]) != 2:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        position = cursor["key"]
+
+    limit = max(1, min(limit, constants.CURSOR_PAGE_SIZE_MAX))
+    try:
+        rows = await crud_books.search_books(
+            query=q, language=language, publisher=publisher, is_borrowed=is_borrowed,
+            after=position, limit=limit + 1, db=db)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor({"sort": "rank", "key": [rows[-1].rank, rows[-1].id]})
+
+    return json_response(schemas.BookSearchPage, {"items": [_book_summary(row, request) for row in rows], "next_cursor": next_cursor})
+
+@router.get(
+    "/retrieve/summary/{isbn_or_id}",
+    response_model=schemas.BookSummary,
+    dependencies=[
+        Security(dependencies.authorize_current_user, scopes=["user", "admin", "superuser"]), 
+        ])
+async def get_book_summary_by_isbn_id(isbn_or_id: str, request: Request, db: AsyncSession = Depends(get_db)):
+    """
+    Retrieve a book summary by its ISBN or ID.
+    """
+    version_row = await crud_books.get_book_version_by_isbn_or_id(isbn_or_id=isbn_or_id, db=db)
+    if not version_row:
+        raise HTTPException(status_code=400, detail="Book not found")
+    etag, last_modified, headers = _book_validators(version_row)
+    if _is_not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+
+    row = await crud_books.get_book_summary_by_isbn_or_id(isbn_or_id=str(version_row.id), db=db)
+    if not row:
+        raise HTTPException(status_code=400, detail="Book not found")
+    return json_response(schemas.BookSummary, _book_summary(row, request), headers=headers)
 
 @router.get(
     "/retrieve/{isbn_or_id}", 
@@ -104,14 +383,33 @@ def get_books(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
     dependencies=[
         Security(dependencies.authorize_current_user, scopes=["user", "admin", "superuser"]), 
         ])
-def get_book_by_isbn_id(isbn_or_id: str, db: Session = Depends(get_db)):
+async def get_book_by_isbn_id(isbn_or_id: str, request: Request, db: AsyncSession = Depends(get_db), cache: ReadThroughCache = Depends(get_read_cache)):
     """
     Retrieve a book by its ISBN or ID.
+
+    The response carries an ETag and Last-Modified, a matching conditional request is answered with 304.
+    Cache hits, conditional or not, never query the database.
     """
-    db_book = crud_books.get_book_by_isbn_or_id(isbn_or_id=isbn_or_id, db=db)
-    if not db_book:
+    async def resolve_book_id() -> bytes | None:
+        version_row = await crud_books.get_book_version_by_isbn_or_id(isbn_or_id=isbn_or_id, db=db)
+        return str(version_row.id).encode() if version_row else None
+    book_id = await cache.get_or_load(book_cache.book_alias_key(isbn_or_id), resolve_book_id, version_key=book_cache.BOOK_LISTS_KEY)
+    if book_id is None:
+        raise HTTPException(status_code=400, detail="Book not found")
+    book_id = int(book_id)
+
+    async def load_book() -> bytes | None:
+        db_book = await crud_books.get_book_by_id(book_id=book_id, db=db)
+        if not db_book:
+            return None
+        _, _, headers = _book_validators(db_book)
+        return book_cache.pack_response(headers, book_cache.serialize_book(db_book))
+
+    #cached under the ID whatever the path names, ISBN and ID aliases share one entry
+    response = await _cached_response(request, cache, book_cache.book_key(book_id), load_book, version_key=book_cache.book_key(book_id))
+    if response is None:
         raise HTTPException(status_code=400, detail="Book not found")
-    return db_book 
+    return response
 
 @router.patch(
     "/update/{book_id}", 
@@ -119,28 +417,32 @@ def get_book_by_isbn_id(isbn_or_id: str, db: Session = Depends(get_db)):
     dependencies=[
         Security(dependencies.authorize_current_user, scopes=["admin", "superuser"]),
     ])
-def update_book(book_id: int, book: schemas.BookUpdate, db: Session = Depends(get_db)):
+async def update_book(book_id: int, book: schemas.BookUpdate, db: AsyncSession = Depends(get_db), cache: ReadThroughCache = Depends(get_read_cache)):
     """"
     Update an existing book in the database.
     """
-    db_book = crud_books.get_book_by_id(book_id=book_id, db=db)
+    db_book = await crud_books.get_book_by_id(book_id=book_id, db=db)
     if not db_book:
         raise HTTPException(status_code=400, detail="Book not found")
-    return crud_books.update_book(book_id=book_id, book=book, db=db)
+    db_book = await crud_books.update_book(book_id=book_id, book=book, db=db)
+    await book_cache.invalidate_books(cache, ids=[book_id])
+    return db_book
 
 @router.delete(
     "/delete/{book_id}",
     dependencies=[
         Security(dependencies.authorize_current_user, scopes=["user", "admin", "superuser"]), 
     ])
-def delete_book(book_id: int, db: Session = Depends(get_db)):
+async def delete_book(book_id: int, db: AsyncSession = Depends(get_db), cache: ReadThroughCache = Depends(get_read_cache)):
     """
     Delete a book from the database.
     """
-    db_book = crud_books.get_book_by_id(book_id=book_id, db=db)
+    db_book = await crud_books.get_book_by_id(book_id=book_id, db=db)
     if not db_book:
         raise HTTPException(status_code=400, detail="Target book does not exist")
-    return crud_books.delete_book(book_id=book_id, db=db)
+    deleted = await crud_books.delete_book(book_id=book_id, db=db)
+    await book_cache.invalidate_books(cache, ids=[book_id])
+    return deleted
 
 @router.patch(
     "/borrow/{email}/{book_id}",
@@ -148,20 +450,23 @@ def delete_book(book_id: int, db: Session = Depends(get_db)):
     dependencies=[
         Security(dependencies.authorize_current_user, scopes=["user", "admin", "superuser"]), 
     ])
-def borrow_book(email: str, book_id: int, db: Session = Depends(get_db)):
+async def borrow_book(email: str, book_id: int, db: AsyncSession = Depends(get_db), cache: ReadThroughCache = Depends(get_read_cache)):
     """
     Borrow a book from the library.
     """
-    db_user = crud_users.get_user_by_email(email=email, db=db)
-    db_book = crud_books.get_book_by_id(book_id=book_id, db=db)
-    
-    if not (db_user or db_book):
+    #the availability check and the write are one statement, the lookups below only explain a refusal
+    db_book = await crud_books.borrow_book(book_id=book_id, email=email, db=db)
+    if db_book:
+        await book_cache.invalidate_books(cache, ids=[book_id])
+        return db_book
+
+    db_user = await crud_users.get_user_by_email(email=email, db=db)
+    db_book = await crud_books.get_book_by_id(book_id=book_id, db=db)
+    if not (db_user and db_book):
         raise HTTPException(status_code=400, detail="Target user and book do not exist")
     if db_book.is_borrowed:
         raise HTTPException(status_code=400, detail="Book is already borrowed by another user")
-    
-    db_book.borrow(db_user)
-    return crud_books.update_book(book_id=book_id, db=db)
+    raise HTTPException(status_code=400, detail="Book is on hold for another user")
     
 @router.patch(
     "/return/{email}/{book_id}",
@@ -169,33 +474,33 @@ def borrow_book(email: str, book_id: int, db: Session = Depends(get_db)):
     dependencies=[
         Security(dependencies.authorize_current_user, scopes=["user", "admin", "superuser"]), 
     ])
-def return_book(email: str, book_id: int, db: Session = Depends(get_db)):
+async def return_book(email: str, book_id: int, db: AsyncSession = Depends(get_db), cache: ReadThroughCache = Depends(get_read_cache)):
     """
     Return a borrowed book to the library.
     """
-    db_user = crud_users.get_user_by_email(email=email, db=db)
-    db_book = crud_books.get_book_by_id(book_id=book_id, db=db)
-    
-    if not (db_user or db_book):
+    db_book = await crud_books.return_book(book_id=book_id, email=email, db=db)
+    if db_book:
+        await book_cache.invalidate_books(cache, ids=[book_id])
+        return db_book
+
+    db_user = await crud_users.get_user_by_email(email=email, db=db)
+    db_book = await crud_books.get_book_by_id(book_id=book_id, db=db)
+    if not (db_user and db_book):
         raise HTTPException(status_code=400, detail="Target user and book do not exist")
     if not db_book.is_borrowed:
         raise HTTPException(status_code=400, detail="Target book has not been borrowed")
-    if db_book.user_id != db_user.id:
-         raise HTTPException(status_code=400, detail="User did not borrow this specific book")
-    
-    db_book.return_book()
-    return crud_books.update_book(book_id=book_id, db=db)
+    raise HTTPException(status_code=400, detail="User did not borrow this specific book")
 
 @router.patch(
     "/update/cover/{book_id}",
     dependencies=[
         Security(dependencies.authorize_current_user, scopes=["user", "admin", "superuser"]), 
     ])
-async def upload_book_cover(cover_img: UploadFile, book_id: int, db: Session= Depends(get_db)):
+async def upload_book_cover(cover_img: UploadFile, book_id: int, db: AsyncSession= Depends(get_db), storage: StorageBackend = Depends(get_storage), cache: ReadThroughCache = Depends(get_read_cache)):
     """
     Upload a cover image for a book with book id.
     """
-    db_book = crud_books.get_book_by_id(book_id=book_id, db=db)
+    db_book = await crud_books.get_book_by_id(book_id=book_id, db=db)
 
     if not db_book:
         raise HTTPException(status_code=400, detail="Target book does not exist")
@@ -204,31 +509,83 @@ async def upload_book_cover(cover_img: UploadFile, book_id: int, db: Session= De
     if not book_id:
         raise HTTPException(status_code=400, detail="Book id was not specified")
     
-    img_content = await cover_img.read()
+    #one byte past the limit is enough to tell an oversized upload
+    img_content = await cover_img.read(constants.COVER_MAX_SIZE + 1)
+    if len(img_content) > constants.COVER_MAX_SIZE:
+        raise HTTPException(status_code=400, detail=f"Cover image is too large, must be at most {constants.COVER_MAX_SIZE // 1_000_000}MB")
 
-    return crud_books.update_book_cover(img_content=img_content, book_id=book_id, db=db)
+    try:
+        cover_hash = await covers.store_cover(storage, img_content)
+    except covers.IMAGE_ERRORS as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    updated = await crud_books.update_book_cover(cover_hash=cover_hash, book_id=book_id, db=db)
+    #listings carry the cover URL
+    await book_cache.invalidate_books(cache, ids=[book_id])
+    return updated
+
+async def _cover_response(request: Request, storage: StorageBackend, cover_hash: str, size: schemas.CoverSize | None, cache_control: str) -> Response:
+    """
+    Serve a stored cover, or one of its renditions, with an ETag derived from its digest,
+    answering 304 when the client already has it.
+    """
+    headers = {"Cache-Control": cache_control}
+    variant = "original"
+    image_format = None
+    if size:
+        # renditions exist in every format, pick the smallest one the client accepts
+        image_format = "webp" if "image/webp" in request.headers.get("accept", "") else "jpeg"
+        variant = f"{size.value}.{image_format}"
+        headers["Vary"] = "Accept"
+
+    etag = f'"{cover_hash}-{variant}"'
+    headers["ETag"] = etag
+    if _is_not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    img_content = None
+    if size:
+        img_content = await run_in_threadpool(covers.load_rendition, storage, cover_hash, size.value, image_format)
+    if img_content is None:
+        # no rendition yet (not backfilled), fall back to the original
+        img_content = await run_in_threadpool(covers.load_cover, storage, cover_hash)
+        headers["ETag"] = f'"{cover_hash}-original"'
+        # the rendition will replace it once generated, so it must not be cached for good
+        headers["Cache-Control"] = cache_control.split(",")[0] + ", no-cache"
+    if img_content is None:
+        raise HTTPException(status_code=404, detail="Cover image not found in storage")
+
+    return Response(content=img_content, media_type=covers.sniff_media_type(img_content), headers=headers)
 
 @router.get(
     "/retrieve/cover/{book_id}",
     dependencies={
         Security(dependencies.authorize_current_user, scopes=["user", "admin", "superuser"]), 
     })
-def retrieve_book_cover(book_id: int, db: Session = Depends(get_db)):
+async def retrieve_book_cover(book_id: int, request: Request, size: schemas.CoverSize | None = None, db: AsyncSession = Depends(get_db), storage: StorageBackend = Depends(get_storage)):
     """
     Retrieve the cover image of a book by its ID.
+
+    Without `size` the original upload is returned, otherwise the pre-computed rendition.
     """
-    db_book = crud_books.get_book_by_id(book_id=book_id, db=db)
+    db_book = await crud_books.get_book_by_id(book_id=book_id, db=db)
 
     if not db_book:
         raise HTTPException(status_code=400, detail="Target book does not exist")
-    if not db_book.cover_image:
+    if not db_book.cover_hash:
         raise HTTPException(status_code=400, detail="Target book does not have cover image")
-    # cover_image data is stored as utf-8 string in database
-    # To have image as response, the response must be in RAW BINARY DATA 
-    # Decode data from utf-8 string, bypassing base64 bytes, to RAW BINARY directly
-    decoded_image_data = base64.b64decode(db_book.cover_image)
 
-    return Response(content=decoded_image_data, media_type="image/jpg")
+    # the book may get another cover, so clients revalidate against the ETag
+    return await _cover_response(request, storage, db_book.cover_hash, size, "private, no-cache")
+
+@router.get("/covers/{cover_hash}")
+async def retrieve_cover_by_hash(request: Request, cover_hash: str = Path(pattern="^[0-9a-f]{64}$"), size: schemas.CoverSize | None = None, storage: StorageBackend = Depends(get_storage)):
+    """
+    Retrieve a cover image by its content hash.
+
+    The content behind a hash never changes, so browsers and nginx may cache it indefinitely.
+    """
+    return await _cover_response(request, storage, cover_hash, size, "public, max-age=31536000, immutable")
 
 @router.post(
     "/upload/bookpdf/{book_id}",
@@ -236,11 +593,11 @@ def retrieve_book_cover(book_id: int, db: Session = Depends(get_db)):
         Security(dependencies.authorize_current_user, scopes=["admin", "superuser"]),
     ])
 
-def upload_book_pdf(pdf_file: UploadFile, book_id: int, db: Session = Depends(get_db)):
+async def upload_book_pdf(pdf_file: UploadFile, book_id: int, db: AsyncSession = Depends(get_db), storage: StorageBackend = Depends(get_storage)):
     """
     Upload a PDF file for a book with book id.
     """
-    db_book = crud_books.get_book_by_id(book_id=book_id, db=db)
+    db_book = await crud_books.get_book_by_id(book_id=book_id, db=db)
 
     if not db_book:
         raise HTTPException(status_code=400, detail="Target book does not exist")
@@ -250,13 +607,13 @@ def upload_book_pdf(pdf_file: UploadFile, book_id: int, db: Session = Depends(ge
         if pdf_file.content_type != "application/pdf":
             raise HTTPException(status_code=500, detail="Only PDF files are allowed") 
         # Ensure the file is less than 100MB
-        if pdf_file.size >= 100000000:
+        if pdf_file.size >= constants.PDF_MAX_SIZE:
             raise HTTPException(status_code=500, detail="File size is too large, must be less than 100MB") 
         
-        # Upload the file to the R2 bucket
-        # The upload_fileobj method accepts a file-like object, 
+        # Upload the file to the storage backend (the R2 bucket, or the local directory)
+        # put_file accepts a file-like object, 
         # so you can directly pass file.file without opening or reading it locally.
-        config.s3_client.upload_fileobj(pdf_file.file, os.environ.get("CLOUDFLARE_R2_BUCKET"), f'{db_book.isbn}.pdf')
+        await run_in_threadpool(storage.put_file, pdfs.pdf_key(db_book.isbn), pdf_file.file, "application/pdf")
 
         return {"message": f"File uploaded successfully {db_book.isbn} "}
     
@@ -287,6 +644,68 @@ def retrieve_book_pdf(isbn: str):
 
     except ClientError as e:
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
+
+@router.get(
+    "/stream/bookpdf/{isbn}",
+    dependencies=[
+        Security(dependencies.authorize_current_user, scopes=["admin", "superuser"]),
+    ])
+async def stream_book_pdf(isbn: str, request: Request, storage: StorageBackend = Depends(get_storage)):
+    """
+    Stream a PDF file for a book by its ISBN from the storage backend, works without R2.
+
+    Honours a single byte Range with 206 Partial Content, so the viewer can fetch the pages it shows
+    instead of the whole file. The file is sent in PDF_CHUNK_SIZE chunks, never read whole.
+    """
+    try:
+        size = await run_in_threadpool(storage.size, pdfs.pdf_key(isbn))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid ISBN")
+    if size is None:
+        raise HTTPException(status_code=404, detail="PDF not found")
+
+    headers = {"Accept-Ranges": "bytes", "Cache-Control": "private, no-cache"}
+    try:
+        byte_range = pdfs.parse_range(request.headers.get("range"), size)
+    except ValueError:
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+
+    status_code = 200
+    start, end = 0, size - 1
+    if byte_range:
+        status_code = 206
+        start, end = byte_range
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+
+    return StreamingResponse(pdfs.iter_pdf(storage, isbn, start, end), status_code=status_code, media_type="application/pdf", headers=headers)
+
+@router.get(
+    "/export",
+    dependencies=[
+        Security(dependencies.authorize_current_user, scopes=["admin", "superuser"]),
+    ])
+async def export_books(
+    request: Request,
+    format: schemas.ExportFormat = schemas.ExportFormat.CSV,
+    loans: bool = False,
+    session_factory: async_sessionmaker = Depends(get_sessionmaker)):
+    """
+    Download the whole catalogue as CSV or NDJSON, with the open loan of each book when `loans` is set.
+
+    The rows are streamed from a server-side cursor and read from one snapshot, so the memory of an export
+    stays flat and concurrent writes do not tear it. Gzipped on the fly when the client accepts it.
+    """
+    chunks = export.iter_export(session_factory, format, loans)
+    headers = {
+        "Content-Disposition": f'attachment; filename="{export.export_filename(format)}"',
+        "Cache-Control": "no-store",
+        "Vary": "Accept-Encoding",
+    }
+    if export.accepts_gzip(request.headers.get("accept-encoding")):
+        chunks = export.gzip_chunks(chunks)
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(chunks, media_type=export.MEDIA_TYPES[format], headers=headers)
        
 @router.get(
     "/retrieve/staticfile/cover-coming-soon.jpg",
@@ -1,7 +1,28 @@
 from datetime import date
+from enum import Enum
 from pydantic import BaseModel
 from fastapi import UploadFile
 
+class BookSort(str, Enum):
+    ID = "id"
+    TITLE = "title"
+    ADDED_DATE = "added_date"
+
+class BookUpsertStatus(str, Enum):
+    CREATED = "created"
+    UPDATED = "updated"
+    # an earlier row of the same request with an ISBN repeated later on, the last row wins
+    DUPLICATE = "duplicate"
+
+class CoverSize(str, Enum):
+    THUMB = "thumb"
+    CARD = "card"
+    FULL = "full"
+
+class ExportFormat(str, Enum):
+    CSV = "csv"
+    NDJSON = "ndjson"
+
 """class inherits from BookBase will also inherit the Config"""
 class BookBase(BaseModel):
     title: str
@@ -22,10 +43,10 @@ class BookInfo(BaseModel):
     lccn: str | None = None 
     subtitle: str | None = None 
     subjects: str | None = None
-    cover_image: bytes | None = None
 
 class BookMetadata(BaseModel):
     id: int | None = None
+    cover_hash: str | None = None
     added_date: date | None = None
     user_id: int | None = None 
     borrowed_date: date | None = None 
@@ -47,7 +68,7 @@ class Book(BookBase, BookMetadata, BookInfo):
     lccn: str | None = None 
     subtitle: str | None = None 
     subjects: str | None = None
-    cover_image: bytes | None = None
+    cover_hash: str | None = None
     user_id: int | None = None 
     id: int
     added_date: date
@@ -60,6 +81,60 @@ class Book(BookBase, BookMetadata, BookInfo):
     """
     pass
 
+class BookPage(BaseModel):
+    items: list[Book]
+    next_cursor: str | None = None
+
+class BookSummary(BaseModel):
+    """
+    Listing projection of a book, it never carries cover bytes or the description.
+    """
+    id: int
+    title: str
+    author: str | None
+    isbn: str
+    subtitle: str | None = None
+    publisher: str | None = None
+    language: str | None = None
+    added_date: date | None = None
+    is_borrowed: bool | None = None
+    cover_url: str | None = None
+
+class BookSummaryPage(BaseModel):
+    items: list[BookSummary]
+    next_cursor: str | None = None
+
+class BorrowedBook(BaseModel):
+    """
+    Book as listed in a user response, see user.crud.BORROWED_BOOK_COLUMNS.
+    """
+    id: int
+    title: str
+    author: str | None = None
+    isbn: str
+    borrowed_date: date | None = None
+
+    class Config:
+        orm_mode = True
+
+class BookSearchResult(BookSummary):
+    rank: float
+
+class BookSearchPage(BaseModel):
+    items: list[BookSearchResult]
+    next_cursor: str | None = None
+
+class BookUpsertItem(BaseModel):
+    index: int
+    isbn: str
+    id: int | None = None
+    status: BookUpsertStatus
+
+class BookUpsertResult(BaseModel):
+    items: list[BookUpsertItem]
+    created: int
+    updated: int
+
 #ONLY BOOK WITH ISBN IS ALLOWED TO BE CREATED
 class BookCreate(BookBase, BookInfo):
     """    
@@ -76,7 +151,6 @@ class BookCreate(BookBase, BookInfo):
     lccn: str | None = None 
     subtitle: str | None = None 
     subjects: str | None = None
-    cover_image: bytes | None = None
 
     class Config:
         orm_mode = True
@@ -98,7 +172,6 @@ class BookUpdate(BookBase, BookInfo, BookMetadata):
     lccn: str | None = None 
     subtitle: str | None = None 
     subjects: str | None = None
-    cover_image: bytes | None = None
 
     class Config:
         orm_mode = True
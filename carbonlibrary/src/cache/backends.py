@@ -0,0 +1,104 @@
+import functools
+from abc import ABC, abstractmethod
+
+from ..utils import TTLCache
+from . import config
+from .exceptions import SharedCacheUnavailable
+
+
+class SharedCache(ABC):
+    """
+    Cache tier shared by the workers: byte values with a TTL, and integer version counters.
+
+    Every method raises SharedCacheUnavailable when the tier cannot answer.
+    """
+
+    @abstractmethod
+    async def get(self, key: str) -> bytes | None:
+        ...
+
+    @abstractmethod
+    async def set(self, key: str, value: bytes, ttl: int):
+        ...
+
+    @abstractmethod
+    async def get_version(self, key: str) -> int:
+        """
+        :return: Return the current version of a key, 0 if it was never bumped.
+        """
+
+    @abstractmethod
+    async def bump_version(self, key: str) -> int:
+        ...
+
+
+class MemorySharedCache(SharedCache):
+    """
+    In-process stand-in for Redis, shared by everything in one process (tests, single worker setups).
+    """
+
+    def __init__(self, maxsize: int = 4096):
+        self.values = TTLCache(maxsize=maxsize, ttl=config.CACHE_TTL)
+        self.versions: dict[str, int] = {}
+
+    async def get(self, key: str) -> bytes | None:
+        return self.values.get(key)
+
+    async def set(self, key: str, value: bytes, ttl: int):
+        self.values.set(key, value, ttl=ttl)
+
+    async def get_version(self, key: str) -> int:
+        return self.versions.get(key, 0)
+
+    async def bump_version(self, key: str) -> int:
+        self.versions[key] = self.versions.get(key, 0) + 1
+        return self.versions[key]
+
+
+class RedisSharedCache(SharedCache):
+    """
+    Redis (or any server speaking its protocol) shared by all gunicorn workers.
+    """
+
+    def __init__(self, url: str, timeout: float = config.CACHE_REDIS_TIMEOUT):
+        import redis.asyncio
+        import redis.exceptions
+
+        self.client = redis.asyncio.Redis.from_url(url, socket_timeout=timeout, socket_connect_timeout=timeout)
+        self.errors = redis.exceptions.RedisError
+
+    async def get(self, key: str) -> bytes | None:
+        try:
+            return await self.client.get(key)
+        except self.errors as e:
+            raise SharedCacheUnavailable(str(e)) from e
+
+    async def set(self, key: str, value: bytes, ttl: int):
+        try:
+            await self.client.set(key, value, ex=ttl)
+        except self.errors as e:
+            raise SharedCacheUnavailable(str(e)) from e
+
+    async def get_version(self, key: str) -> int:
+        try:
+            return int(await self.client.get(f"version:{key}") or 0)
+        except self.errors as e:
+            raise SharedCacheUnavailable(str(e)) from e
+
+    async def bump_version(self, key: str) -> int:
+        try:
+            return await self.client.incr(f"version:{key}")
+        except self.errors as e:
+            raise SharedCacheUnavailable(str(e)) from e
+
+
+@functools.lru_cache
+def get_shared_cache() -> SharedCache | None:
+    """
+    Return the configured shared tier, None when the read cache is per worker only.
+    """
+    if config.CACHE_SHARED_BACKEND == "redis":
+        return RedisSharedCache(config.CACHE_REDIS_URL)
+    if config.CACHE_SHARED_BACKEND == "memory":
+        return MemorySharedCache()
+    return None
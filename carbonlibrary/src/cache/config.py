@@ -0,0 +1,16 @@
+import os
+
+# shared tier of the read cache: "" (none), "memory" (in-process stand-in, single worker or tests)
+# or "redis" (needs CACHE_REDIS_URL), see cache/backends.py
+CACHE_SHARED_BACKEND = os.environ.get("CACHE_SHARED_BACKEND", "")
+CACHE_REDIS_URL = os.environ.get("CACHE_REDIS_URL", "redis://localhost:6379/0")
+# seconds to connect to or hear back from Redis before a read falls back to the database
+CACHE_REDIS_TIMEOUT = float(os.environ.get("CACHE_REDIS_TIMEOUT", 0.25))
+
+# entries per worker in the in-process tier
+CACHE_LOCAL_SIZE = int(os.environ.get("CACHE_LOCAL_SIZE", 1024))
+# seconds an entry lives in the shared tier, versioning makes it stale-safe, the TTL only bounds memory
+CACHE_TTL = int(os.environ.get("CACHE_TTL", 300))
+# seconds an entry lives in the in-process tier when there is no shared tier to read versions from,
+# other workers' writes are only seen after it runs out
+CACHE_LOCAL_ONLY_TTL = int(os.environ.get("CACHE_LOCAL_ONLY_TTL", 5))
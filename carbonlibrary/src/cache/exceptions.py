@@ -0,0 +1,4 @@
+class SharedCacheUnavailable(Exception):
+    """
+    The shared cache tier could not be reached or timed out.
+    """
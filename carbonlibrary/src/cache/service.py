@@ -0,0 +1,97 @@
+from collections.abc import Awaitable, Callable
+
+from ..utils import TTLCache
+from . import config
+from .backends import SharedCache, get_shared_cache
+from .exceptions import SharedCacheUnavailable
+
+
+class ReadThroughCache:
+    """
+    Two tier read-through cache of serialized responses.
+
+    Every key has a version, bumped on writes. Entries are stored under "key@version", so a write never
+    has to find and delete entries, and a reader that raced a write can only fill a version nobody asks
+    for anymore. With a shared tier the version is read from it on every lookup, which keeps the
+    in-process tiers of all workers consistent. Without one, versions are per worker and entries
+    only live CACHE_LOCAL_ONLY_TTL seconds.
+
+    Values are opaque bytes, the book routes store the response headers next to the body (book/cache.py)
+    so that a hit, conditional or not, never queries the database.
+
+    It is only a cache: while the shared tier is unavailable, reads go straight to their loader.
+    """
+
+    def __init__(self, shared: SharedCache | None = None):
+        self.shared = shared
+        local_ttl = config.CACHE_TTL if shared is not None else config.CACHE_LOCAL_ONLY_TTL
+        self.local = TTLCache(maxsize=config.CACHE_LOCAL_SIZE, ttl=local_ttl)
+        self._versions: dict[str, int] = {}
+
+    async def _version(self, key: str) -> int:
+        if self.shared is not None:
+            return await self.shared.get_version(key)
+        return self._versions.get(key, 0)
+
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[bytes | None]], version_key: str | None = None) -> bytes | None:
+        """
+        :param key: Cache key of the value.
+        :param loader: Produces the serialized value on a miss, None (not found) is not cached.
+        :param version_key: Key whose version the value follows, defaults to the key itself.
+        :return: Return the cached or freshly loaded value.
+        """
+        try:
+            version = await self._version(version_key or key)
+        except SharedCacheUnavailable:
+            #without the version no entry is known to be fresh, not even the in-process ones
+            return await loader()
+        versioned_key = f"{key}@{version}"
+
+        value = self.local.get(versioned_key)
+        if value is not None:
+            return value
+
+        if self.shared is not None:
+            try:
+                value = await self.shared.get(versioned_key)
+            except SharedCacheUnavailable:
+                value = None
+        if value is None:
+            value = await loader()
+            if value is None:
+                return None
+            if self.shared is not None:
+                try:
+                    await self.shared.set(versioned_key, value, ttl=config.CACHE_TTL)
+                except SharedCacheUnavailable:
+                    pass
+
+        self.local.set(versioned_key, value)
+        return value
+
+    async def invalidate(self, *keys: str):
+        """
+        Make every cached value of the keys stale, call it after the write is committed.
+        """
+        for key in keys:
+            if self.shared is not None:
+                #the write is committed already, failing the request would not undo it; entries the
+                #bump missed outlive it by at most CACHE_TTL
+                try:
+                    await self.shared.bump_version(key)
+                except SharedCacheUnavailable:
+                    pass
+            else:
+                self._versions[key] = self._versions.get(key, 0) + 1
+
+
+_read_cache: ReadThroughCache | None = None
+
+def get_read_cache() -> ReadThroughCache:
+    """
+    FastAPI dependency, the per worker cache in front of the configured shared tier.
+    """
+    global _read_cache
+    if _read_cache is None:
+        _read_cache = ReadThroughCache(get_shared_cache())
+    return _read_cache
@@ -1,22 +1,146 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
 import os
+import time
+import uuid
+
+from sqlalchemy import exc, make_url
+from sqlalchemy.engine import URL
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from . import database_config
+from .metrics.collectors import DB_POOL_CHECKOUT_TIMEOUTS, DB_POOL_CHECKOUT_WAIT
+from .metrics.instrumentation import instrument_engine
 
 POSTGRES_DATABASE_URL = os.environ.get("PG_DATABASE_URL")
 # POSTGRES_FILE_NAME = "user:password@postgresserver/db"
 # POSTGRES_DATABASE_URL = f"postgresql://{POSTGRES_FILE_NAME}"
 
-# remove echo=True argument in production
-engine = create_engine(POSTGRES_DATABASE_URL, echo=True) 
+# PG_DATABASE_URL keeps its sync driver for alembic, the application swaps in the asyncio one
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+def async_database_url(database_url: str) -> URL:
+    """
+    Return the asyncio driver variant of a database URL, e.g. postgresql+psycopg2:// -> postgresql+asyncpg://
+    """
+    url = make_url(database_url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No asyncio driver configured for {backend}")
+    return url.set(drivername=ASYNC_DRIVERS[backend])
+
+class PoolStats:
+    """
+    Connection checkout counters of this worker's pool.
+    """
+
+    def __init__(self):
+        self.checkouts = 0
+        self.checkout_wait_seconds_total = 0.0
+        self.checkout_wait_seconds_max = 0.0
+        self.checkout_timeouts = 0
+
+    def record_checkout(self, wait: float):
+        DB_POOL_CHECKOUT_WAIT.observe(wait)
+        self.checkouts += 1
+        self.checkout_wait_seconds_total += wait
+        self.checkout_wait_seconds_max = max(self.checkout_wait_seconds_max, wait)
+
+pool_stats = PoolStats()
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """
+    Queue pool that records how long each checkout waited for a free connection.
+    """
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            DB_POOL_CHECKOUT_TIMEOUTS.inc()
+            pool_stats.checkout_timeouts += 1
+            raise
+        pool_stats.record_checkout(time.perf_counter() - start)
+        return connection
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def engine_options(url: URL) -> dict:
+    """
+    Build create_async_engine keyword arguments from database_config.
+    """
+    options = {"echo": database_config.DB_ECHO}
+
+    if url.get_backend_name() == "sqlite":
+        return options
+
+    options.update(
+        poolclass=InstrumentedQueuePool,
+        pool_size=database_config.DB_POOL_SIZE,
+        max_overflow=database_config.DB_MAX_OVERFLOW,
+        pool_timeout=database_config.DB_POOL_TIMEOUT,
+        pool_pre_ping=database_config.DB_POOL_PRE_PING,
+        pool_recycle=database_config.DB_POOL_RECYCLE,
+    )
+
+    connect_args = {}
+    if database_config.DB_PGBOUNCER:
+        # asyncpg and SQLAlchemy both cache prepared statements per connection, disable both and
+        # give the unavoidable unnamed ones unique names so they never collide behind the bouncer
+        connect_args.update(
+            statement_cache_size=0,
+            prepared_statement_cache_size=0,
+            prepared_statement_name_func=lambda: f"__asyncpg_{uuid.uuid4()}__",
+        )
+    elif database_config.DB_STATEMENT_TIMEOUT_MS:
+        connect_args["server_settings"] = {"statement_timeout": str(database_config.DB_STATEMENT_TIMEOUT_MS)}
+    if database_config.DB_STATEMENT_TIMEOUT_MS:
+        # client side bound as well, it also applies behind PgBouncer where startup parameters are rejected
+        connect_args["command_timeout"] = database_config.DB_STATEMENT_TIMEOUT_MS / 1000
+    if connect_args:
+        options["connect_args"] = connect_args
+
+    return options
+
+def pool_status() -> dict:
+    """
+    Current state and checkout counters of this worker's pool.
+    """
+    status = {
+        "checkouts": pool_stats.checkouts,
+        "checkout_wait_seconds_total": pool_stats.checkout_wait_seconds_total,
+        "checkout_wait_seconds_max": pool_stats.checkout_wait_seconds_max,
+        "checkout_timeouts": pool_stats.checkout_timeouts,
+    }
+    pool = engine.sync_engine.pool
+    if isinstance(pool, QueuePool):
+        status.update(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            overflow=pool.overflow(),
+            checked_in=pool.checkedin(),
+            max_overflow=database_config.DB_MAX_OVERFLOW,
+        )
+    return status
+
+DATABASE_URL = async_database_url(POSTGRES_DATABASE_URL)
+
+engine = create_async_engine(DATABASE_URL, **engine_options(DATABASE_URL))
+instrument_engine(engine)
+
+# expire_on_commit=False: objects stay readable after commit without an implicit (blocking) reload
+SessionLocal = async_sessionmaker(bind=engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
 
 Base = declarative_base()
 
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
+
+def get_sessionmaker() -> async_sessionmaker:
+    """
+    Session factory for work that outlives the request, e.g. background tasks.
+    """
+    return SessionLocal
@@ -0,0 +1,36 @@
+"""
+Engine settings, read from the environment.
+
+Each gunicorn worker owns one pool, so a deployment opens at most
+workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) connections, keep that below Postgres max_connections
+(or the PgBouncer default_pool_size when DB_PGBOUNCER is enabled).
+"""
+import os
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.environ.get(name)
+    return value.lower() in ("1", "true", "yes", "on") if value else default
+
+# log every SQL statement, development only
+DB_ECHO = _env_bool("DB_ECHO", False)
+
+DB_POOL_SIZE = _env_int("DB_POOL_SIZE", 5)
+DB_MAX_OVERFLOW = _env_int("DB_MAX_OVERFLOW", 10)
+# seconds to wait for a free connection before failing the request
+DB_POOL_TIMEOUT = _env_int("DB_POOL_TIMEOUT", 30)
+# test connections on checkout, survives Postgres / PgBouncer restarts at the cost of one round trip
+DB_POOL_PRE_PING = _env_bool("DB_POOL_PRE_PING", True)
+# seconds before a connection is replaced, keep below any server or proxy idle timeout
+DB_POOL_RECYCLE = _env_int("DB_POOL_RECYCLE", 1800)
+
+# server side statement_timeout in milliseconds, 0 disables it
+DB_STATEMENT_TIMEOUT_MS = _env_int("DB_STATEMENT_TIMEOUT_MS", 0)
+
+# PgBouncer in transaction pooling mode: consecutive transactions may land on different
+# server connections, so server side prepared statements and startup parameters cannot be used
+DB_PGBOUNCER = _env_bool("DB_PGBOUNCER", False)
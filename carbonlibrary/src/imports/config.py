@@ -0,0 +1,8 @@
+import os
+
+# metadata lookups in flight per import job
+IMPORT_CONCURRENCY = int(os.environ.get("IMPORT_CONCURRENCY", 8))
+# provider calls per second per import job, 0 disables the limit (cache hits are never throttled)
+IMPORT_RATE_LIMIT = float(os.environ.get("IMPORT_RATE_LIMIT", 10))
+# books per multi-row INSERT, job progress is committed after every batch
+IMPORT_BATCH_SIZE = int(os.environ.get("IMPORT_BATCH_SIZE", 200))
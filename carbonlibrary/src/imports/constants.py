@@ -0,0 +1,4 @@
+# upper bound of ISBNs per job, keeps the existing-books lookup a single IN query
+IMPORT_MAX_ISBNS = 10000
+# CSV header naming the ISBN column, headerless files use the first column
+CSV_ISBN_COLUMN = "isbn"
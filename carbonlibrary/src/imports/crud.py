@@ -0,0 +1,56 @@
+import datetime
+
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from . import models
+from .schemas import ImportItemStatus, ImportStatus
+
+
+async def create_import_job(db: AsyncSession, entries: list[tuple[str, str | None]]) -> models.ImportJob:
+    """
+    Create a pending import job and its items.
+
+    :param entries: (isbn, error) pairs, entries with an error are recorded as invalid and never fetched.
+    :param db: Database session.
+    :return: Return the new job.
+    """
+    invalid = sum(1 for _, error in entries if error)
+    job = models.ImportJob(
+        status=ImportStatus.PENDING.value,
+        total=len(entries),
+        failed=invalid,
+        created_at=datetime.datetime.now(tz=datetime.timezone.utc),
+    )
+    db.add(job)
+    await db.flush()
+
+    if entries:
+        # one multi-row INSERT for all items
+        await db.execute(insert(models.ImportItem), [
+            {
+                "job_id": job.id,
+                "isbn": isbn,
+                "status": (ImportItemStatus.INVALID if error else ImportItemStatus.PENDING).value,
+                "detail": error,
+            }
+            for isbn, error in entries
+        ])
+    await db.commit()
+
+    return job
+
+async def get_import_job(db: AsyncSession, job_id: int, load_items: bool = False) -> models.ImportJob | None:
+    """
+    Get an import job.
+
+    :param job_id: ID of the job.
+    :param load_items: Also load the per-ISBN outcomes.
+    :param db: Database session.
+    :return: Return job object if found, else None.
+    """
+    query = select(models.ImportJob).where(models.ImportJob.id == job_id).execution_options(populate_existing=True)
+    if load_items:
+        query = query.options(selectinload(models.ImportJob.items))
+    return (await db.execute(query)).scalars().first()
@@ -0,0 +1,42 @@
+import datetime
+
+from sqlalchemy import DateTime, ForeignKey, String
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+
+from ..database import Base
+
+
+class ImportJob(Base):
+    """
+    Bulk ISBN import, counters are updated as batches are committed so the job can be polled.
+    """
+    __tablename__ = "import_jobs"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    status: Mapped[str] = mapped_column(String(16))
+    total: Mapped[int] = mapped_column(default=0)
+    created: Mapped[int] = mapped_column(default=0)
+    existing: Mapped[int] = mapped_column(default=0)
+    not_found: Mapped[int] = mapped_column(default=0)
+    failed: Mapped[int] = mapped_column(default=0)
+    detail: Mapped[str | None] = mapped_column(String(256))
+    created_at: Mapped[datetime.datetime] = mapped_column(DateTime(timezone=True))
+    finished_at: Mapped[datetime.datetime | None] = mapped_column(DateTime(timezone=True))
+
+    items: Mapped[list["ImportItem"]] = relationship(back_populates="job", order_by="ImportItem.id")
+
+
+class ImportItem(Base):
+    """
+    Outcome of one ISBN of an import job.
+    """
+    __tablename__ = "import_items"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    job_id: Mapped[int] = mapped_column(ForeignKey("import_jobs.id", ondelete="CASCADE"), index=True)
+    isbn: Mapped[str] = mapped_column(String(32))
+    status: Mapped[str] = mapped_column(String(16))
+    book_id: Mapped[int | None] = mapped_column(ForeignKey("books.id", ondelete="SET NULL"))
+    detail: Mapped[str | None] = mapped_column(String(256))
+
+    job: Mapped[ImportJob] = relationship(back_populates="items")
@@ -0,0 +1,84 @@
+from fastapi import (APIRouter, BackgroundTasks, Depends, HTTPException,
+                     Security, UploadFile)
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from ..auth import dependencies
+from ..cache.service import ReadThroughCache, get_read_cache
+from ..database import get_db, get_sessionmaker
+from ..metadata.service import MetadataService, get_metadata_service
+from . import constants
+from . import crud as crud_imports
+from . import schemas, service
+
+router = APIRouter(
+    prefix = "/books/import",
+    tags = ["imports"],
+    dependencies=[
+        Security(dependencies.authorize_current_user, scopes=["admin", "superuser"])
+    ])
+
+async def _start_import(
+    raw_isbns: list[str],
+    background_tasks: BackgroundTasks,
+    db: AsyncSession,
+    session_factory: async_sessionmaker,
+    metadata: MetadataService,
+    cache: ReadThroughCache) -> schemas.ImportJob:
+    entries = service.normalize_isbns(raw_isbns)
+    if not entries:
+        raise HTTPException(status_code=400, detail="No ISBNs to import")
+    if len(entries) > constants.IMPORT_MAX_ISBNS:
+        raise HTTPException(status_code=400, detail=f"At most {constants.IMPORT_MAX_ISBNS} ISBNs per import")
+
+    job = await crud_imports.create_import_job(entries=entries, db=db)
+    # runs after the response is sent, poll GET /books/import/{job_id} for progress
+    background_tasks.add_task(service.run_import_job, job.id, session_factory, metadata, cache)
+    return job
+
+@router.post(
+    "",
+    status_code=202,
+    response_model=schemas.ImportJob)
+async def import_books(
+    body: schemas.ImportRequest,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_db),
+    session_factory: async_sessionmaker = Depends(get_sessionmaker),
+    metadata: MetadataService = Depends(get_metadata_service),
+    cache: ReadThroughCache = Depends(get_read_cache)):
+    """
+    Start a bulk import of a list of ISBNs.
+    """
+    return await _start_import(body.isbns, background_tasks, db, session_factory, metadata, cache)
+
+@router.post(
+    "/csv",
+    status_code=202,
+    response_model=schemas.ImportJob)
+async def import_books_csv(
+    csv_file: UploadFile,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_db),
+    session_factory: async_sessionmaker = Depends(get_sessionmaker),
+    metadata: MetadataService = Depends(get_metadata_service),
+    cache: ReadThroughCache = Depends(get_read_cache)):
+    """
+    Start a bulk import of the ISBNs of a CSV file.
+    """
+    try:
+        raw_isbns = service.parse_isbn_csv(await csv_file.read())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return await _start_import(raw_isbns, background_tasks, db, session_factory, metadata, cache)
+
+@router.get(
+    "/{job_id}",
+    response_model=schemas.ImportJobDetail)
+async def get_import_job(job_id: int, db: AsyncSession = Depends(get_db)):
+    """
+    Status, counters and per-ISBN outcomes of an import job.
+    """
+    job = await crud_imports.get_import_job(job_id=job_id, load_items=True, db=db)
+    if job is None:
+        raise HTTPException(status_code=400, detail="Import job not found")
+    return job
@@ -0,0 +1,49 @@
+import datetime
+from enum import Enum
+
+from pydantic import BaseModel
+
+
+class ImportStatus(str, Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+class ImportItemStatus(str, Enum):
+    PENDING = "pending"
+    CREATED = "created"
+    EXISTS = "exists"
+    NOT_FOUND = "not_found"
+    INVALID = "invalid"
+    FAILED = "failed"
+
+class ImportRequest(BaseModel):
+    isbns: list[str]
+
+class ImportItem(BaseModel):
+    isbn: str
+    status: ImportItemStatus
+    book_id: int | None = None
+    detail: str | None = None
+
+    class Config:
+        orm_mode = True
+
+class ImportJob(BaseModel):
+    id: int
+    status: ImportStatus
+    total: int
+    created: int
+    existing: int
+    not_found: int
+    failed: int
+    detail: str | None = None
+    created_at: datetime.datetime
+    finished_at: datetime.datetime | None = None
+
+    class Config:
+        orm_mode = True
+
+class ImportJobDetail(ImportJob):
+    items: list[ImportItem]
@@ -0,0 +1,193 @@
+import asyncio
+import csv
+import datetime
+import io
+
+from pydantic import ValidationError
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from ..book import cache as book_cache
+from ..book import models as book_models
+from ..book import schemas as book_schemas
+from ..cache.service import ReadThroughCache
+from ..metadata.exceptions import MetadataUnavailable
+from ..metadata.service import MetadataService, is_valid_isbn, normalize_isbn
+from ..utils import RateLimiter
+from . import config, constants, models
+from .schemas import ImportItemStatus, ImportStatus
+
+
+def normalize_isbns(raw_isbns: list[str]) -> list[tuple[str, str | None]]:
+    """
+    Strip hyphens and spaces, drop repeats and flag malformed ISBNs.
+
+    :param raw_isbns: ISBNs as submitted.
+    :return: Return (isbn, error) pairs in submission order, error is None for well formed ISBNs.
+    """
+    entries = {}
+    for raw in raw_isbns:
+        isbn = normalize_isbn(raw)
+        if not isbn or isbn in entries:
+            continue
+        entries[isbn] = None if is_valid_isbn(isbn) else "Malformed ISBN"
+    return [(isbn[:32], error) for isbn, error in entries.items()]
+
+def parse_isbn_csv(content: bytes) -> list[str]:
+    """
+    Read ISBNs from the `isbn` column of a CSV file, or from its first column when there is no such header.
+
+    :raises ValueError: If the file is not UTF-8 text.
+    """
+    try:
+        text = content.decode("utf-8-sig")
+    except UnicodeDecodeError as e:
+        raise ValueError("CSV file must be UTF-8 encoded") from e
+    rows = [row for row in csv.reader(io.StringIO(text)) if row]
+    if not rows:
+        return []
+    header = [cell.strip().lower() for cell in rows[0]]
+    if constants.CSV_ISBN_COLUMN in header:
+        column = header.index(constants.CSV_ISBN_COLUMN)
+        rows = rows[1:]
+    else:
+        column = 0
+    return [row[column] for row in rows if len(row) > column]
+
+async def run_import_job(job_id: int, session_factory: async_sessionmaker, metadata: MetadataService, cache: ReadThroughCache | None = None):
+    """
+    Background task importing the pending items of a job.
+
+    Books already in the catalogue are matched with one query, the rest are looked up concurrently
+    (bounded by IMPORT_CONCURRENCY and IMPORT_RATE_LIMIT) and inserted IMPORT_BATCH_SIZE rows at a time.
+    Progress is committed after every batch, and cached book listings invalidated when it created books.
+    """
+    async with session_factory() as db:
+        try:
+            await _import_pending_items(db, job_id, session_factory, metadata, cache)
+        except Exception as e:
+            await db.rollback()
+            await _finish_job(db, job_id, ImportStatus.FAILED, detail=str(e)[:256] or type(e).__name__)
+
+async def _import_pending_items(db: AsyncSession, job_id: int, session_factory: async_sessionmaker, metadata: MetadataService, cache: ReadThroughCache | None):
+    await db.execute(update(models.ImportJob).where(models.ImportJob.id == job_id).values(status=ImportStatus.RUNNING.value))
+    await db.commit()
+
+    rows = await db.execute(
+        select(models.ImportItem.id, models.ImportItem.isbn)
+        .where(models.ImportItem.job_id == job_id, models.ImportItem.status == ImportItemStatus.PENDING.value)
+    )
+    pending = {isbn: item_id for item_id, isbn in rows}
+
+    if pending:
+        existing = dict((await db.execute(
+            select(book_models.Book.isbn, book_models.Book.id).where(book_models.Book.isbn.in_(list(pending)))
+        )).all())
+        if existing:
+            await _record_outcomes(db, job_id, [
+                _outcome(pending.pop(isbn), ImportItemStatus.EXISTS, book_id=book_id) for isbn, book_id in existing.items()
+            ])
+
+    semaphore = asyncio.Semaphore(config.IMPORT_CONCURRENCY)
+    limiter = RateLimiter(config.IMPORT_RATE_LIMIT)
+
+    async def lookup(isbn: str) -> tuple[str, dict | None, str | None]:
+        async with semaphore:
+            # the lookup commits to isbn_metadata, keep it off the session that tracks the job
+            async with session_factory() as lookup_db:
+                try:
+                    return isbn, await metadata.get(db=lookup_db, isbn=isbn, limiter=limiter), None
+                except MetadataUnavailable as e:
+                    return isbn, None, str(e)
+
+    lookups = [asyncio.ensure_future(lookup(isbn)) for isbn in pending]
+    try:
+        batch = []
+        for next_lookup in asyncio.as_completed(lookups):
+            batch.append(await next_lookup)
+            if len(batch) >= config.IMPORT_BATCH_SIZE:
+                await _write_batch(db, job_id, pending, batch, cache)
+                batch = []
+        if batch:
+            await _write_batch(db, job_id, pending, batch, cache)
+    finally:
+        for task in lookups:
+            task.cancel()
+
+    await _finish_job(db, job_id, ImportStatus.COMPLETED)
+
+async def _write_batch(db: AsyncSession, job_id: int, pending: dict[str, int], batch: list[tuple[str, dict | None, str | None]], cache: ReadThroughCache | None = None):
+    outcomes = []
+    books = []
+    created = []
+    for isbn, payload, error in batch:
+        if error:
+            outcomes.append(_outcome(pending[isbn], ImportItemStatus.FAILED, detail=error))
+        elif payload is None:
+            outcomes.append(_outcome(pending[isbn], ImportItemStatus.NOT_FOUND))
+        else:
+            try:
+                book = book_schemas.BookCreate(**payload).model_dump()
+            except ValidationError:
+                outcomes.append(_outcome(pending[isbn], ImportItemStatus.FAILED, detail="Incomplete metadata"))
+                continue
+            book["isbn"] = isbn
+            books.append(book)
+
+    if books:
+        statement = insert(book_models.Book).returning(book_models.Book.id, book_models.Book.isbn)
+        try:
+            # executemany with RETURNING is sent as batched multi-row INSERTs
+            created = (await db.execute(statement, books)).all()
+        except DBAPIError:
+            # one bad row fails the whole statement, retry row by row to isolate it
+            await db.rollback()
+            created = []
+            for book in books:
+                try:
+                    created.extend((await db.execute(statement, [book])).all())
+                    await db.commit()
+                except DBAPIError as e:
+                    await db.rollback()
+                    outcomes.append(_outcome(pending[book["isbn"]], ImportItemStatus.FAILED, detail=str(e.orig)[:256]))
+        outcomes.extend(_outcome(pending[isbn], ImportItemStatus.CREATED, book_id=book_id) for book_id, isbn in created)
+
+    await _record_outcomes(db, job_id, outcomes)
+    if cache is not None and created:
+        await book_cache.invalidate_books(cache, ids=[book_id for book_id, _ in created])
+
+def _outcome(item_id: int, status: ImportItemStatus, book_id: int | None = None, detail: str | None = None) -> dict:
+    # executemany needs the same keys in every row
+    return {"id": item_id, "status": status.value, "book_id": book_id, "detail": detail}
+
+COUNTERS = {
+    ImportItemStatus.CREATED.value: "created",
+    ImportItemStatus.EXISTS.value: "existing",
+    ImportItemStatus.NOT_FOUND.value: "not_found",
+    ImportItemStatus.FAILED.value: "failed",
+}
+
+async def _record_outcomes(db: AsyncSession, job_id: int, outcomes: list[dict]):
+    if not outcomes:
+        return
+    await db.execute(update(models.ImportItem), outcomes)
+
+    counts = {}
+    for outcome in outcomes:
+        counter = COUNTERS[outcome["status"]]
+        counts[counter] = counts.get(counter, 0) + 1
+    await db.execute(
+        update(models.ImportJob)
+        .where(models.ImportJob.id == job_id)
+        .values({getattr(models.ImportJob, counter): getattr(models.ImportJob, counter) + count for counter, count in counts.items()})
+    )
+    await db.commit()
+
+async def _finish_job(db: AsyncSession, job_id: int, status: ImportStatus, detail: str | None = None):
+    await db.execute(
+        update(models.ImportJob)
+        .where(models.ImportJob.id == job_id)
+        .values(status=status.value, detail=detail, finished_at=datetime.datetime.now(tz=datetime.timezone.utc))
+    )
+    await db.commit()
@@ -0,0 +1,4 @@
+# days a book may be kept, due_at of a new loan
+LOAN_PERIOD_DAYS = 21
+
+LOAN_PAGE_SIZE_MAX = 100
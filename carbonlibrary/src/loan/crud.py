@@ -0,0 +1,146 @@
+import datetime
+
+from sqlalchemy import func, select, tuple_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..book import models as book_models
+from . import constants, models
+
+
+def queue_head_user_id(book_id):
+    """
+    Scalar subquery of the user first in line for a book, NULL when nobody holds it.
+    """
+    return (
+        select(models.Hold.user_id)
+        .where(models.Hold.book_id == book_id, models.Hold.closed_at.is_(None))
+        .order_by(models.Hold.id)
+        .limit(1)
+        .scalar_subquery()
+    )
+
+def open_loan(db: AsyncSession, book_id: int, user_id: int, now: datetime.datetime) -> models.Loan:
+    """
+    Record a new loan, not committed, the caller commits it with the book update.
+    """
+    db_loan = models.Loan(
+        book_id=book_id,
+        user_id=user_id,
+        borrowed_at=now,
+        due_at=now + datetime.timedelta(days=constants.LOAN_PERIOD_DAYS),
+    )
+    db.add(db_loan)
+    return db_loan
+
+async def close_loan(db: AsyncSession, book_id: int, now: datetime.datetime):
+    """
+    Mark the open loan of a book returned, not committed.
+    """
+    await db.execute(
+        update(models.Loan)
+        .where(models.Loan.book_id == book_id, models.Loan.returned_at.is_(None))
+        .values(returned_at=now)
+        .execution_options(synchronize_session=False)
+    )
+
+async def close_hold(db: AsyncSession, book_id: int, user_id: int, now: datetime.datetime):
+    """
+    Take a user out of the queue of a book, not committed.
+    """
+    await db.execute(
+        update(models.Hold)
+        .where(models.Hold.book_id == book_id, models.Hold.user_id == user_id, models.Hold.closed_at.is_(None))
+        .values(closed_at=now)
+        .execution_options(synchronize_session=False)
+    )
+
+async def get_overdue_loans(db: AsyncSession, now: datetime.datetime, after: list | None = None, limit: int = 20) -> list[models.Loan]:
+    """
+    Retrieve open loans past their due date, most overdue first, with keyset pagination.
+
+    :param now: Loans due before it are overdue.
+    :param after: [due_at, id] of the last loan of the previous page, None for the first page.
+    :param limit: Number of loans to retrieve.
+    :param db: Database session.
+    :return: List of loans.
+    """
+    query = (
+        select(models.Loan)
+        .where(models.Loan.returned_at.is_(None), models.Loan.due_at < now)
+        .order_by(models.Loan.due_at, models.Loan.id)
+    )
+    if after:
+        query = query.where(tuple_(models.Loan.due_at, models.Loan.id) > tuple_(after[0], after[1]))
+    return (await db.execute(query.limit(limit))).scalars().all()
+
+async def get_user_loans(db: AsyncSession, user_id: int, active: bool = False, limit: int = 20) -> list[models.Loan]:
+    """
+    Retrieve the loans of a user, latest first.
+
+    :param active: Only loans that are not returned yet.
+    :param limit: Number of loans to retrieve.
+    :param db: Database session.
+    :return: List of loans.
+    """
+    query = select(models.Loan).where(models.Loan.user_id == user_id)
+    if active:
+        query = query.where(models.Loan.returned_at.is_(None))
+    query = query.order_by(models.Loan.borrowed_at.desc(), models.Loan.id.desc())
+    return (await db.execute(query.limit(limit))).scalars().all()
+
+async def get_most_borrowed_books(db: AsyncSession, since: datetime.datetime, limit: int = 20) -> list:
+    """
+    Retrieve the books borrowed most often since a point in time.
+
+    :return: List of (book_id, title, loans) rows.
+    """
+    loans = func.count(models.Loan.id).label("loans")
+    query = (
+        select(models.Loan.book_id, book_models.Book.title, loans)
+        .join(book_models.Book, book_models.Book.id == models.Loan.book_id)
+        .where(models.Loan.borrowed_at >= since)
+        .group_by(models.Loan.book_id, book_models.Book.title)
+        .order_by(loans.desc(), models.Loan.book_id)
+    )
+    return (await db.execute(query.limit(limit))).all()
+
+async def get_hold_queue(db: AsyncSession, book_id: int) -> list[models.Hold]:
+    """
+    Retrieve the open holds of a book in queue order.
+    """
+    query = (
+        select(models.Hold)
+        .where(models.Hold.book_id == book_id, models.Hold.closed_at.is_(None))
+        .order_by(models.Hold.id)
+    )
+    return (await db.execute(query)).scalars().all()
+
+async def place_hold(db: AsyncSession, book_id: int, user_id: int) -> models.Hold | None:
+    """
+    Put a user at the end of the queue of a book.
+
+    :return: Return the new hold, None if the user already holds the book.
+    """
+    db_hold = models.Hold(book_id=book_id, user_id=user_id, placed_at=datetime.datetime.now(tz=datetime.timezone.utc))
+    db.add(db_hold)
+    try:
+        await db.commit()
+    except IntegrityError:
+        # uq_holds_open_book_id_user_id
+        await db.rollback()
+        return None
+    return db_hold
+
+async def cancel_hold(db: AsyncSession, book_id: int, user_id: int) -> bool:
+    """
+    :return: Return True if the user had an open hold on the book.
+    """
+    result = await db.execute(
+        update(models.Hold)
+        .where(models.Hold.book_id == book_id, models.Hold.user_id == user_id, models.Hold.closed_at.is_(None))
+        .values(closed_at=datetime.datetime.now(tz=datetime.timezone.utc))
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return result.rowcount > 0
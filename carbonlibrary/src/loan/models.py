@@ -0,0 +1,52 @@
+import datetime
+
+from sqlalchemy import DateTime, ForeignKey, Index, text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from ..database import Base
+
+OPEN_LOAN = text("returned_at IS NULL")
+OPEN_HOLD = text("closed_at IS NULL")
+
+
+class Loan(Base):
+    """
+    One borrowing of a book, kept after the book is returned.
+    """
+    __tablename__ = "loans"
+    __table_args__ = (
+        # a user's loans, open ones first (returned_at IS NULL)
+        Index("ix_loans_user_id_returned_at", "user_id", "returned_at"),
+        # partial: the overdue list only ever walks open loans, in due order
+        Index("ix_loans_open_due_at", "due_at", "id", postgresql_where=OPEN_LOAN, sqlite_where=OPEN_LOAN),
+        # partial: a book has at most one open loan
+        Index("uq_loans_open_book_id", "book_id", unique=True, postgresql_where=OPEN_LOAN, sqlite_where=OPEN_LOAN),
+        # borrow counts over a period
+        Index("ix_loans_borrowed_at_book_id", "borrowed_at", "book_id"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    book_id: Mapped[int] = mapped_column(ForeignKey("books.id", ondelete="CASCADE"))
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"))
+    borrowed_at: Mapped[datetime.datetime] = mapped_column(DateTime(timezone=True))
+    due_at: Mapped[datetime.datetime] = mapped_column(DateTime(timezone=True))
+    returned_at: Mapped[datetime.datetime | None] = mapped_column(DateTime(timezone=True))
+
+
+class Hold(Base):
+    """
+    Place of a user in the reservation queue of a book, closed when the user borrows the book or cancels.
+    """
+    __tablename__ = "holds"
+    __table_args__ = (
+        # partial: the queue of a book in placement order
+        Index("ix_holds_open_book_id_id", "book_id", "id", postgresql_where=OPEN_HOLD, sqlite_where=OPEN_HOLD),
+        # partial: one place per user in a queue
+        Index("uq_holds_open_book_id_user_id", "book_id", "user_id", unique=True, postgresql_where=OPEN_HOLD, sqlite_where=OPEN_HOLD),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    book_id: Mapped[int] = mapped_column(ForeignKey("books.id", ondelete="CASCADE"))
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"))
+    placed_at: Mapped[datetime.datetime] = mapped_column(DateTime(timezone=True))
+    closed_at: Mapped[datetime.datetime | None] = mapped_column(DateTime(timezone=True))
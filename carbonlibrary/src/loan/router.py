@@ -0,0 +1,154 @@
+import datetime
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Security
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..auth import dependencies
+from ..book import crud as crud_books
+from ..database import get_db
+from ..user import crud as crud_users
+from ..utils import decode_cursor, encode_cursor
+from . import constants
+from . import crud as crud_loans
+from . import schemas
+
+router = APIRouter(
+    prefix = "/loans",
+    tags = ["loans"],
+)
+
+@router.get(
+    "/overdue",
+    response_model=schemas.LoanPage,
+    dependencies=[
+        Security(dependencies.authorize_current_user, scopes=["admin", "superuser"])
+    ])
+async def get_overdue_loans(
+    limit: int = Query(default=20, ge=1, le=constants.LOAN_PAGE_SIZE_MAX),
+    after: str | None = None,
+    db: AsyncSession = Depends(get_db)):
+    """
+    Open loans past their due date, most overdue first. Pass `next_cursor` back as `after` for the next page.
+    """
+    position = None
+    if after:
+        try:
+            cursor = decode_cursor(after)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        if cursor.get("sort") != "due_at" or not isinstance(cursor.get("key"), list) or len(cursor["key"]) != 2:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        due_at, loan_id = cursor["key"]
+        #bool is an int subclass, JSON true is not an ID
+        if not isinstance(due_at, str) or type(loan_id) is not int:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        try:
+            position = [datetime.datetime.fromisoformat(due_at), loan_id]
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    now = datetime.datetime.now(tz=datetime.timezone.utc)
+    loans = await crud_loans.get_overdue_loans(now=now, after=position, limit=limit + 1, db=db)
+    next_cursor = None
+    if len(loans) > limit:
+        loans = loans[:limit]
+        next_cursor = encode_cursor({"sort": "due_at", "key": [loans[-1].due_at.isoformat(), loans[-1].id]})
+    return {"items": loans, "next_cursor": next_cursor}
+
+@router.get(
+    "/reports/most-borrowed",
+    response_model=list[schemas.BookLoanCount],
+    dependencies=[
+        Security(dependencies.authorize_current_user, scopes=["admin", "superuser"])
+    ])
+async def get_most_borrowed_books(
+    days: int = Query(default=30, ge=1),
+    limit: int = Query(default=20, ge=1, le=constants.LOAN_PAGE_SIZE_MAX),
+    db: AsyncSession = Depends(get_db)):
+    """
+    Books borrowed most often in the last `days` days.
+    """
+    since = datetime.datetime.now(tz=datetime.timezone.utc) - datetime.timedelta(days=days)
+    rows = await crud_loans.get_most_borrowed_books(since=since, limit=limit, db=db)
+    return [schemas.BookLoanCount(**row._mapping) for row in rows]
+
+@router.get(
+    "/user/{email}",
+    response_model=list[schemas.Loan],
+    dependencies=[
+        Security(dependencies.authorize_current_user, scopes=["user", "admin", "superuser"]),
+        Depends(dependencies.confirm_user_authorization)
+    ])
+async def get_user_loans(
+    email: str,
+    active: bool = False,
+    limit: int = Query(default=20, ge=1, le=constants.LOAN_PAGE_SIZE_MAX),
+    db: AsyncSession = Depends(get_db)):
+    """
+    Loan history of a user, latest first, `active` restricts it to books not returned yet.
+    """
+    db_user = await crud_users.get_user_by_email(email=email, db=db)
+    if not db_user:
+        raise HTTPException(status_code=400, detail="Target user does not exist")
+    return await crud_loans.get_user_loans(user_id=db_user.id, active=active, limit=limit, db=db)
+
+def _hold_queue(holds: list) -> list[schemas.Hold]:
+    return [
+        schemas.Hold(id=hold.id, book_id=hold.book_id, user_id=hold.user_id, placed_at=hold.placed_at, position=position)
+        for position, hold in enumerate(holds, start=1)
+    ]
+
+@router.get(
+    "/holds/{book_id}",
+    response_model=list[schemas.Hold],
+    dependencies=[
+        Security(dependencies.authorize_current_user, scopes=["admin", "superuser"])
+    ])
+async def get_hold_queue(book_id: int, db: AsyncSession = Depends(get_db)):
+    """
+    Reservation queue of a book, next in line first.
+    """
+    return _hold_queue(await crud_loans.get_hold_queue(book_id=book_id, db=db))
+
+@router.post(
+    "/holds/{email}/{book_id}",
+    response_model=schemas.Hold,
+    dependencies=[
+        Security(dependencies.authorize_current_user, scopes=["user", "admin", "superuser"]),
+        Depends(dependencies.confirm_user_authorization)
+    ])
+async def place_hold(email: str, book_id: int, db: AsyncSession = Depends(get_db)):
+    """
+    Join the reservation queue of a book, the book is lent to the queue in order as it comes back.
+    """
+    db_user = await crud_users.get_user_by_email(email=email, db=db)
+    db_book = await crud_books.get_book_by_id(book_id=book_id, db=db)
+    if not (db_user and db_book):
+        raise HTTPException(status_code=400, detail="Target user and book do not exist")
+    if db_book.user_id == db_user.id:
+        raise HTTPException(status_code=400, detail="User already borrowed this book")
+
+    queue = await crud_loans.get_hold_queue(book_id=book_id, db=db)
+    if not db_book.is_borrowed and not queue:
+        raise HTTPException(status_code=400, detail="Book is available, borrow it instead")
+
+    if await crud_loans.place_hold(book_id=book_id, user_id=db_user.id, db=db) is None:
+        raise HTTPException(status_code=400, detail="User already holds this book")
+
+    queue = _hold_queue(await crud_loans.get_hold_queue(book_id=book_id, db=db))
+    return next(hold for hold in queue if hold.user_id == db_user.id)
+
+@router.delete(
+    "/holds/{email}/{book_id}",
+    dependencies=[
+        Security(dependencies.authorize_current_user, scopes=["user", "admin", "superuser"]),
+        Depends(dependencies.confirm_user_authorization)
+    ])
+async def cancel_hold(email: str, book_id: int, db: AsyncSession = Depends(get_db)):
+    """
+    Leave the reservation queue of a book.
+    """
+    db_user = await crud_users.get_user_by_email(email=email, db=db)
+    if not db_user or not await crud_loans.cancel_hold(book_id=book_id, user_id=db_user.id, db=db):
+        raise HTTPException(status_code=400, detail="User does not hold this book")
+    return {"message": "Hold cancelled successfully"}
@@ -0,0 +1,31 @@
+from datetime import datetime
+
+from pydantic import BaseModel
+
+class Loan(BaseModel):
+    id: int
+    book_id: int
+    user_id: int
+    borrowed_at: datetime
+    due_at: datetime
+    returned_at: datetime | None = None
+
+    class Config:
+        orm_mode = True
+
+class LoanPage(BaseModel):
+    items: list[Loan]
+    next_cursor: str | None = None
+
+class Hold(BaseModel):
+    id: int
+    book_id: int
+    user_id: int
+    placed_at: datetime
+    # 1 is next in line
+    position: int
+
+class BookLoanCount(BaseModel):
+    book_id: int
+    title: str
+    loans: int
@@ -1,18 +1,41 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 
+from .admin import router as admin_router
 from .auth import router as auth_router
 from .book import router as books_router
 from .database import Base, engine
+from .imports import router as imports_router
+from .loan import router as loans_router
+from .metadata.service import close_http_client
+from .metrics import router as metrics_router
+from .metrics.middleware import MetricsMiddleware
+from .profiler import config as profiler_config
+from .profiler.middleware import ProfilerMiddleware
 from .user import router as users_router
 
-Base.metadata.create_all(engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+    yield
+    await close_http_client()
+    await engine.dispose()
 
-app = FastAPI()
+#orjson renders the responses that still go through response_model, routes that return
+#utils.json_response bypass that pass entirely
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
 app.include_router(users_router.router, prefix="/api")
+app.include_router(imports_router.router, prefix="/api")
 app.include_router(books_router.router, prefix="/api")
+app.include_router(loans_router.router, prefix="/api")
 app.include_router(auth_router.router, prefix="/api")
+app.include_router(admin_router.router, prefix="/api")
+app.include_router(metrics_router.router)
 
 origins = [
     # "http://localhost.tiangolo.com",
@@ -34,4 +57,10 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-)
\ No newline at end of file
+)
+
+if profiler_config.PROFILER_ENABLED:
+    app.add_middleware(ProfilerMiddleware)
+
+#outermost, so the latency covers the other middlewares too
+app.add_middleware(MetricsMiddleware)
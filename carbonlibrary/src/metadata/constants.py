@@ -0,0 +1,15 @@
+OPENLIBRARY_URL = "http://openlibrary.org/api/volumes/brief/isbn/{isbn}.json"
+
+# connect fast, give Open Library a little longer to answer
+HTTP_CONNECT_TIMEOUT = 3.0
+HTTP_READ_TIMEOUT = 10.0
+HTTP_MAX_CONNECTIONS = 20
+HTTP_RETRIES = 2
+HTTP_RETRY_BACKOFF = 0.5
+
+# seconds a fetched record (or a "not found" answer) is served from isbn_metadata
+CACHE_TTL = 30 * 24 * 3600
+NEGATIVE_CACHE_TTL = 24 * 3600
+# per worker layer in front of the table
+MEMORY_CACHE_SIZE = 4096
+MEMORY_CACHE_TTL = 300
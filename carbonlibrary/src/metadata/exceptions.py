@@ -0,0 +1,4 @@
+class MetadataUnavailable(Exception):
+    """
+    The metadata provider could not be reached or answered with an error.
+    """
@@ -0,0 +1,18 @@
+import datetime
+
+from sqlalchemy import JSON, DateTime, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from ..database import Base
+
+
+class IsbnMetadata(Base):
+    """
+    Cached provider answer for an ISBN, payload is None when the provider does not know the ISBN.
+    """
+    __tablename__ = "isbn_metadata"
+
+    isbn: Mapped[str] = mapped_column(String(13), primary_key=True)
+    payload: Mapped[dict | None] = mapped_column(JSON)
+    fetched_at: Mapped[datetime.datetime] = mapped_column(DateTime(timezone=True))
+    expires_at: Mapped[datetime.datetime] = mapped_column(DateTime(timezone=True))
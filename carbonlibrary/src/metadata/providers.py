@@ -0,0 +1,120 @@
+import asyncio
+import time
+from abc import ABC, abstractmethod
+
+import httpx
+
+from ..metrics.instrumentation import observe_upstream
+from ..utils import dict_parser
+from . import constants
+from .exceptions import MetadataUnavailable
+
+
+class MetadataProvider(ABC):
+    """
+    Source of book metadata keyed by ISBN.
+    """
+
+    @abstractmethod
+    async def fetch(self, isbn: str) -> dict | None:
+        """
+        :param isbn: ISBN to look up.
+        :return: Return BookCreate fields if the ISBN is known, else None.
+        :raises MetadataUnavailable: If the provider cannot answer right now.
+        """
+
+
+class OpenLibraryProvider(MetadataProvider):
+    """
+    Open Library volumes API, retried with backoff on timeouts, transport errors and 5xx answers.
+    """
+
+    def __init__(self, client: httpx.AsyncClient):
+        self.client = client
+
+    async def fetch(self, isbn: str) -> dict | None:
+        url = constants.OPENLIBRARY_URL.format(isbn=isbn)
+        for attempt in range(constants.HTTP_RETRIES + 1):
+            start = time.perf_counter()
+            try:
+                response = await self.client.get(url)
+                observe_upstream("openlibrary", "volumes", str(response.status_code), time.perf_counter() - start)
+                if response.status_code < 500:
+                    break
+                error = MetadataUnavailable(f"Open Library answered {response.status_code}")
+            except httpx.TimeoutException:
+                observe_upstream("openlibrary", "volumes", "timeout", time.perf_counter() - start)
+                error = MetadataUnavailable("Request Time Out")
+            except httpx.RequestError:
+                observe_upstream("openlibrary", "volumes", "error", time.perf_counter() - start)
+                error = MetadataUnavailable("Request Error")
+            if attempt < constants.HTTP_RETRIES:
+                await asyncio.sleep(constants.HTTP_RETRY_BACKOFF * 2 ** attempt)
+        else:
+            raise error
+
+        if response.status_code == 404:
+            return None
+        if response.status_code >= 400:
+            raise MetadataUnavailable(f"Open Library answered {response.status_code}")
+
+        try:
+            content = response.json()
+        except ValueError:
+            raise MetadataUnavailable("Open Library answered with invalid JSON")
+        return parse_openlibrary_record(content, isbn)
+
+
+def parse_openlibrary_record(dict_content: dict, isbn: str) -> dict | None:
+    """
+    Select the book fields of an Open Library volumes answer.
+
+    :param dict_content: Decoded JSON answer.
+    :param isbn: ISBN that was requested.
+    :return: Return BookCreate fields, None if the answer has no record for the ISBN.
+    """
+    records = dict_content.get('records') if isinstance(dict_content, dict) else None
+    if not records:
+        return None
+    #call list on dict to return keys of dictionary as list, instead of .keys(), as it returns key_dicts obj which is hard to handle
+    OPENLIB_KEY = (list(records))[0]
+    #there are multiple isbns in the isbn list ['0316414247', '9780316414241'], isbn_matching makes sure to retrieve the exact isbn that user specified.
+    isbns = dict_parser(dict_content, ['records', OPENLIB_KEY, 'isbns']) or []
+    if isbn not in isbns:
+        return None
+    isbn_matching = isbns.index(isbn)
+    title = dict_parser(dict_content, ['records', OPENLIB_KEY, 'data', 'title'])
+    #select certain book fields from dictionary using dict_parser function in utils.py
+    return {
+        'title': title.title() if title else title,
+        'author': dict_parser(dict_content, ['records', OPENLIB_KEY, 'data', 'authors', 0, 'name']),
+        'edition': dict_parser(dict_content, ['records', OPENLIB_KEY, 'details', 'details', 'edition_name']),
+        'publisher': dict_parser(dict_content, ['records', OPENLIB_KEY, 'data', 'publishers', 0, 'name']),
+        'publish_date': dict_parser(dict_content, ['records', OPENLIB_KEY, 'publishDates', 0]),
+        'publish_place': dict_parser(dict_content, ['records', OPENLIB_KEY, 'details', 'details', 'publish_country']),
+        'number_of_pages': dict_parser(dict_content, ['records', OPENLIB_KEY, 'data', 'number_of_pages']),
+        'description': dict_parser(dict_content, ['records', OPENLIB_KEY, 'details', 'details', 'description', 'value']),
+        'language': dict_parser(dict_content, ['records', OPENLIB_KEY, 'details', 'details', 'languages', 0, 'key']),
+        'isbn': dict_parser(dict_content, ['records', OPENLIB_KEY, 'isbns', isbn_matching]),
+        'lccn': dict_parser(dict_content, ['records', OPENLIB_KEY, 'lccns', 0]),
+        'subtitle': dict_parser(dict_content, ['records', OPENLIB_KEY, 'data', 'subtitle']),
+        'subjects': dict_parser(dict_content, ['records', OPENLIB_KEY, 'details', 'details', 'subjects', 0]),
+    }
+
+
+class FakeProvider(MetadataProvider):
+    """
+    In-memory provider for tests and offline development.
+    """
+
+    def __init__(self, records: dict[str, dict] | None = None, delay: float = 0.0):
+        self.records = records or {}
+        self.delay = delay
+        self.calls: list[str] = []
+
+    async def fetch(self, isbn: str) -> dict | None:
+        self.calls.append(isbn)
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        record = self.records.get(isbn)
+        return dict(record) if record is not None else None
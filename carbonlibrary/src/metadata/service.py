@@ -0,0 +1,156 @@
+import asyncio
+import datetime
+import re
+
+import httpx
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..utils import RateLimiter, TTLCache
+from . import constants, models
+from .providers import MetadataProvider, OpenLibraryProvider
+
+_MISSING = object()
+
+# ISBN-10 (check digit may be X) or ISBN-13, after normalize_isbn
+ISBN_PATTERN = re.compile(r"\d{9}[\dX]|\d{13}")
+
+
+def normalize_isbn(raw: str) -> str:
+    """
+    Canonical form of an ISBN: hyphens and spaces stripped, check digit X upper case.
+    Lookups and cache entries are keyed by it, so every spelling of an ISBN shares them.
+    """
+    return re.sub(r"[\s-]", "", raw).upper()
+
+def is_valid_isbn(isbn: str) -> bool:
+    """
+    Whether a normalized ISBN has the ISBN-10 or ISBN-13 form, and so fits the isbn columns.
+    """
+    return ISBN_PATTERN.fullmatch(isbn) is not None
+
+
+class MetadataService:
+    """
+    Read-through cache in front of a metadata provider.
+
+    Lookups go through a per-worker memory cache, then the isbn_metadata table, and only then to the
+    provider. Concurrent lookups of the same ISBN share one provider call. "Not found" answers are
+    cached too, for a shorter time.
+    """
+
+    def __init__(self, provider: MetadataProvider):
+        self.provider = provider
+        self.memory_cache = TTLCache(maxsize=constants.MEMORY_CACHE_SIZE, ttl=constants.MEMORY_CACHE_TTL)
+        self._inflight: dict[str, asyncio.Future] = {}
+
+    async def get(self, db: AsyncSession, isbn: str, limiter: RateLimiter | None = None) -> dict | None:
+        """
+        :param db: Database session, used for the isbn_metadata table.
+        :param isbn: ISBN to look up, in any spelling normalize_isbn accepts.
+        :param limiter: Throttles the provider calls only, cache hits are never delayed.
+        :return: Return BookCreate fields if the ISBN is known, else None.
+        :raises ValueError: If the ISBN is malformed.
+        :raises MetadataUnavailable: If the provider had to be asked and could not answer.
+        """
+        isbn = normalize_isbn(isbn)
+        if not is_valid_isbn(isbn):
+            raise ValueError("Malformed ISBN")
+        payload = self.memory_cache.get(isbn, _MISSING)
+        if payload is not _MISSING:
+            return payload
+
+        inflight = self._inflight.get(isbn)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[isbn] = future
+        try:
+            payload = await self._load(db, isbn, limiter)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # mark retrieved, there may be no follower left to do it
+            future.exception()
+            raise
+        else:
+            future.set_result(payload)
+            return payload
+        finally:
+            del self._inflight[isbn]
+
+    async def _load(self, db: AsyncSession, isbn: str, limiter: RateLimiter | None) -> dict | None:
+        now = datetime.datetime.now(tz=datetime.timezone.utc)
+
+        entry = (await db.execute(select(models.IsbnMetadata).where(models.IsbnMetadata.isbn == isbn))).scalars().first()
+        if entry is not None and _aware(entry.expires_at) > now:
+            self._remember(isbn, entry.payload)
+            return entry.payload
+
+        if limiter is not None:
+            await limiter.wait()
+        payload = await self.provider.fetch(isbn)
+
+        ttl = constants.CACHE_TTL if payload is not None else constants.NEGATIVE_CACHE_TTL
+        if entry is None:
+            entry = models.IsbnMetadata(isbn=isbn)
+            db.add(entry)
+        entry.payload = payload
+        entry.fetched_at = now
+        entry.expires_at = now + datetime.timedelta(seconds=ttl)
+        try:
+            await db.commit()
+        except IntegrityError:
+            # another worker cached the same ISBN first, its answer is as good as ours
+            await db.rollback()
+
+        self._remember(isbn, payload)
+        return payload
+
+    def _remember(self, isbn: str, payload: dict | None):
+        ttl = constants.MEMORY_CACHE_TTL if payload is not None else min(constants.MEMORY_CACHE_TTL, constants.NEGATIVE_CACHE_TTL)
+        self.memory_cache.set(isbn, payload, ttl=ttl)
+
+    def forget(self, isbn: str):
+        self.memory_cache.pop(isbn)
+
+
+def _aware(value: datetime.datetime) -> datetime.datetime:
+    # SQLite hands back naive datetimes even for timezone aware columns
+    return value if value.tzinfo else value.replace(tzinfo=datetime.timezone.utc)
+
+
+_http_client: httpx.AsyncClient | None = None
+_metadata_service: MetadataService | None = None
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Return the pooled HTTP client shared by the upstream calls of this worker.
+    """
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(constants.HTTP_READ_TIMEOUT, connect=constants.HTTP_CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_connections=constants.HTTP_MAX_CONNECTIONS, max_keepalive_connections=constants.HTTP_MAX_CONNECTIONS),
+        )
+    return _http_client
+
+async def close_http_client():
+    global _http_client, _metadata_service
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+        _metadata_service = None
+
+def get_metadata_service() -> MetadataService:
+    """
+    FastAPI dependency, override it with a FakeProvider backed service in tests.
+    """
+    global _metadata_service
+    if _metadata_service is None:
+        _metadata_service = MetadataService(OpenLibraryProvider(get_http_client()))
+    return _metadata_service
@@ -0,0 +1,42 @@
+"""
+Prometheus metrics of the API, exposed by metrics.router.
+"""
+from prometheus_client import Counter, Histogram
+
+# per request database use, queries are counted so N+1 patterns stand out per route
+QUERY_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Latency of HTTP requests by route template",
+    ["method", "route", "status"],
+)
+REQUEST_DB_QUERIES = Histogram(
+    "http_request_db_queries",
+    "SQL statements executed per HTTP request",
+    ["method", "route"],
+    buckets=QUERY_BUCKETS,
+)
+REQUEST_DB_SECONDS = Histogram(
+    "http_request_db_seconds",
+    "Time spent executing SQL statements per HTTP request",
+    ["method", "route"],
+)
+DB_QUERIES = Counter(
+    "db_queries_total",
+    "SQL statements executed, in and out of requests",
+)
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time waited for a free connection of the pool",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30),
+)
+DB_POOL_CHECKOUT_TIMEOUTS = Counter(
+    "db_pool_checkout_timeouts_total",
+    "Checkouts that gave up waiting for a free connection",
+)
+UPSTREAM_LATENCY = Histogram(
+    "upstream_request_duration_seconds",
+    "Latency of calls to external services (Open Library, R2)",
+    ["service", "operation", "outcome"],
+)
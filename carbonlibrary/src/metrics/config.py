@@ -0,0 +1,8 @@
+import os
+
+# set by gunicorn.conf.py, the metrics of all workers are written there and summed by /metrics,
+# prometheus_client reads it from the environment itself when it is imported
+PROMETHEUS_MULTIPROC_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+
+# route label of requests no route matched, keeps scanners from creating a series per path
+UNMATCHED_ROUTE = "unmatched"
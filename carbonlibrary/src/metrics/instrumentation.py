@@ -0,0 +1,87 @@
+import contextvars
+import time
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from . import collectors
+
+
+class RequestStats:
+    """
+    Database use of the request being served, filled by the cursor hooks of instrument_engine.
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        # (statement, seconds) of the request, only collected once the profiler sets it to a list
+        self.statements: list[tuple[str, float]] | None = None
+        self.max_statements = 0
+
+# the stats of the current request, unset outside of one (background tasks after the response, startup)
+request_stats: contextvars.ContextVar[RequestStats | None] = contextvars.ContextVar("request_stats", default=None)
+
+def enter_request() -> tuple[RequestStats, contextvars.Token | None]:
+    """
+    Return the stats of the current request, created by the outermost middleware asking for them,
+    so the middlewares sharing them can be stacked in any order.
+
+    :return: Return the stats and the token to reset request_stats with, None if they already existed.
+    """
+    stats = request_stats.get()
+    if stats is not None:
+        return stats, None
+    stats = RequestStats()
+    return stats, request_stats.set(stats)
+
+def instrument_engine(engine: AsyncEngine):
+    """
+    Count the statements of an engine and time them, per request and in total.
+    """
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        collectors.DB_QUERIES.inc()
+        stats = request_stats.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_seconds += elapsed
+            if stats.statements is not None and len(stats.statements) < stats.max_statements:
+                stats.statements.append((statement, elapsed))
+
+    @event.listens_for(engine.sync_engine, "handle_error")
+    def handle_error(exception_context):
+        # a failed statement never reaches after_cursor_execute
+        if exception_context.connection is not None:
+            starts = exception_context.connection.info.get("query_start")
+            if starts:
+                starts.pop()
+
+def observe_upstream(service: str, operation: str, outcome: str, seconds: float):
+    collectors.UPSTREAM_LATENCY.labels(service, operation, outcome).observe(seconds)
+
+def instrument_boto_client(client, service: str):
+    """
+    Time every API call of a boto3 client through its event hooks, e.g. the R2 client.
+    """
+    def before_call(context, **kwargs):
+        context["metrics_start"] = time.perf_counter()
+
+    def after_call(context, model, **kwargs):
+        start = context.pop("metrics_start", None)
+        if start is not None:
+            observe_upstream(service, model.name, "ok", time.perf_counter() - start)
+
+    def after_call_error(context, model, **kwargs):
+        start = context.pop("metrics_start", None)
+        if start is not None:
+            observe_upstream(service, model.name, "error", time.perf_counter() - start)
+
+    client.meta.events.register("before-call.*", before_call)
+    client.meta.events.register("after-call.*", after_call)
+    client.meta.events.register("after-call-error.*", after_call_error)
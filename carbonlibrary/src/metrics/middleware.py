@@ -0,0 +1,43 @@
+import time
+
+from . import collectors, config
+from .instrumentation import enter_request, request_stats
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording the latency and database use of every HTTP request,
+    labelled with the route template (/api/books/retrieve/{isbn_or_id}) rather than the path.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats, token = enter_request()
+        status = 500
+        start = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            if token is not None:
+                request_stats.reset(token)
+            # the router stores the matched route in the scope
+            route = scope.get("route")
+            route_path = getattr(route, "path", config.UNMATCHED_ROUTE)
+            method = scope["method"]
+            collectors.REQUEST_LATENCY.labels(method, route_path, str(status)).observe(elapsed)
+            collectors.REQUEST_DB_QUERIES.labels(method, route_path).observe(stats.queries)
+            collectors.REQUEST_DB_SECONDS.labels(method, route_path).observe(stats.db_seconds)
@@ -0,0 +1,21 @@
+from fastapi import APIRouter, Response
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry,
+                               generate_latest, multiprocess)
+
+from . import config
+
+router = APIRouter(
+    tags = ["metrics"],
+)
+
+@router.get("/metrics", include_in_schema=False)
+def read_metrics():
+    """
+    Prometheus exposition of the metrics, summed over all gunicorn workers in multiprocess mode.
+    Not authenticated, keep it off the public nginx server block.
+    """
+    registry = REGISTRY
+    if config.PROMETHEUS_MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return Response(content=generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
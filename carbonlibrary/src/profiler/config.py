@@ -0,0 +1,15 @@
+import os
+
+# the middleware is only installed when enabled, see main.py
+PROFILER_ENABLED = os.environ.get("PROFILER_ENABLED", "").lower() in ("1", "true", "yes", "on")
+# fraction of requests sampled from their start
+PROFILER_SAMPLE_RATE = float(os.environ.get("PROFILER_SAMPLE_RATE", 0.01))
+# requests still running after this many seconds are sampled from then on
+PROFILER_SLOW_SECONDS = float(os.environ.get("PROFILER_SLOW_SECONDS", 1.0))
+# seconds between two stack samples
+PROFILER_INTERVAL = float(os.environ.get("PROFILER_INTERVAL", 0.005))
+# ring buffer of captured profiles, the oldest are deleted past PROFILER_MAX_PROFILES
+PROFILER_DIR = os.environ.get("PROFILER_DIR", "/tmp/librarius-profiles")
+PROFILER_MAX_PROFILES = int(os.environ.get("PROFILER_MAX_PROFILES", 50))
+# SQL statements kept per request
+PROFILER_MAX_STATEMENTS = int(os.environ.get("PROFILER_MAX_STATEMENTS", 200))
@@ -0,0 +1,84 @@
+import random
+import threading
+import time
+
+from fastapi.concurrency import run_in_threadpool
+
+from ..metrics.instrumentation import enter_request, request_stats
+from . import config
+from .sampler import StackSampler, watchdog
+from .store import ProfileStore, get_profile_store
+
+
+class ProfilerMiddleware:
+    """
+    ASGI middleware capturing a profile of sampled and slow requests.
+
+    A request is sampled from its start with probability `sample_rate`, any other request still running
+    after `slow_seconds` is sampled from then on. The capture holds the folded stacks of the event loop
+    thread (see StackSampler), the SQL statements of the request and its timing. It is written to the
+    ProfileStore, listed and downloaded through /api/admin/profiles.
+    """
+
+    def __init__(self, app, store: ProfileStore | None = None, sample_rate: float | None = None, slow_seconds: float | None = None):
+        self.app = app
+        self.store = store or get_profile_store()
+        self.sample_rate = config.PROFILER_SAMPLE_RATE if sample_rate is None else sample_rate
+        self.slow_seconds = config.PROFILER_SLOW_SECONDS if slow_seconds is None else slow_seconds
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        #the SQL statements are collected by the cursor hooks of metrics.instrumentation, only once the
+        #sampler runs: most requests are never captured and must not pay for keeping their statements
+        stats, token = enter_request()
+        stats.max_statements = config.PROFILER_MAX_STATEMENTS
+        def collect_statements():
+            stats.statements = []
+
+        sampler = StackSampler(threading.get_ident(), config.PROFILER_INTERVAL, on_start=collect_statements)
+        #picked by sample_rate but another request holds the sampler: treat it like any other request
+        sampled = random.random() < self.sample_rate and sampler.start()
+        if not sampled:
+            watchdog.watch(sampler, time.monotonic() + self.slow_seconds)
+
+        status = 500
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started_at = time.time()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            watchdog.unwatch(sampler)
+            sampler.stop()
+            if token is not None:
+                request_stats.reset(token)
+
+        if not sampled and elapsed < self.slow_seconds:
+            return
+        #a sampled request faster than one interval has nothing to show, keep the ring for captures that do
+        if sampled and not sampler.samples:
+            return
+        capture = {
+            "reason": "sampled" if sampled else "slow",
+            "method": scope["method"],
+            "path": scope["path"],
+            "route": getattr(scope.get("route"), "path", None),
+            "status": status,
+            "started_at": started_at,
+            "duration_seconds": elapsed,
+            "samples": sampler.samples,
+            "interval_seconds": config.PROFILER_INTERVAL,
+            "folded_stacks": sampler.folded(),
+            "sql": [{"statement": statement, "seconds": seconds} for statement, seconds in stats.statements or []],
+        }
+        # the response is already sent, the write only delays this task
+        await run_in_threadpool(self.store.save, capture)
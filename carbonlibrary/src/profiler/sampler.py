@@ -0,0 +1,116 @@
+import sys
+import threading
+import time
+from collections import Counter
+
+
+class StackSampler:
+    """
+    Sample the stack of one thread from a background thread, at most one per worker at a time.
+
+    The sampled thread is never interrupted, the cost is one short GIL hold per interval, which keeps it
+    usable in production where a deterministic profiler (cProfile) would slow the whole event loop down.
+    Stacks are counted in the folded format of flamegraph.pl and speedscope ("outer;inner count").
+    """
+
+    _active = threading.Lock()
+
+    def __init__(self, thread_id: int, interval: float, on_start=None):
+        """
+        :param on_start: Called once the sampler has started, from the thread that started it.
+        """
+        self.thread_id = thread_id
+        self.interval = interval
+        self.on_start = on_start
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        # start may be called by the watchdog thread while the request finishes
+        self._state = threading.Lock()
+        self._closed = False
+
+    def start(self) -> bool:
+        """
+        :return: Return False if it was stopped already or another sampler is running in this process,
+            nothing is started then.
+        """
+        with self._state:
+            if self._closed or self._thread is not None:
+                return False
+            if not StackSampler._active.acquire(blocking=False):
+                return False
+            self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+            self._thread.start()
+        if self.on_start is not None:
+            self.on_start()
+        return True
+
+    def stop(self):
+        with self._state:
+            self._closed = True
+            if self._thread is None:
+                return
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+            StackSampler._active.release()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                return
+            self.stacks[self._fold(frame)] += 1
+            self.samples += 1
+
+    @staticmethod
+    def _fold(frame) -> str:
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{code.co_name} ({code.co_filename}:{frame.f_lineno})")
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+    def folded(self) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+
+class SlowRequestWatchdog:
+    """
+    One thread per worker starting the sampler of requests that outlive their deadline.
+    Unlike a loop.call_later timer it fires while the event loop is blocked, the case worth profiling most.
+    """
+
+    def __init__(self, check_interval: float = 0.05):
+        self.check_interval = check_interval
+        self._deadlines: dict[int, tuple[float, StackSampler]] = {}
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+
+    def watch(self, sampler: StackSampler, deadline: float):
+        """
+        :param deadline: time.monotonic() value after which the sampler is started.
+        """
+        with self._lock:
+            self._deadlines[id(sampler)] = (deadline, sampler)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="slow-request-watchdog", daemon=True)
+                self._thread.start()
+
+    def unwatch(self, sampler: StackSampler):
+        with self._lock:
+            self._deadlines.pop(id(sampler), None)
+
+    def _run(self):
+        while True:
+            time.sleep(self.check_interval)
+            now = time.monotonic()
+            with self._lock:
+                due = [key for key, (deadline, _) in self._deadlines.items() if deadline <= now]
+                samplers = [self._deadlines.pop(key)[1] for key in due]
+            for sampler in samplers:
+                sampler.start()
+
+watchdog = SlowRequestWatchdog()
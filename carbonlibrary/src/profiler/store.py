@@ -0,0 +1,89 @@
+import functools
+import json
+import os
+import re
+import tempfile
+import time
+import uuid
+
+from . import config
+
+PROFILE_NAME_PATTERN = re.compile(r"^[0-9]+-[0-9]+-[0-9a-f]{8}\.json$")
+
+
+class ProfileStore:
+    """
+    Bounded on-disk ring buffer of captured profiles, one JSON file each, shared by the workers of a host.
+    """
+
+    def __init__(self, directory: str, max_profiles: int):
+        """
+        :raises ValueError: If max_profiles is below 1, the capture just written would be pruned.
+        """
+        if max_profiles < 1:
+            raise ValueError("PROFILER_MAX_PROFILES must be at least 1")
+        self.directory = directory
+        self.max_profiles = max_profiles
+
+    def save(self, capture: dict) -> str:
+        """
+        Write a capture, then delete the oldest ones past max_profiles. Blocking, run it in a thread.
+
+        :return: Return the name of the stored profile.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        # time first, names sort oldest first
+        name = f"{time.time_ns()}-{os.getpid()}-{uuid.uuid4().hex[:8]}.json"
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as tmp_file:
+                json.dump(capture, tmp_file)
+            os.replace(tmp_path, os.path.join(self.directory, name))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+        for old_name in self.names()[:-self.max_profiles]:
+            try:
+                os.unlink(os.path.join(self.directory, old_name))
+            except FileNotFoundError:
+                # another worker pruned it first
+                pass
+        return name
+
+    def names(self) -> list[str]:
+        try:
+            return sorted(name for name in os.listdir(self.directory) if PROFILE_NAME_PATTERN.match(name))
+        except FileNotFoundError:
+            return []
+
+    def summaries(self) -> list[dict]:
+        """
+        :return: Return the captures without their stacks and statements, oldest first.
+        """
+        summaries = []
+        for name in self.names():
+            capture = self.load(name)
+            if capture is None:
+                continue
+            sql = capture.pop("sql", [])
+            capture.pop("folded_stacks", None)
+            summaries.append({"name": name, **capture, "sql_statements": len(sql)})
+        return summaries
+
+    def load(self, name: str) -> dict | None:
+        """
+        :return: Return the capture, None if the name is invalid or it was already pruned.
+        """
+        if not PROFILE_NAME_PATTERN.match(name):
+            return None
+        try:
+            with open(os.path.join(self.directory, name)) as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return None
+
+
+@functools.lru_cache
+def get_profile_store() -> ProfileStore:
+    return ProfileStore(config.PROFILER_DIR, config.PROFILER_MAX_PROFILES)
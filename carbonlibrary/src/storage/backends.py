@@ -0,0 +1,193 @@
+import functools
+import mmap
+import os
+import shutil
+import tempfile
+from abc import ABC, abstractmethod
+from collections.abc import Iterator
+from typing import BinaryIO
+
+from botocore.exceptions import ClientError
+
+from . import config
+
+
+class StorageBackend(ABC):
+    """
+    Minimal blob store interface, keys are "/" separated relative paths.
+    """
+
+    @abstractmethod
+    def put(self, key: str, data: bytes, content_type: str | None = None) -> None:
+        ...
+
+    @abstractmethod
+    def get(self, key: str) -> bytes | None:
+        ...
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        ...
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        ...
+
+    @abstractmethod
+    def put_file(self, key: str, file: BinaryIO, content_type: str | None = None) -> None:
+        """
+        Store an object read from a file object, without holding it in memory.
+        """
+
+    @abstractmethod
+    def size(self, key: str) -> int | None:
+        """
+        :return: Return the size of an object in bytes, None if it does not exist.
+        """
+
+    @abstractmethod
+    def iter_range(self, key: str, start: int, end: int, chunk_size: int) -> Iterator[bytes]:
+        """
+        Yield the bytes start..end (inclusive) of an object in chunks of at most chunk_size bytes.
+        """
+
+
+class LocalStorage(StorageBackend):
+    """
+    Store objects as files under a root directory.
+    """
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+
+    def _path(self, key: str) -> str:
+        path = os.path.abspath(os.path.join(self.root, key))
+        if not path.startswith(self.root + os.sep):
+            raise ValueError(f"Invalid storage key: {key}")
+        return path
+
+    def put(self, key: str, data: bytes, content_type: str | None = None) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # write to a temporary file first so readers never observe a partial object
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, "wb") as tmp_file:
+                tmp_file.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def get(self, key: str) -> bytes | None:
+        try:
+            with open(self._path(key), "rb") as file:
+                return file.read()
+        except FileNotFoundError:
+            return None
+
+    def exists(self, key: str) -> bool:
+        return os.path.isfile(self._path(key))
+
+    def delete(self, key: str) -> None:
+        try:
+            os.unlink(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def put_file(self, key: str, file: BinaryIO, content_type: str | None = None) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, "wb") as tmp_file:
+                shutil.copyfileobj(file, tmp_file)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def size(self, key: str) -> int | None:
+        try:
+            return os.path.getsize(self._path(key))
+        except FileNotFoundError:
+            return None
+
+    def iter_range(self, key: str, start: int, end: int, chunk_size: int) -> Iterator[bytes]:
+        with open(self._path(key), "rb") as file:
+            if end < start:
+                return
+            # the page cache backs the mapping, only the chunk being sent is copied out
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                for offset in range(start, end + 1, chunk_size):
+                    yield mapped[offset:min(offset + chunk_size, end + 1)]
+
+
+class R2Storage(StorageBackend):
+    """
+    Store objects in a Cloudflare R2 bucket through the shared boto3 client.
+    """
+
+    def __init__(self, client, bucket: str):
+        self.client = client
+        self.bucket = bucket
+
+    def put(self, key: str, data: bytes, content_type: str | None = None) -> None:
+        extra = {"ContentType": content_type} if content_type else {}
+        self.client.put_object(Bucket=self.bucket, Key=key, Body=data, **extra)
+
+    def get(self, key: str) -> bytes | None:
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=key)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+                return None
+            raise
+        return response["Body"].read()
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+                return False
+            raise
+        return True
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+
+    def put_file(self, key: str, file: BinaryIO, content_type: str | None = None) -> None:
+        # multipart upload in parts, the file is never read whole
+        extra = {"ContentType": content_type} if content_type else {}
+        self.client.upload_fileobj(file, self.bucket, key, ExtraArgs=extra or None)
+
+    def size(self, key: str) -> int | None:
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=key)["ContentLength"]
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+                return None
+            raise
+
+    def iter_range(self, key: str, start: int, end: int, chunk_size: int) -> Iterator[bytes]:
+        if end < start:
+            return
+        response = self.client.get_object(Bucket=self.bucket, Key=key, Range=f"bytes={start}-{end}")
+        try:
+            yield from response["Body"].iter_chunks(chunk_size)
+        finally:
+            response["Body"].close()
+
+
+@functools.lru_cache
+def get_storage() -> StorageBackend:
+    """
+    Return the process wide storage backend selected by STORAGE_BACKEND.
+    """
+    if config.STORAGE_BACKEND == "local":
+        return LocalStorage(config.LOCAL_STORAGE_ROOT)
+    if config.STORAGE_BACKEND == "r2":
+        from ..aws.config import s3_client
+        return R2Storage(s3_client, config.CLOUDFLARE_R2_BUCKET)
+    raise ValueError(f"Unknown STORAGE_BACKEND: {config.STORAGE_BACKEND}")
@@ -0,0 +1,6 @@
+import os
+
+# "r2" stores objects in the Cloudflare R2 bucket, "local" on the filesystem (dev and tests)
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "r2")
+LOCAL_STORAGE_ROOT = os.environ.get("LOCAL_STORAGE_ROOT", "storage")
+CLOUDFLARE_R2_BUCKET = os.environ.get("CLOUDFLARE_R2_BUCKET")
@@ -1,27 +1,70 @@
+import asyncio
+import contextlib
+import csv
 import datetime
+import io
+import json
 import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 import httpx
 import pytest
+from PIL import Image
+from passlib.context import CryptContext
 from fastapi import FastAPI
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, select, update
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.pool import NullPool
 
+from ..auth import dependencies as auth_dependencies
+from ..auth import service as auth_service
 from ..auth.dependencies import authorize_current_user, confirm_user_authorization
-from ..book import crud as book_crud, models as book_models
-from ..database import get_db
+from ..book import constants as book_constants
+from ..book import covers
+from ..book import crud as crud_books
+from ..book import schemas as book_schemas
+from ..book import models as book_models
+from ..cache.backends import MemorySharedCache, RedisSharedCache
+from ..cache.service import ReadThroughCache, get_read_cache
+from ..database import async_database_url, get_db, get_sessionmaker
+from ..loan import models as loan_models
 from ..main import Base, app
-from ..user import models as user_models, crud as user_crud
+from ..metadata.exceptions import MetadataUnavailable
+from ..metadata.providers import FakeProvider, OpenLibraryProvider
+from ..metadata.service import MetadataService, get_metadata_service
+from ..metrics.instrumentation import instrument_engine
+from ..profiler.middleware import ProfilerMiddleware
+from ..profiler.sampler import StackSampler
+from ..profiler.store import ProfileStore, get_profile_store
+from ..storage.backends import LocalStorage, get_storage
+from ..user import models as user_models
+from ..utils import encode_cursor
 
 TESTING_DATA_ISBN = "9780316414241"
 
 POSTGRES_TEST_DATABASE_URL = os.environ.get("PG_TEST_DATABASE_URL")
 
+# asyncpg binds parameters by the column type, mismatches SQLite accepts only show up there
+requires_postgres = pytest.mark.skipif(not POSTGRES_TEST_DATABASE_URL.startswith("postgresql"), reason="needs a Postgres PG_TEST_DATABASE_URL")
+
 engine = create_engine(POSTGRES_TEST_DATABASE_URL, echo=True) 
 
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# the app runs on asyncio sessions, TestClient drives every request from its own event loop,
+# so connections must not be pooled across requests
+# SQLite stand-ins run one writer at a time, give the concurrency tests room to queue
+connect_args = {"timeout": 30} if POSTGRES_TEST_DATABASE_URL.startswith("sqlite") else {}
+async_engine = create_async_engine(async_database_url(POSTGRES_TEST_DATABASE_URL), poolclass=NullPool, connect_args=connect_args)
+# the app's engine is instrumented by database.py, the test engine replaces it
+instrument_engine(async_engine)
+
+TestingAsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
 @pytest.fixture(name="session")
 def session_fixture():
     engine = create_engine(POSTGRES_TEST_DATABASE_URL, echo=True)
@@ -35,8 +78,9 @@ def session_fixture():
 
 @pytest.fixture(name="client")
 def client_fixture(session: Session):
-    def override_get_db():
-        return session
+    async def override_get_db():
+        async with TestingAsyncSessionLocal() as db:
+            yield db
 
     app.dependency_overrides[get_db] = override_get_db
 
@@ -45,6 +89,9 @@ def client_fixture(session: Session):
     # Had the dependency returns some value, we'd have to replace the dependency func with a func that return a value that could bypasses the dependency 
     app.dependency_overrides[authorize_current_user] = lambda: None
     app.dependency_overrides[confirm_user_authorization] = lambda: None
+    #fresh read cache per test, tests also write rows behind the app's back
+    read_cache = ReadThroughCache(MemorySharedCache(maxsize=1024))
+    app.dependency_overrides[get_read_cache] = lambda: read_cache
 
     client = TestClient(app) 
 
@@ -52,6 +99,29 @@ def client_fixture(session: Session):
 
     app.dependency_overrides.clear() 
 
+# the app writes through its own sessions, so reload rows instead of trusting the test session's identity map
+def get_book_by_isbn(session: Session, isbn: str):
+    query = select(book_models.Book).where(book_models.Book.isbn == isbn).execution_options(populate_existing=True)
+    return session.execute(query).scalars().first()
+
+def get_user_by_email(session: Session, email: str):
+    query = select(user_models.User).where(user_models.User.email == email).execution_options(populate_existing=True)
+    return session.execute(query).scalars().first()
+
+@contextlib.contextmanager
+def count_statements():
+    """
+    Collect the SQL statements the app sends while the block runs.
+    """
+    statements = []
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    event.listen(async_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+
 def test_create_user(session: Session, client: TestClient):
     response = client.post('/api/users/create/', 
         json = {
@@ -60,7 +130,7 @@ def test_create_user(session: Session, client: TestClient):
             "name": "string",
             "age": 0
         })
-    db_user = user_crud.get_user_by_email(db=session, email="string")
+    db_user = get_user_by_email(session, "string")
 
     assert response.status_code == 200
     assert db_user.email == "string"
@@ -71,7 +141,7 @@ def test_retrieve_user(session: Session, client: TestClient):
     session.add(User)
     session.commit()
 
-    db_user = user_crud.get_user_by_email(db=session, email=User.email)
+    db_user = get_user_by_email(session, User.email)
 
     response = client.get(f'/api/users/retrieve/{User.email}')
     response_email = response.json().get('email')
@@ -79,6 +149,35 @@ def test_retrieve_user(session: Session, client: TestClient):
     assert response.status_code == 200
     assert response_email == db_user.email
 
+def test_user_statement_counts(session: Session, client: TestClient):
+    User = user_models.User(email="string", name="string", hashed_password="string", age=0)
+    session.add(User)
+    session.commit()
+    session.add_all(book_models.Book(title=f"Book{index}", author="Author", isbn=f"isbn{index}", user_id=User.id, is_borrowed=True) for index in range(3))
+    session.commit()
+
+    with count_statements() as statements:
+        response = client.get('/api/users/retrieve/string')
+    assert response.json()["borrowed_books"] is None
+    assert len(statements) == 1
+
+    # one selectin query for all borrowed books, restricted to the listed columns
+    with count_statements() as statements:
+        response = client.get('/api/users/retrieve/string', params={"include": "borrowed_books"})
+    assert len(response.json()["borrowed_books"]) == 3
+    assert len(statements) == 2
+    assert "description" not in statements[1]
+
+    with count_statements() as statements:
+        response = client.patch('/api/users/update/string', json={"age": 11})
+    assert response.json()["age"] == 11
+    assert len(statements) == 2
+
+    with count_statements() as statements:
+        response = client.post('/api/users/create/', json={"password": "string", "email": "other", "name": "string", "age": 0})
+    assert response.json()["registered_date"] is not None
+    assert len(statements) == 2
+
 def test_update_user(session: Session, client: TestClient):
     User = user_models.User(id= 0, email="string", name="string", hashed_password="string", age=0)
 
@@ -90,7 +189,7 @@ def test_update_user(session: Session, client: TestClient):
             "age": 11
         })
 
-    db_user = user_crud.get_user_by_email(db=session, email=User.email)
+    db_user = get_user_by_email(session, User.email)
     response_age = response.json().get('age')
 
     assert response.status_code == 200
@@ -106,6 +205,90 @@ def test_delete_user(session: Session, client: TestClient):
 
     assert response.status_code == 200
 
+def test_login_rehashes_outdated_password(session: Session, client: TestClient):
+    outdated_hash = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4).hash("password")
+    session.add(user_models.User(email="string", name="string", hashed_password=outdated_hash, age=0))
+    session.commit()
+
+    response = client.post('/api/token', data={"username": "string", "password": "password"})
+    rehashed = get_user_by_email(session, "string").hashed_password
+
+    assert response.status_code == 200
+    assert rehashed != outdated_hash
+    assert auth_service.hash_context.verify("password", rehashed)
+    assert not auth_service.hash_context.needs_update(rehashed)
+    assert client.post('/api/token', data={"username": "string", "password": "wrong"}).status_code == 400
+
+def test_refresh_token_rotation(session: Session, client: TestClient):
+    session.add(user_models.User(email="string", name="string", hashed_password=auth_service.hash_context.hash("password"), age=0))
+    session.commit()
+
+    login = client.post('/api/token', data={"username": "string", "password": "password"}).json()
+
+    rotated = client.post('/api/token/refresh', json={"refresh_token": login["refresh_token"]})
+    assert rotated.status_code == 200
+    assert auth_dependencies.decode_token(rotated.json()["access_token"]).email == "string"
+
+    # a refresh token is not an access token
+    assert auth_dependencies.get_token_data(rotated.json()["refresh_token"]) is None
+
+    # replaying the consumed token revokes the whole session, including the token it was rotated into
+    assert client.post('/api/token/refresh', json={"refresh_token": login["refresh_token"]}).status_code == 401
+    assert client.post('/api/token/refresh', json={"refresh_token": rotated.json()["refresh_token"]}).status_code == 401
+
+    login = client.post('/api/token', data={"username": "string", "password": "password"}).json()
+    assert client.post('/api/token/revoke', json={"refresh_token": login["refresh_token"]}).status_code == 200
+    assert client.post('/api/token/refresh', json={"refresh_token": login["refresh_token"]}).status_code == 401
+
+def test_token_verified_once(session: Session, client: TestClient, monkeypatch: pytest.MonkeyPatch):
+    session.add(user_models.User(email="string", name="string", hashed_password="string", age=0))
+    session.commit()
+
+    decoded = []
+    def counting_decode(*args, **kwargs):
+        decoded.append(args[0])
+        return jwt_decode(*args, **kwargs)
+    jwt_decode = auth_dependencies.jwt.decode
+    monkeypatch.setattr(auth_dependencies.jwt, "decode", counting_decode)
+
+    # exercise the real checks
+    del app.dependency_overrides[authorize_current_user]
+    del app.dependency_overrides[confirm_user_authorization]
+    auth_dependencies.token_cache.clear()
+    token = auth_service.create_access_token(payload={"email": "string", "scope": "user"}, expires_delta=datetime.timedelta(minutes=5))
+
+    for _ in range(2):
+        response = client.get('/api/users/retrieve/string', headers={"Authorization": f"Bearer {token}"})
+        assert response.status_code == 200
+
+    # both checks share one decode per request, the second request is served from the cache
+    assert decoded == [token]
+    assert client.get('/api/users/retrieve/string', headers={"Authorization": f"Bearer {token}x"}).status_code == 401
+
+def test_token_cache_concurrent_access(session: Session):
+    # get_token_data is a sync dependency, concurrent requests use the token cache from several threads;
+    # every entry here is expired, so the threads race to drop the same key
+    token_cache = auth_dependencies.token_cache
+    errors = []
+    def hammer(_):
+        for index in range(50000):
+            try:
+                token_cache.set("token", index, ttl=-1)
+                token_cache.get("token")
+            except KeyError as e:
+                errors.append(e)
+
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(hammer, range(8)))
+    finally:
+        sys.setswitchinterval(switch_interval)
+        token_cache.clear()
+
+    assert errors == []
+
 def test_create_book(session: Session, client: TestClient):
     response = client.post('/api/books/create/', 
         json={
@@ -125,19 +308,138 @@ def test_create_book(session: Session, client: TestClient):
             "isbn": TESTING_DATA_ISBN
         })
 
-    db_book = book_crud.get_book_by_isbn(db = session, isbn = TESTING_DATA_ISBN)
+    db_book = get_book_by_isbn(session, TESTING_DATA_ISBN)
 
     assert response.status_code == 200
     assert db_book.isbn == TESTING_DATA_ISBN
+    assert db_book.number_of_pages == 0
+
+@requires_postgres
+def test_page_count_writes_on_postgres(session: Session, client: TestClient):
+    provider = FakeProvider({TESTING_DATA_ISBN: {"title": "Book", "author": "Author", "isbn": TESTING_DATA_ISBN, "number_of_pages": 320}})
+    app.dependency_overrides[get_metadata_service] = lambda: MetadataService(provider)
+
+    assert client.post(f'/api/books/create/{TESTING_DATA_ISBN}').status_code == 200
+    assert client.post('/api/books/create/', json={"title": "Book", "author": "Author", "isbn": "isbn1", "number_of_pages": 100}).status_code == 200
+    response = client.post('/api/books/upsert', json=[{"title": "Book", "author": "Author", "isbn": "isbn1", "number_of_pages": 120}])
+
+    assert response.status_code == 200
+    assert get_book_by_isbn(session, TESTING_DATA_ISBN).number_of_pages == 320
+    assert get_book_by_isbn(session, "isbn1").number_of_pages == 120
 
 def test_create_book_by_isbn(session: Session, client: TestClient):
+    provider = FakeProvider({TESTING_DATA_ISBN: {"title": "Book", "author": "Author", "isbn": TESTING_DATA_ISBN}})
+    app.dependency_overrides[get_metadata_service] = lambda: MetadataService(provider)
+
     # this is a way to pass in path parameter to request in httpx
-    response = client.post(f'/api/books/create/{TESTING_DATA_ISBN}')
+    response = client.post('/api/books/create/978-0-316-41424-1')
 
-    db_book = book_crud.get_book_by_isbn(db = session, isbn = TESTING_DATA_ISBN)
+    db_book = get_book_by_isbn(session, TESTING_DATA_ISBN)
 
     assert response.status_code == 200
     assert db_book.isbn == TESTING_DATA_ISBN
+    assert provider.calls == [TESTING_DATA_ISBN]
+
+    #malformed ISBNs are refused before any lookup
+    assert client.post('/api/books/create/97803164142410000').status_code == 400
+    assert client.post('/api/books/create/not-an-isbn').status_code == 400
+    assert provider.calls == [TESTING_DATA_ISBN]
+
+    #an ISBN already in the catalogue is refused, the check or the unique constraint answers
+    duplicate = client.post(f'/api/books/create/{TESTING_DATA_ISBN}')
+    assert (duplicate.status_code, duplicate.json()["detail"]) == (400, "Book already exist")
+    async def create_after_check():
+        async with TestingAsyncSessionLocal() as db:
+            return await crud_books.create_book(book=book_schemas.BookCreate(title="Book", author="Author", isbn=TESTING_DATA_ISBN), db=db)
+    assert asyncio.run(create_after_check()) is None
+    duplicate = client.post('/api/books/create/', json={"title": "Book", "author": "Author", "isbn": TESTING_DATA_ISBN})
+    assert (duplicate.status_code, duplicate.json()["detail"]) == (400, "Book already exist")
+
+def test_upsert_books(session: Session, client: TestClient):
+    session.add(book_models.Book(title="Old Title", author="Author", isbn="isbn1", publisher="Publisher"))
+    session.commit()
+
+    response = client.post('/api/books/upsert', json=[
+        {"title": "Book2", "author": "Author", "isbn": "isbn2"},
+        {"title": "New Title", "author": "Author", "isbn": "isbn1"},
+        {"title": "Book2 Revised", "author": "Author", "isbn": "isbn2", "language": "eng"},
+    ])
+    result = response.json()
+
+    assert response.status_code == 200
+    assert [(item["isbn"], item["status"]) for item in result["items"]] == [("isbn2", "duplicate"), ("isbn1", "updated"), ("isbn2", "created")]
+    assert (result["created"], result["updated"]) == (1, 1)
+    # unset fields keep their stored value
+    assert get_book_by_isbn(session, "isbn1").title == "New Title"
+    assert get_book_by_isbn(session, "isbn1").publisher == "Publisher"
+    assert get_book_by_isbn(session, "isbn2").id == result["items"][2]["id"]
+    assert get_book_by_isbn(session, "isbn2").language == "eng"
+
+def test_bulk_import_books(session: Session, client: TestClient):
+    session.add(book_models.Book(title="Owned", author="Author", isbn="9780000000002"))
+    session.commit()
+
+    provider = FakeProvider({
+        TESTING_DATA_ISBN: {"title": "Book", "author": "Author", "isbn": TESTING_DATA_ISBN},
+        "0316414247": {"title": "Other Book", "author": "Author", "isbn": "0316414247"},
+    })
+    app.dependency_overrides[get_metadata_service] = lambda: MetadataService(provider)
+    app.dependency_overrides[get_sessionmaker] = lambda: TestingAsyncSessionLocal
+
+    response = client.post('/api/books/import',
+        json={"isbns": ["978-0-316-41424-1", TESTING_DATA_ISBN, "9780000000002", "9780000000001", "not an isbn"]})
+
+    assert response.status_code == 202
+    assert response.json()["total"] == 4
+
+    # TestClient runs the background task before returning
+    job = client.get(f'/api/books/import/{response.json()["id"]}').json()
+    outcomes = {item["isbn"]: item["status"] for item in job["items"]}
+
+    assert job["status"] == "completed"
+    assert (job["created"], job["existing"], job["not_found"], job["failed"]) == (1, 1, 1, 1)
+    assert outcomes == {TESTING_DATA_ISBN: "created", "9780000000002": "exists", "9780000000001": "not_found", "NOTANISBN": "invalid"}
+    assert get_book_by_isbn(session, TESTING_DATA_ISBN).title == "Book"
+    # the existing book was matched in the database, never looked up
+    assert sorted(provider.calls) == ["9780000000001", TESTING_DATA_ISBN]
+
+    response = client.post('/api/books/import/csv', files={"csv_file": ("books.csv", b"title,isbn\nOther Book,0316414247\nBook,9780316414241\n", "text/csv")})
+    job = client.get(f'/api/books/import/{response.json()["id"]}').json()
+
+    assert response.status_code == 202
+    assert (job["created"], job["existing"]) == (1, 1)
+
+def test_metadata_service_cache(session: Session):
+    provider = FakeProvider({TESTING_DATA_ISBN: {"title": "Book", "author": "Author", "isbn": TESTING_DATA_ISBN}}, delay=0.05)
+    metadata = MetadataService(provider)
+
+    async def lookups():
+        async def lookup(isbn):
+            async with TestingAsyncSessionLocal() as db:
+                return await metadata.get(db=db, isbn=isbn)
+
+        concurrent = await asyncio.gather(*(lookup(TESTING_DATA_ISBN) for _ in range(5)))
+        unknown = await lookup("0000000000")
+        # a fresh worker only has the isbn_metadata table to go on
+        metadata.memory_cache.clear()
+        cached = await lookup(TESTING_DATA_ISBN)
+        cached_unknown = await lookup("0000000000")
+        return concurrent, unknown, cached, cached_unknown
+
+    concurrent, unknown, cached, cached_unknown = asyncio.run(lookups())
+
+    assert all(payload["isbn"] == TESTING_DATA_ISBN for payload in concurrent)
+    assert cached == concurrent[0]
+    assert unknown is None and cached_unknown is None
+    assert provider.calls == [TESTING_DATA_ISBN, "0000000000"]
+
+    #an upstream body that is not JSON is an unavailable provider, not a crash
+    async def lookup_garbled():
+        transport = httpx.MockTransport(lambda request: httpx.Response(200, text="<html>maintenance</html>"))
+        async with httpx.AsyncClient(transport=transport) as http_client:
+            return await OpenLibraryProvider(http_client).fetch(TESTING_DATA_ISBN)
+    with pytest.raises(MetadataUnavailable):
+        asyncio.run(lookup_garbled())
 
 def test_retrieve_books(session: Session, client: TestClient):
     Book_1 = book_models.Book(title="Book1", author="Author1", isbn="isbn1")
@@ -149,9 +451,9 @@ def test_retrieve_books(session: Session, client: TestClient):
     session.add(Book_3)
     session.commit()
 
-    db_book_1 = book_crud.get_book_by_isbn(db=session, isbn="isbn1")
-    db_book_2 = book_crud.get_book_by_isbn(db=session, isbn="isbn2")
-    db_book_3 = book_crud.get_book_by_isbn(db=session, isbn="isbn3")
+    db_book_1 = get_book_by_isbn(session, "isbn1")
+    db_book_2 = get_book_by_isbn(session, "isbn2")
+    db_book_3 = get_book_by_isbn(session, "isbn3")
 
     response = client.get('/api/books/retrieve/books')
 
@@ -160,6 +462,74 @@ def test_retrieve_books(session: Session, client: TestClient):
     assert db_book_2.isbn == "isbn2"
     assert db_book_3.isbn == "isbn3"
 
+def test_retrieve_books_by_cursor(session: Session, client: TestClient):
+    for index in range(5):
+        session.add(book_models.Book(title=f"Book{4 - index}", author="Author", isbn=f"isbn{index}"))
+    session.commit()
+
+    first_page = client.get('/api/books/retrieve/books', params={"after": "", "limit": 2, "sort": "title"})
+    assert first_page.status_code == 200
+    assert [book["title"] for book in first_page.json()["items"]] == ["Book0", "Book1"]
+
+    titles = []
+    cursor = ""
+    while cursor is not None:
+        response = client.get('/api/books/retrieve/books', params={"after": cursor, "limit": 2, "sort": "title"})
+        assert response.status_code == 200
+        titles += [book["title"] for book in response.json()["items"]]
+        cursor = response.json()["next_cursor"]
+
+    assert titles == ["Book0", "Book1", "Book2", "Book3", "Book4"]
+
+    mismatched_sort = client.get('/api/books/retrieve/books', params={"after": first_page.json()["next_cursor"], "sort": "id"})
+    assert mismatched_sort.status_code == 400
+
+    #tampered cursors with wrongly typed keys
+    for sort, key in [("added_date", [1, 5]), ("added_date", ["not a date", 5]), ("title", ["Book1", "5"]), ("id", [2, True]), ("id", ["2", 2])]:
+        tampered = client.get('/api/books/retrieve/books', params={"after": encode_cursor({"sort": sort, "key": key}), "sort": sort})
+        assert tampered.status_code == 400
+        tampered = client.get('/api/books/retrieve/books/summary', params={"after": encode_cursor({"sort": sort, "key": key}), "sort": sort})
+        assert tampered.status_code == 400
+
+def test_retrieve_book_summaries(session: Session, client: TestClient):
+    Book_1 = book_models.Book(title="Book1", author="Author1", isbn="isbn1", description="description", cover_hash="ab" * 32)
+    Book_2 = book_models.Book(title="Book2", author="Author2", isbn="isbn2")
+
+    session.add(Book_1)
+    session.add(Book_2)
+    session.commit()
+
+    response = client.get('/api/books/retrieve/books/summary')
+    summaries = response.json()
+
+    assert response.status_code == 200
+    assert [summary["isbn"] for summary in summaries] == ["isbn1", "isbn2"]
+    assert "cover_hash" not in summaries[0] and "description" not in summaries[0]
+    assert summaries[0]["cover_url"] == f"/api/books/covers/{'ab' * 32}?size=card"
+    assert summaries[1]["cover_url"] is None
+
+    cursor_response = client.get('/api/books/retrieve/books/summary', params={"after": "", "limit": 1})
+    assert cursor_response.json()["items"][0]["isbn"] == "isbn1"
+    assert cursor_response.json()["next_cursor"] is not None
+
+def test_search_books(session: Session, client: TestClient):
+    session.add(book_models.Book(title="The Hobbit", author="J. R. R. Tolkien", isbn="isbn1", language="eng", subjects="Fantasy"))
+    session.add(book_models.Book(title="The Silmarillion", author="J. R. R. Tolkien", isbn="isbn2", language="fre", subjects="Fantasy"))
+    session.add(book_models.Book(title="Dune", author="Frank Herbert", isbn="isbn3", language="eng", subjects="Science fiction"))
+    session.commit()
+
+    response = client.get('/api/books/search', params={"q": "Tolkien"})
+    assert response.status_code == 200
+    assert sorted(book["isbn"] for book in response.json()["items"]) == ["isbn1", "isbn2"]
+
+    faceted_response = client.get('/api/books/search', params={"q": "Tolkien", "language": "eng"})
+    assert [book["isbn"] for book in faceted_response.json()["items"]] == ["isbn1"]
+
+    first_page = client.get('/api/books/search', params={"q": "Tolkien", "limit": 1}).json()
+    second_page = client.get('/api/books/search', params={"q": "Tolkien", "limit": 1, "after": first_page["next_cursor"]}).json()
+    assert first_page["items"][0]["isbn"] != second_page["items"][0]["isbn"]
+    assert second_page["next_cursor"] is None
+
 def test_retrieve_book(session: Session, client: TestClient):
     Book = book_models.Book(id = 0, title="Book", author="Author", isbn=TESTING_DATA_ISBN)
 
@@ -173,7 +543,98 @@ def test_retrieve_book(session: Session, client: TestClient):
     assert response_by_isbn.status_code == 200
     assert response_by_id.json() == response_by_isbn.json()
 
+    # ISBNs that are not numbers, and numbers past the id column, are plain ISBN lookups
+    session.add(book_models.Book(title="Book", author="Author", isbn="031641424X"))
+    session.commit()
+    assert client.get('/api/books/retrieve/031641424X').json()["isbn"] == "031641424X"
+    assert client.get('/api/books/retrieve/summary/031641424X').json()["isbn"] == "031641424X"
+    assert client.get('/api/books/retrieve/9780000000000').status_code == 400
+
+
 
+def test_read_cache_across_workers(session: Session, client: TestClient):
+    session.add(book_models.Book(id = 1, title="Book", author="Author", isbn=TESTING_DATA_ISBN))
+    session.commit()
+
+    # two workers, each with its own in-process tier, in front of one shared tier
+    shared = MemorySharedCache(maxsize=1024)
+    workers = [ReadThroughCache(shared), ReadThroughCache(shared)]
+
+    app.dependency_overrides[get_read_cache] = lambda: workers[0]
+    assert client.get('/api/books/retrieve/1').json()["author"] == "Author"
+    assert client.get(f'/api/books/retrieve/{TESTING_DATA_ISBN}').status_code == 200
+    assert client.get('/api/books/retrieve/books?skip=0&limit=10').json()[0]["author"] == "Author"
+    # hot reads never reach the database
+    with count_statements() as statements:
+        assert client.get('/api/books/retrieve/1').json()["author"] == "Author"
+        assert client.get('/api/books/retrieve/books?skip=0&limit=10').status_code == 200
+    assert statements == []
+
+    # the second worker is served from the shared tier
+    app.dependency_overrides[get_read_cache] = lambda: workers[1]
+    with count_statements() as statements:
+        assert client.get('/api/books/retrieve/1').status_code == 200
+    assert statements == []
+    assert client.patch('/api/books/update/1', json={"author": "theBook", "isbn": "031641424X"}).status_code == 200
+
+    # a write through one worker makes every worker's copies stale, old ISBN included
+    app.dependency_overrides[get_read_cache] = lambda: workers[0]
+    assert client.get('/api/books/retrieve/1').json()["author"] == "theBook"
+    assert client.get('/api/books/retrieve/books?skip=0&limit=10').json()[0]["author"] == "theBook"
+    assert client.get(f'/api/books/retrieve/{TESTING_DATA_ISBN}').status_code == 400
+
+def test_read_cache_without_shared_tier(session: Session, client: TestClient):
+    session.add(book_models.Book(id = 1, title="Book", author="Author", isbn=TESTING_DATA_ISBN))
+    session.commit()
+
+    #nothing listens on port 1, every Redis call fails to connect
+    cache = ReadThroughCache(RedisSharedCache("redis://127.0.0.1:1/0"))
+    app.dependency_overrides[get_read_cache] = lambda: cache
+
+    assert client.get('/api/books/retrieve/1').json()["author"] == "Author"
+    assert client.get('/api/books/retrieve/books?skip=0&limit=10').status_code == 200
+    assert client.patch('/api/books/update/1', json={"author": "theBook"}).status_code == 200
+    #nothing was cached while the tier was down, the update shows at once
+    assert client.get('/api/books/retrieve/1').json()["author"] == "theBook"
+
+def test_conditional_requests(session: Session, client: TestClient):
+    session.add(book_models.Book(id = 1, title="Book", author="Author", isbn=TESTING_DATA_ISBN))
+    session.commit()
+
+    response = client.get(f'/api/books/retrieve/{TESTING_DATA_ISBN}')
+    etag = response.headers["etag"]
+    assert response.headers["cache-control"] == "private, no-cache"
+    assert client.get('/api/books/retrieve/1').headers["etag"] == etag
+
+    with count_statements() as statements:
+        response = client.get('/api/books/retrieve/1', headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    # answered from the cache entry, validators included
+    assert statements == []
+    last_modified = response.headers["last-modified"]
+    assert client.get('/api/books/retrieve/1', headers={"If-Modified-Since": last_modified}).status_code == 304
+    assert client.get('/api/books/retrieve/summary/1', headers={"If-None-Match": etag}).status_code == 304
+
+    page = client.get('/api/books/retrieve/books/summary?skip=0&limit=10')
+    assert page.headers["cache-control"].startswith("public")
+    with count_statements() as statements:
+        assert client.get('/api/books/retrieve/books/summary?skip=0&limit=10', headers={"If-None-Match": page.headers["etag"]}).status_code == 304
+    assert statements == []
+
+    # every write moves the validators of the book and of the pages showing it
+    assert client.patch('/api/books/update/1', json={"author": "theBook"}).status_code == 200
+    response = client.get('/api/books/retrieve/1', headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["author"] == "theBook"
+    assert response.headers["etag"] != etag
+    assert client.get('/api/books/retrieve/books/summary?skip=0&limit=10', headers={"If-None-Match": page.headers["etag"]}).status_code == 200
+
+    session.add(user_models.User(email="string", name="string", hashed_password="string", age=0))
+    session.commit()
+    etag = client.get('/api/books/retrieve/1').headers["etag"]
+    assert client.patch('/api/books/borrow/string/1').status_code == 200
+    assert client.get('/api/books/retrieve/1', headers={"If-None-Match": etag}).status_code == 200
 
 def test_update_book(session: Session, client: TestClient):
     Book = book_models.Book(id = 0, title="Book", author="Author", isbn="isbn")
@@ -186,7 +647,7 @@ def test_update_book(session: Session, client: TestClient):
             "author": "theBook"
         })
 
-    db_book = book_crud.get_book_by_isbn(db=session, isbn=Book.isbn)
+    db_book = get_book_by_isbn(session, Book.isbn)
 
     assert response.status_code == 200
     assert db_book.author == "theBook"
@@ -211,14 +672,70 @@ def test_book_borrow(session: Session, client: TestClient):
 
     response = client.patch(f'/api/books/borrow/{User.email}/{Book.id}')
 
-    db_book = book_crud.get_book_by_isbn(db=session, isbn=Book.isbn)
-    db_user = user_crud.get_user_by_email(db=session, email=User.email)
+    db_book = get_book_by_isbn(session, Book.isbn)
+    db_user = get_user_by_email(session, User.email)
 
     assert response.status_code == 200
     assert db_book.user_id == User.id
     assert db_book.is_borrowed == True
     assert db_user.borrowed_books[0] == db_book
 
+def test_concurrent_borrows(session: Session, client: TestClient):
+    borrowers = 200
+    session.add(book_models.Book(id=1, title="Book", author="Author", isbn="isbn"))
+    session.add_all(user_models.User(email=f"name{index}@email.com", name="name", hashed_password="string", age=0) for index in range(borrowers))
+    session.commit()
+
+    async def borrow_all():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as async_client:
+            return await asyncio.gather(*(
+                async_client.patch(f'/api/books/borrow/name{index}@email.com/1') for index in range(borrowers)
+            ))
+
+    responses = asyncio.run(borrow_all())
+    winners = [index for index, response in enumerate(responses) if response.status_code == 200]
+    db_book = get_book_by_isbn(session, "isbn")
+
+    assert len(winners) == 1
+    assert all(response.status_code == 400 for response in responses if response.status_code != 200)
+    assert db_book.is_borrowed
+    assert db_book.user_id == get_user_by_email(session, f"name{winners[0]}@email.com").id
+
+def test_loans_and_holds(session: Session, client: TestClient):
+    session.add(book_models.Book(id=1, title="Book", author="Author", isbn="isbn"))
+    session.add_all(user_models.User(email=email, name="name", hashed_password="string", age=0) for email in ("a", "b", "c"))
+    session.commit()
+
+    assert client.patch('/api/books/borrow/a/1').status_code == 200
+    assert client.post('/api/loans/holds/b/1').json()["position"] == 1
+    assert client.post('/api/loans/holds/c/1').json()["position"] == 2
+    assert client.post('/api/loans/holds/c/1').status_code == 400
+    assert client.patch('/api/books/return/a/1').status_code == 200
+
+    # the returned book waits for the head of the queue
+    response = client.patch('/api/books/borrow/c/1')
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Book is on hold for another user"
+    assert client.patch('/api/books/borrow/b/1').status_code == 200
+    assert [hold["position"] for hold in client.get('/api/loans/holds/1').json()] == [1]
+
+    history = client.get('/api/loans/user/a').json()
+    assert len(history) == 1 and history[0]["returned_at"] is not None
+    assert client.get('/api/loans/user/b', params={"active": True}).json()[0]["returned_at"] is None
+    assert client.get('/api/loans/reports/most-borrowed').json() == [{"book_id": 1, "title": "Book", "loans": 2}]
+
+    assert client.get('/api/loans/overdue').json()["items"] == []
+    session.execute(update(loan_models.Loan).where(loan_models.Loan.returned_at.is_(None)).values(due_at=datetime.datetime(2000, 1, 1)))
+    session.commit()
+    assert [loan["book_id"] for loan in client.get('/api/loans/overdue').json()["items"]] == [1]
+
+    #tampered cursors with wrongly typed keys
+    for key in (["nope", 1], [5, 1], ["2000-01-01T00:00:00", "1"], ["2000-01-01T00:00:00", True]):
+        assert client.get('/api/loans/overdue', params={"after": encode_cursor({"sort": "due_at", "key": key})}).status_code == 400
+    next_page = client.get('/api/loans/overdue', params={"after": encode_cursor({"sort": "due_at", "key": ["2000-01-01T00:00:00", 0]})})
+    assert [loan["book_id"] for loan in next_page.json()["items"]] == [1]
+
 def test_book_return(session: Session, client: TestClient):
     Book = book_models.Book(id = 0, title="Book", author="Author", isbn="isbn")
     User = user_models.User(email = "name@email.com", name = "name", hashed_password = "string", age = 0)
@@ -227,17 +744,197 @@ def test_book_return(session: Session, client: TestClient):
     session.add(User)
     session.commit()
 
-    db_book = book_crud.get_book_by_isbn(db=session, isbn=Book.isbn)
-    db_user = user_crud.get_user_by_email(db=session, email=User.email)
+    db_book = get_book_by_isbn(session, Book.isbn)
+    db_user = get_user_by_email(session, User.email)
 
     borrow_response = client.patch(f'/api/books/borrow/{User.email}/{Book.id}')
+    session.refresh(db_book)
+    session.refresh(db_user)
     assert borrow_response.status_code == 200
     assert db_book.user_id == User.id
     assert db_book.is_borrowed == True
     assert db_user.borrowed_books[0] == db_book
 
     return_response = client.patch(f'api/books/return/{User.email}/{Book.id}')
+    session.refresh(db_book)
     assert return_response.status_code == 200
     assert db_book.user_id == None
     assert db_book.is_borrowed == False
 
+def test_book_cover_upload_and_retrieve(session: Session, client: TestClient, tmp_path, monkeypatch: pytest.MonkeyPatch):
+    app.dependency_overrides[get_storage] = lambda: LocalStorage(str(tmp_path))
+    Book = book_models.Book(title="Book", author="Author", isbn="isbn")
+
+    session.add(Book)
+    session.commit()
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (600, 900), (120, 40, 40)).save(buffer, format="PNG")
+    img_content = buffer.getvalue()
+    upload_response = client.patch(f'/api/books/update/cover/{Book.id}', files={"cover_img": ("cover.jpg", img_content, "image/jpeg")})
+    session.refresh(Book)
+
+    assert upload_response.status_code == 200
+    assert Book.cover_hash is not None
+
+    cover_response = client.get(f'/api/books/retrieve/cover/{Book.id}')
+    assert cover_response.status_code == 200
+    assert cover_response.content == img_content
+    assert cover_response.headers["content-type"] == "image/png"
+    assert cover_response.headers["etag"] == f'"{Book.cover_hash}-original"'
+
+    thumb_response = client.get(f'/api/books/retrieve/cover/{Book.id}', params={"size": "thumb"}, headers={"Accept": "image/webp,*/*"})
+    assert thumb_response.headers["content-type"] == "image/webp"
+    assert Image.open(io.BytesIO(thumb_response.content)).size == (120, 180)
+
+    hash_response = client.get(f'/api/books/covers/{Book.cover_hash}', headers={"If-None-Match": cover_response.headers["etag"]})
+    assert hash_response.status_code == 304
+    assert "immutable" in hash_response.headers["cache-control"]
+    #weak and wildcard tags match, a tag merely containing the ETag does not
+    for if_none_match, status_code in [(f'W/{cover_response.headers["etag"]}', 304), ("*", 304), (f'"{cover_response.headers["etag"]}"', 200)]:
+        assert client.get(f'/api/books/covers/{Book.cover_hash}', headers={"If-None-Match": if_none_match}).status_code == status_code
+
+    invalid_response = client.patch(f'/api/books/update/cover/{Book.id}', files={"cover_img": ("cover.jpg", b"not an image", "image/jpeg")})
+    assert invalid_response.status_code == 400
+
+    #a JPEG signature over undecodable bytes is refused before anything is stored
+    stored = sorted(path for path in tmp_path.rglob("*") if path.is_file())
+    truncated_response = client.patch(f'/api/books/update/cover/{Book.id}', files={"cover_img": ("cover.jpg", b"\xff\xd8\xff" + b"0" * 100, "image/jpeg")})
+    assert truncated_response.status_code == 400
+    assert sorted(path for path in tmp_path.rglob("*") if path.is_file()) == stored
+
+    oversized_response = client.patch(f'/api/books/update/cover/{Book.id}', files={"cover_img": ("cover.jpg", img_content + b"0" * book_constants.COVER_MAX_SIZE, "image/png")})
+    assert oversized_response.status_code == 400
+
+    #decoding a bomb in the rendition process raises DecompressionBombError, not an OSError
+    monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 1000)
+    monkeypatch.setattr(covers, "get_rendition_pool", lambda: None)
+    bomb = io.BytesIO()
+    Image.new("RGB", (100, 100)).save(bomb, format="PNG")
+    bomb_response = client.patch(f'/api/books/update/cover/{Book.id}', files={"cover_img": ("cover.png", bomb.getvalue(), "image/png")})
+    assert bomb_response.status_code == 400
+
+def test_book_pdf_range_streaming(session: Session, client: TestClient, tmp_path):
+    app.dependency_overrides[get_storage] = lambda: LocalStorage(str(tmp_path))
+    Book = book_models.Book(title="Book", author="Author", isbn=TESTING_DATA_ISBN)
+
+    session.add(Book)
+    session.commit()
+
+    pdf_content = b"%PDF-1.4\n" + bytes(range(256)) * 1000
+    upload_response = client.post(f'/api/books/upload/bookpdf/{Book.id}', files={"pdf_file": ("book.pdf", pdf_content, "application/pdf")})
+    assert upload_response.status_code == 200
+
+    full_response = client.get(f'/api/books/stream/bookpdf/{TESTING_DATA_ISBN}')
+    assert full_response.status_code == 200
+    assert full_response.content == pdf_content
+    assert full_response.headers["accept-ranges"] == "bytes"
+
+    range_response = client.get(f'/api/books/stream/bookpdf/{TESTING_DATA_ISBN}', headers={"Range": "bytes=100-70000"})
+    assert range_response.status_code == 206
+    assert range_response.content == pdf_content[100:70001]
+    assert range_response.headers["content-range"] == f"bytes 100-70000/{len(pdf_content)}"
+
+    suffix_response = client.get(f'/api/books/stream/bookpdf/{TESTING_DATA_ISBN}', headers={"Range": "bytes=-10"})
+    assert suffix_response.content == pdf_content[-10:]
+
+    unsatisfiable_response = client.get(f'/api/books/stream/bookpdf/{TESTING_DATA_ISBN}', headers={"Range": f"bytes={len(pdf_content)}-"})
+    assert unsatisfiable_response.status_code == 416
+    assert client.get('/api/books/stream/bookpdf/missing').status_code == 404
+
+def test_catalogue_export(session: Session, client: TestClient, monkeypatch: pytest.MonkeyPatch):
+    app.dependency_overrides[get_sessionmaker] = lambda: TestingAsyncSessionLocal
+    #several cursor batches per export
+    monkeypatch.setattr(book_constants, "EXPORT_BATCH_SIZE", 2)
+    User = user_models.User(email="name@email.com", name="name", hashed_password="string", age=0)
+    session.add(User)
+    session.add_all([book_models.Book(title=f"Book, part {index}", author="Author", isbn=f"isbn{index}") for index in range(5)])
+    session.commit()
+    assert client.patch(f'/api/books/borrow/{User.email}/2').status_code == 200
+
+    csv_response = client.get('/api/books/export')
+    assert csv_response.status_code == 200
+    assert csv_response.headers["content-encoding"] == "gzip"
+    assert csv_response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(csv_response.text)))
+    assert [row["title"] for row in rows] == [f"Book, part {index}" for index in range(5)]
+    assert "borrower_email" not in rows[0]
+
+    ndjson_response = client.get('/api/books/export', params={"format": "ndjson", "loans": True}, headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in ndjson_response.headers
+    books = [json.loads(line) for line in ndjson_response.text.splitlines()]
+    assert [book["id"] for book in books] == [1, 2, 3, 4, 5]
+    assert books[1]["is_borrowed"] and books[1]["borrower_email"] == User.email and books[1]["due_at"]
+    assert books[0]["borrower_email"] is None
+
+def test_metrics_endpoint(session: Session, client: TestClient):
+    session.add(book_models.Book(id = 1, title="Book", author="Author", isbn=TESTING_DATA_ISBN))
+    session.commit()
+    assert client.get('/api/books/retrieve/1').status_code == 200
+    assert client.get('/api/not-a-route').status_code == 404
+
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    # labelled by route template, never by the concrete path
+    assert 'route="/api/books/retrieve/{isbn_or_id}"' in response.text
+    assert 'route="unmatched"' in response.text
+    assert "/api/books/retrieve/1" not in response.text
+    assert "http_request_db_queries_bucket" in response.text
+
+def test_slow_request_profiles(session: Session, client: TestClient, tmp_path, monkeypatch: pytest.MonkeyPatch):
+    session.add(book_models.Book(id = 1, title="Book", author="Author", isbn=TESTING_DATA_ISBN))
+    session.commit()
+
+    store = ProfileStore(str(tmp_path), max_profiles=2)
+    app.dependency_overrides[get_profile_store] = lambda: store
+    profiled_client = TestClient(ProfilerMiddleware(app, store=store, sample_rate=0.0, slow_seconds=0.1))
+
+    assert profiled_client.get('/api/books/retrieve/books').status_code == 200
+    assert store.names() == []
+
+    get_book_version = crud_books.get_book_version_by_isbn_or_id
+    async def blocking_lookup(**kwargs):
+        # blocks the event loop, the watchdog must still start sampling
+        time.sleep(0.3)
+        return await get_book_version(**kwargs)
+    monkeypatch.setattr(crud_books, "get_book_version_by_isbn_or_id", blocking_lookup)
+    assert profiled_client.get('/api/books/retrieve/1').status_code == 200
+
+    [summary] = client.get('/api/admin/profiles').json()
+    assert summary["reason"] == "slow"
+    assert summary["route"] == "/api/books/retrieve/{isbn_or_id}"
+    assert summary["samples"] > 0
+    capture = client.get(f'/api/admin/profiles/{summary["name"]}').json()
+    assert any("FROM books" in query["statement"] for query in capture["sql"])
+    assert "blocking_lookup" in client.get(f'/api/admin/profiles/{summary["name"]}/folded').text
+
+    # the ring buffer keeps the newest captures only
+    get_books = crud_books.get_books
+    async def slow_get_books(**kwargs):
+        # long enough for the sampler to take a few samples
+        time.sleep(0.05)
+        return await get_books(**kwargs)
+    monkeypatch.setattr(crud_books, "get_books", slow_get_books)
+    sampling_client = TestClient(ProfilerMiddleware(app, store=store, sample_rate=1.0, slow_seconds=10))
+
+    # another request holds the sampler, nothing could be sampled and nothing is saved
+    StackSampler._active.acquire()
+    try:
+        assert sampling_client.get('/api/books/retrieve/books?skip=10').status_code == 200
+    finally:
+        StackSampler._active.release()
+    assert store.names() == [summary["name"]]
+
+    for skip in range(3):
+        sampling_client.get(f'/api/books/retrieve/books?skip={skip}')
+    assert len(store.names()) == 2
+    assert summary["name"] not in store.names()
+    assert client.get(f'/api/admin/profiles/{summary["name"]}').status_code == 404
+    with pytest.raises(ValueError):
+        ProfileStore(str(tmp_path), max_profiles=0)
+
+def test_database_pool_status(session: Session, client: TestClient):
+    response = client.get('/api/admin/database/pool')
+
+    assert response.status_code == 200
+    assert {"checkouts", "checkout_wait_seconds_total", "checkout_timeouts"} <= response.json().keys()
@@ -1,20 +1,35 @@
 from sqlalchemy import select
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 
 from ..auth import service
+from ..book import models as book_models
 from . import models, schemas
 
-def get_user_by_email(db: Session, email: str):
+# columns of schemas.BorrowedBook, the rest of the book (description, ...) is never loaded with a user
+BORROWED_BOOK_COLUMNS = (
+    book_models.Book.id,
+    book_models.Book.title,
+    book_models.Book.author,
+    book_models.Book.isbn,
+    book_models.Book.borrowed_date,
+)
+
+async def get_user_by_email(db: AsyncSession, email: str, load_borrowed_books: bool = False):
     """
     Get user by email
     
     :param email: User email
     :param db: Database session
+    :param load_borrowed_books: Load borrowed_books with one extra query, lazy loads are not possible with AsyncSession
     :return: Return user object
     """
-    return db.execute(select(models.User).where(models.User.email == email)).scalars().first()
+    query = select(models.User).where(models.User.email == email)
+    if load_borrowed_books:
+        query = query.options(selectinload(models.User.borrowed_books).load_only(*BORROWED_BOOK_COLUMNS))
+    return (await db.execute(query)).scalars().first()
 
-def create_user(user: schemas.UserCreate, db: Session):
+async def create_user(user: schemas.UserCreate, db: AsyncSession):
     """
     Create a new user
 
@@ -23,27 +38,29 @@ def create_user(user: schemas.UserCreate, db: Session):
     :return: Return user object
     """
     #hash password with passlib
-    user_hashed_password = service.hash_password(user.password)
+    user_hashed_password = await service.hash_password(user.password)
     #instantiate User model
     db_user = models.User(email=user.email, name=user.name, age=user.age, hashed_password=user_hashed_password)
 
+    #every default is set client side, the object is complete after the INSERT without a refresh
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
 
     return db_user
 
-def update_user(db: Session, user: schemas.UserUpdate, email: str):
+async def update_user(db: AsyncSession, user: schemas.UserUpdate, email: str):
     """
     Update existing user by email
 
     :param user: User pydantic object
     :param email: User email
     :param db: Database session
-    :return: Return updated user object
+    :return: Return updated user object, None if the user does not exist
     """
     #query user with user email
-    query_user = get_user_by_email(email=email, db=db)
+    query_user = await get_user_by_email(email=email, db=db)
+    if not query_user:
+        return None
 
     if user:
         #turn user (pydantic model) into python dict
@@ -54,12 +71,11 @@ def update_user(db: Session, user: schemas.UserUpdate, email: str):
                 setattr(query_user, key, value)
 
     db.add(query_user)
-    db.commit()
-    db.refresh(query_user)
+    await db.commit()
 
     return query_user
 
-def delete_user(db: Session, email: str):
+async def delete_user(db: AsyncSession, email: str):
     """
     Delete user by email
     
@@ -67,9 +83,9 @@ def delete_user(db: Session, email: str):
     :param db: Database session
     :return: Return successful message
     """
-    db_user = get_user_by_email(email=email, db=db)
+    db_user = await get_user_by_email(email=email, db=db)
 
-    db.delete(db_user)
-    db.commit()
+    await db.delete(db_user)
+    await db.commit()
 
     return {"message": "User deleted successfully"} #consider add status code to response after returning
\ No newline at end of file
@@ -1,44 +1,53 @@
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, HTTPException, Security
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, Security
+from pydantic import BaseModel
+from sqlalchemy import inspect
+from sqlalchemy.ext.asyncio import AsyncSession
 
-import jwt
 from ..auth import dependencies
-from . import crud, schemas
+from . import crud, models, schemas
 from ..database import get_db
-from ..auth.dependencies import oauth2_scheme
-from ..auth import config
+from ..utils import json_response
 router = APIRouter(
     prefix = "/users",
 )
 
+def _user_response(db_user: models.User, schema: type[BaseModel] = schemas.UserResponse) -> Response:
+    """
+    Build a user response from the loaded attributes only, an unloaded borrowed_books stays None
+    instead of being lazy loaded (which AsyncSession cannot do).
+    """
+    unloaded = inspect(db_user).unloaded
+    return json_response(schema, {
+        field: getattr(db_user, field)
+        for field in schema.model_fields
+        if field not in unloaded and hasattr(db_user, field)
+    })
+
 @router.post("/create", response_model=schemas.UserResponse)
-def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
+async def create_user(user: schemas.UserCreate, db: AsyncSession = Depends(get_db)):
     """
     Create new user
     """
     # Check if user already existed
-    db_user = crud.get_user_by_email(email=user.email, db=db)
+    db_user = await crud.get_user_by_email(email=user.email, db=db)
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
-    return crud.create_user(user=user, db=db)
+    return _user_response(await crud.create_user(user=user, db=db))
 
 @router.get(
     "/metadata/",
     dependencies=[
         Security(dependencies.authorize_current_user, scopes=["user", "admin", "superuser"]), 
     ])
-def read_token_data(token: Annotated[str, Depends(oauth2_scheme)]):
+def read_token_data(user_token_data: Annotated[schemas.JWTTokenData, Depends(dependencies.get_token_data)]):
     """
     Retrieve data from token
     """
-    payload = jwt.decode(token, config.SECRET_KEY, config.JWT_ALGORITHM)
-    payload_email = payload.get("email")
-    payload_scope = payload.get("scope")
     return {
-        "email": payload_email,
-        "scope": payload_scope,
+        "email": user_token_data.email,
+        "scope": user_token_data.scope,
         "isAuth": True,
     }
 
@@ -49,14 +58,15 @@ def read_token_data(token: Annotated[str, Depends(oauth2_scheme)]):
         Security(dependencies.authorize_current_user, scopes=["user", "admin", "superuser"]), 
         Depends(dependencies.confirm_user_authorization)
     ])
-def read_user(email: str, db: Session = Depends(get_db)):
+async def read_user(email: str, include: list[schemas.UserInclude] = Query(default=[]), db: AsyncSession = Depends(get_db)):
     """
-    Retrieve exiting user with email
+    Retrieve exiting user with email, `include=borrowed_books` adds the books the user has borrowed
     """
-    db_user = crud.get_user_by_email(email=email, db=db)
+    load_borrowed_books = schemas.UserInclude.BORROWED_BOOKS in include
+    db_user = await crud.get_user_by_email(email=email, db=db, load_borrowed_books=load_borrowed_books)
     if not db_user: 
         raise HTTPException(status_code=404, detail="Target user does not exist")
-    return db_user
+    return _user_response(db_user)
 
 """IF YOU GET 422 Unprocessable Entity ERROR, 
 SPECIFICALLY THIS ERROR 
@@ -83,14 +93,14 @@ CONSIDER CHECKING MISSING OR ADDITIONAL SIGNS OR COMMAS IN THE REQUEST BODY
         Security(dependencies.authorize_current_user, scopes=["user", "admin", "superuser"]), 
         Depends(dependencies.confirm_user_authorization)
     ])
-def update_user(email: str, user: schemas.UserUpdate, db: Session = Depends(get_db)):
+async def update_user(email: str, user: schemas.UserUpdate, db: AsyncSession = Depends(get_db)):
     """
     Update existing user
     """
-    db_user = crud.get_user_by_email(email=email, db=db)
+    db_user = await crud.update_user(email=email, user=user, db=db)
     if not db_user:
         raise HTTPException(status_code=400, detail="Target user does not exist")
-    return crud.update_user(email=email, user=user, db=db)
+    return _user_response(db_user, schemas.UserUpdate)
 
 @router.delete(
     "/delete/{email}",     
@@ -98,13 +108,13 @@ def update_user(email: str, user: schemas.UserUpdate, db: Session = Depends(get_
         Security(dependencies.authorize_current_user, scopes=["user", "admin", "superuser"]), 
         Depends(dependencies.confirm_user_authorization)
     ])
-def delete_user(email: str, db: Session = Depends(get_db)):
+async def delete_user(email: str, db: AsyncSession = Depends(get_db)):
     """
     Delete user from database
     """
-    db_user = crud.get_user_by_email(email=email, db=db)
+    db_user = await crud.get_user_by_email(email=email, db=db)
     if not db_user:
         raise HTTPException(status_code=400, detail="Target user does not exist")
-    return crud.delete_user(email=email, db=db)
+    return await crud.delete_user(email=email, db=db)
 
 
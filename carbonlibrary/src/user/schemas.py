@@ -1,6 +1,6 @@
 from datetime import date, datetime
 from enum import Enum
-from ..book.schemas import Book
+from ..book.schemas import Book, BorrowedBook
 from pydantic import BaseModel
 
 class UserStatus(str, Enum):
@@ -8,6 +8,9 @@ class UserStatus(str, Enum):
     ADMIN = "admin"
     USER = "user"
 
+class UserInclude(str, Enum):
+    BORROWED_BOOKS = "borrowed_books"
+
 class UserBase(BaseModel):
     email: str
     name: str
@@ -48,7 +51,8 @@ class User(UserBase, UserCredential, UserMetadata):
     pass
 
 class UserResponse(UserBase, UserMetadata):
-    pass
+    # only present when asked for with ?include=borrowed_books
+    borrowed_books: list[BorrowedBook] | None = None
 
 class UserCreate(UserBase, UserCredential):
     pass
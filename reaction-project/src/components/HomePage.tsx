@@ -17,7 +17,7 @@ interface Book {
     lccn?: string | undefined 
     subtitle?: string | undefined 
     subjects?: string | undefined 
-    cover_image?: string 
+    cover_url?: string 
     id?: number
     added_date?: Date
     borrowed_date?: Date | undefined 
@@ -38,6 +38,10 @@ export default function HomePage(){
     };
 
     const handleLogOut = () => {
+        const refreshToken = localStorage.getItem('refresh_token')
+        if (refreshToken) {
+            apiBase.post('token/revoke', {refresh_token: refreshToken}).catch(() => {})
+        }
         localStorage.removeItem('access_token')
         localStorage.removeItem('refresh_token')
         authContext.setIsAuthenticated(false)
@@ -58,7 +62,7 @@ export default function HomePage(){
         try{
             const response = await apiBase.request({
                 method: 'get',
-                url: 'books/retrieve/books',
+                url: 'books/retrieve/books/summary',
                 params : {
                     limit: 10,
                     skip: skipValue,
@@ -93,7 +97,7 @@ export default function HomePage(){
         try{
             const response = await apiBase.request({
                 method: 'get',
-                url: 'books/retrieve/books',
+                url: 'books/retrieve/books/summary',
                 params : {
                     limit: 10,
                     skip: skipValue,
@@ -150,7 +154,7 @@ export default function HomePage(){
             try {
                 const response = await apiBase.request({
                     method: 'get',
-                    url: 'books/retrieve/books',
+                    url: 'books/retrieve/books/summary',
                     params : {
                         limit: pagQueryParams.get('limit'),
                         skip: pagQueryParams.get('skip'),
@@ -196,8 +200,9 @@ export default function HomePage(){
     }, [])
 
 
-    const imgData = (b64Data:string):string => {
-        return `data:image/jpeg;base64,${b64Data}`;
+    ///cover_url is an absolute path on the API host, resolve it against the API base URL
+    const coverSrc = (coverUrl:string):string => {
+        return new URL(coverUrl, apiBase.defaults.baseURL).href;
     }
 
     ///const toTitle = (str:string) => {
@@ -265,7 +270,7 @@ export default function HomePage(){
                                 state={{from: `/details/${book.id}`}}
                                 className="w-36"
                                 ><img 
-                                    src={book.cover_image ? imgData(book.cover_image) : staticComingSoonFile} 
+                                    src={book.cover_url ? coverSrc(book.cover_url) : staticComingSoonFile} 
                                     style={{ width: '100px', height: '150px' }}
                                     className="mx-auto"
                                     />
@@ -1,37 +1,28 @@
-import { useEffect, useState } from 'react';
+import { useMemo, useState } from 'react';
 import { Document, Page } from 'react-pdf'; //https://github.com/wojtekmaj/react-pdf
 import '../worker'
 import { PDFDocumentProxy } from 'pdfjs-dist';
 import { apiBase } from '../lib/api';
 import { useOutletContext } from 'react-router';
 
+///pdf.js asks for byte ranges only when it must not stream or prefetch the whole file
+const pdfOptions = {
+    disableAutoFetch: true,
+    disableStream: true,
+};
+
 export default function PortableDocumentFileViewer(){
     const [totalNumPages, setTotalNumPages] = useState(0);
     const [currentPage, setCurrentPage] = useState(1);
     const [nextPage, setNextPage] = useState(2);
     const [errorMsg, setErrorMsg] = useState("");
-    const [fileURL, setFileURL] = useState('');
     const isbnData = useOutletContext();
 
-    useEffect(() => {
-        const requestData = async() => {
-            try {
-                const response = await apiBase.request({
-                    method: 'get',
-                    url: `books/retrieve/bookpdf/${isbnData}`,
-                    headers: { 
-                        'Content-Type': 'application/json', 
-                    }
-                })
-                setFileURL(response.data.url)
-            }
-            catch (error: any) {
-                setErrorMsg(error.message);
-                console.log(error);
-            }
-        }
-        requestData();
-    }, [])
+    ///the stream endpoint answers Range requests with 206, so only the pages on screen are downloaded
+    const file = useMemo(() => ({
+        url: `${apiBase.defaults.baseURL}books/stream/bookpdf/${isbnData}`,
+        httpHeaders: { 'Authorization': `Bearer ${localStorage.getItem('access_token')}` },
+    }), [isbnData]);
     /// onLoadSuccess, when successfully loaded, call on onDocumentLoadSuccess function with 'data' object as argument 
     /// 'data' contains attribute '.numPages' which tell the total number of pages of the pdf
     const onDocumentLoadSuccess = (data: PDFDocumentProxy) => {
@@ -50,8 +41,10 @@ export default function PortableDocumentFileViewer(){
         <section>
             <Document 
             className={'relative flex justify-center mt-24'}
-            file={fileURL}
+            file={file}
+            options={pdfOptions}
             noData={"PDF is not available"}
+            onLoadError={(error) => setErrorMsg(error.message)}
             /// onLoadSuccess, when successfully loaded, call on onDocumentLoadSuccess function with 'data' object as argument 
             onLoadSuccess={onDocumentLoadSuccess}
             >
@@ -14,4 +14,41 @@ apiBase.interceptors.request.use((config) => {
   }
 
   return config;
-});
\ No newline at end of file
+});
+
+///access tokens are short lived, on 401 trade the refresh_token for a new pair once and replay the request
+let refreshing: Promise<string | null> | null = null;
+
+const refreshAccessToken = async (): Promise<string | null> => {
+  const refreshToken = localStorage.getItem('refresh_token');
+  if (!refreshToken) {
+    return null;
+  }
+  try {
+    const response = await axios.post('token/refresh', {refresh_token: refreshToken}, {baseURL: apiBase.defaults.baseURL});
+    localStorage.setItem('access_token', response.data.access_token);
+    localStorage.setItem('refresh_token', response.data.refresh_token);
+    return response.data.access_token;
+  } catch {
+    localStorage.removeItem('access_token');
+    localStorage.removeItem('refresh_token');
+    return null;
+  }
+};
+
+apiBase.interceptors.response.use(undefined, async (error) => {
+  const request = error.config;
+  if (error.response?.status !== 401 || !request || request._retried) {
+    return Promise.reject(error);
+  }
+  request._retried = true;
+
+  ///concurrent 401s share one refresh, a refresh token can only be used once
+  refreshing = refreshing ?? refreshAccessToken().finally(() => { refreshing = null; });
+  const accessToken = await refreshing;
+  if (!accessToken) {
+    return Promise.reject(error);
+  }
+  request.headers.Authorization = `Bearer ${accessToken}`;
+  return apiBase(request);
+});